@@ -7,9 +7,10 @@ from .models import Category, Post, Comment, Vote
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'created_at']
+    list_display = ['name', 'slug', 'posts_count', 'created_at']
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ['name']
+    readonly_fields = ['posts_count', 'created_at']
 
 
 @admin.register(Post)
@@ -17,7 +18,7 @@ class PostAdmin(admin.ModelAdmin):
     list_display = ['title', 'author', 'category', 'upvotes_count', 'comments_count', 'is_pinned', 'created_at']
     list_filter = ['category', 'is_pinned', 'is_locked', 'created_at']
     search_fields = ['title', 'content', 'author__email']
-    readonly_fields = ['upvotes_count', 'comments_count', 'created_at', 'updated_at']
+    readonly_fields = ['upvotes_count', 'comments_count', 'trending_score', 'created_at', 'updated_at']
     list_editable = ['is_pinned']
 
 
@@ -5,3 +5,6 @@ class DiscussionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.discussions'
     label = 'discussions'
+    
+    def ready(self):
+        import apps.discussions.signals
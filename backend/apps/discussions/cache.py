@@ -0,0 +1,233 @@
+"""
+Versioned response cache for anonymous discussion reads.
+
+Every cached response key embeds the current version number of the scopes
+it depends on (all posts, one category's posts, one post, the category
+list). Writes bump those versions instead of searching for keys to delete;
+entries under old versions are never read again and simply expire.
+"""
+import hashlib
+import threading
+import time
+from functools import partial
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import urlencode
+from rest_framework.response import Response
+from .models import Category, Post
+
+KEY_PREFIX = 'discussions'
+
+# Bumped when a category changes; every cached response depends on it
+ROOT_SCOPE = 'all'
+
+CACHED_ENDPOINTS = ('category-list', 'post-list', 'post-detail', 'post-trending')
+
+
+def _version_key(scope):
+    return f'{KEY_PREFIX}:version:{scope}'
+
+
+def _stats_key(name, outcome):
+    return f'{KEY_PREFIX}:stats:{name}:{outcome}'
+
+
+def _initial_version():
+    # Time based, so a version evicted from the cache never comes back as
+    # a number that older entries were stored under
+    return time.time_ns() // 1000
+
+
+def get_versions(scopes):
+    """Current version numbers for `scopes`, initializing missing ones."""
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _initial_version(), timeout=None)
+        # Another process may have won the add
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def bump_versions(scopes):
+    """Invalidate every cached response depending on any of `scopes`."""
+    for scope in set(scopes):
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), timeout=None)
+
+
+def post_scopes(targets):
+    """
+    Scopes showing the given posts: detail views, the post lists and their categories.
+    
+    `targets` maps post ids to {'category_ids', 'detail_only'}. Category ids
+    default to the post's stored category (None); they are passed
+    explicitly when a post is moved or already deleted. Two queries at most,
+    however many posts there are.
+    """
+    scopes = set()
+    category_ids = set()
+    lookups = []
+    for post_id, target in targets.items():
+        scopes.add(f'post:{post_id}')
+        if target['detail_only']:
+            continue
+        scopes.update(['posts', 'categories'])
+        if target['category_ids'] is None:
+            lookups.append(post_id)
+        else:
+            category_ids.update(target['category_ids'])
+    if lookups:
+        category_ids.update(Post.objects.filter(id__in=lookups).values_list('category_id', flat=True))
+    category_ids.discard(None)
+    if category_ids:
+        slugs = Category.objects.filter(id__in=category_ids).values_list('slug', flat=True)
+        scopes.update(f'category:{slug}' for slug in slugs)
+    return scopes
+
+
+# Posts to invalidate when the current transaction commits, per thread
+_local = threading.local()
+
+
+class PendingInvalidation:
+    """Posts touched by one transaction, bumped by a single on_commit callback."""
+    
+    def __init__(self):
+        self.targets = {}
+        self.flushed = False
+    
+    def add(self, post_id, category_ids, detail_only):
+        target = self.targets.setdefault(post_id, {'category_ids': None, 'detail_only': True})
+        target['detail_only'] = target['detail_only'] and detail_only
+        if category_ids is not None:
+            target['category_ids'] = (target['category_ids'] or set()) | set(category_ids)
+    
+    def flush(self):
+        self.flushed = True
+        if getattr(_local, 'pending', None) is self:
+            _local.pending = None
+        bump_versions(post_scopes(self.targets))
+
+
+def _pending_invalidation():
+    """
+    The batch collecting invalidations for the current transaction.
+    
+    A new one is started when the last one was flushed or its callback was
+    dropped by a rollback.
+    """
+    pending = getattr(_local, 'pending', None)
+    connection = transaction.get_connection()
+    if pending is None or pending.flushed or not any(
+        entry[1] == pending.flush for entry in connection.run_on_commit
+    ):
+        pending = PendingInvalidation()
+        _local.pending = pending
+        transaction.on_commit(pending.flush)
+    return pending
+
+
+def invalidate_post(post_id, category_ids=None, detail_only=False):
+    """
+    Bump the versions of everything showing a post once the transaction commits.
+    
+    Bumping before the commit would let a concurrent reader cache the old
+    data under the new version. Calls within one transaction are merged, so
+    a cascade deleting many comments bumps once, with a fixed number of
+    queries.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        pending = PendingInvalidation()
+        pending.add(post_id, category_ids, detail_only)
+        pending.flush()
+        return
+    _pending_invalidation().add(post_id, category_ids, detail_only)
+
+
+def invalidate_all():
+    """Invalidate every cached discussion response once the transaction commits."""
+    transaction.on_commit(partial(bump_versions, [ROOT_SCOPE]))
+
+
+def response_key(request, name, versions):
+    """Cache key for a request: host, path, normalized query params and versions."""
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+        if value != ''
+    )
+    material = '|'.join([
+        request.scheme,
+        request.get_host(),
+        request.path,
+        urlencode(params),
+        '.'.join(str(version) for version in versions),
+    ])
+    digest = hashlib.md5(material.encode()).hexdigest()
+    return f'{KEY_PREFIX}:response:{name}:{digest}'
+
+
+def _record(name, outcome):
+    key = _stats_key(name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_stats():
+    """Hit and miss counts per cached endpoint."""
+    keys = {
+        (name, outcome): _stats_key(name, outcome)
+        for name in CACHED_ENDPOINTS
+        for outcome in ('hits', 'misses')
+    }
+    values = cache.get_many(list(keys.values()))
+    stats = {name: {'hits': 0, 'misses': 0} for name in CACHED_ENDPOINTS}
+    for (name, outcome), key in keys.items():
+        stats[name][outcome] = values.get(key, 0)
+    return stats
+
+
+def reset_stats():
+    cache.delete_many([
+        _stats_key(name, outcome)
+        for name in CACHED_ENDPOINTS
+        for outcome in ('hits', 'misses')
+    ])
+
+
+def cached_response(request, name, scopes, producer):
+    """
+    Serve an anonymous read from the cache, or call `producer` and store it.
+    
+    Authenticated users always get a fresh response, since it carries their
+    own vote state. Only 200 responses are stored; the `X-Cache` header
+    tells whether the response was a HIT or a MISS.
+    """
+    if request.user.is_authenticated:
+        return producer()
+    
+    key = response_key(request, name, get_versions([ROOT_SCOPE, *scopes]))
+    data = cache.get(key)
+    if data is not None:
+        _record(name, 'hits')
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+    
+    _record(name, 'misses')
+    response = producer()
+    if response.status_code == 200:
+        cache.set(key, response.data, settings.DISCUSSIONS_CACHE_TIMEOUT)
+    response['X-Cache'] = 'MISS'
+    return response
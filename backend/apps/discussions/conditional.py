@@ -0,0 +1,100 @@
+"""
+Conditional GET (ETag / Last-Modified) support for post endpoints.
+
+Validators come from one query over durable state: the post row's
+timestamp and counters, the latest comment edit, a checksum of the
+comments' vote counters, the newest buffered vote delta (write-behind
+mode) and the current user's own votes. Every worker derives the same
+ETag from the database, so none answers 304 after a change it did not
+handle itself. A matching revalidation gets a 304 before anything is
+serialized.
+"""
+import hashlib
+from django.db.models import F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from .models import Post, Comment, Vote, PendingVoteDelta
+
+
+def _total(queryset, aggregate):
+    """Correlated aggregate over all of `queryset`, NULL when it is empty."""
+    return Subquery(
+        queryset.order_by().annotate(group=Value(1)).values('group').annotate(total=aggregate).values('total')
+    )
+
+
+def post_validators(request, post_id):
+    """
+    Return (etag, last_modified) for a post and its comments, or None if
+    the post does not exist.
+    
+    The ETag also covers the query string and the current user, since
+    pages and `user_vote` differ between them.
+    """
+    comments = Comment.objects.filter(post_id=OuterRef('id'))
+    pending = PendingVoteDelta.objects.filter(
+        Q(post_id=OuterRef('id')) | Q(comment_id__in=Comment.objects.filter(post_id=OuterRef(OuterRef('id'))).values('id'))
+    )
+    user_votes = Vote.objects.filter(
+        Q(post_id=OuterRef('id')) | Q(comment__post_id=OuterRef('id')), user_id=request.user.pk
+    )
+    row = (
+        Post.objects.filter(id=post_id)
+        .annotate(
+            last_comment_at=Subquery(comments.order_by('-updated_at').values('updated_at')[:1]),
+            # Weighted by id, so a vote on any one comment moves the sum
+            comment_votes=_total(comments, Sum(F('upvotes_count') * F('id'))),
+            last_pending_id=Subquery(pending.order_by('-id').values('id')[:1]),
+            own_votes=_total(user_votes, Sum(F('value') * (Coalesce('comment_id', 0) + 1))),
+        )
+        .values_list(
+            'updated_at', 'upvotes_count', 'comments_count', 'last_comment_at',
+            'comment_votes', 'last_pending_id', 'own_votes',
+        )
+        .order_by()
+        .first()
+    )
+    if row is None:
+        return None
+    
+    updated_at, upvotes_count, comments_count, last_comment_at, *vote_state = row
+    material = '|'.join(str(value) for value in [
+        post_id, updated_at.isoformat(), upvotes_count, comments_count,
+        last_comment_at.isoformat() if last_comment_at else '',
+        *vote_state, request.get_full_path(), request.user.pk or '',
+    ])
+    etag = quote_etag(hashlib.md5(material.encode()).hexdigest())
+    last_modified = max(updated_at, last_comment_at or updated_at)
+    return etag, last_modified
+
+
+class ConditionalPostMixin:
+    """
+    Answer GET revalidations for a post's resources with 304 Not Modified.
+    
+    Last-Modified is sent for information only; revalidation needs
+    If-None-Match. Runs after DRF authentication and permission checks, so the ETag can
+    depend on the user. Views name the URL kwarg holding the post id.
+    """
+    
+    post_lookup_kwarg = 'pk'
+    
+    def get(self, request, *args, **kwargs):
+        validators = post_validators(request, kwargs[self.post_lookup_kwarg])
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+        
+        # Only the ETag validates: votes and counters move it but not
+        # Last-Modified, so If-Modified-Since alone would answer 304 stale
+        etag, last_modified = validators
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_vary_headers(response, ['Authorization'])
+        return response
@@ -0,0 +1,190 @@
+"""
+Maintenance of denormalized counters for discussions app.
+
+Counters are kept up to date incrementally by views, signals and the vote
+engine. The refresh/reconcile helpers below recompute them from the source
+rows with correlated subqueries and only write the rows that drifted.
+"""
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import Category, Post, Comment, Vote, PendingVoteDelta
+from .trending import rescore_posts
+
+
+def adjust_category_posts_count(category_id, delta):
+    """Apply a delta to a category's stored posts_count."""
+    if category_id and delta:
+        Category.objects.filter(id=category_id).update(posts_count=F('posts_count') + delta)
+
+
+def _aggregate_subquery(queryset, group_by, aggregate):
+    """Correlated per-row aggregate over `queryset`, 0 when it is empty."""
+    return Coalesce(
+        Subquery(
+            queryset.order_by()
+            .values(group_by)
+            .annotate(total=aggregate)
+            .values('total')
+        ),
+        Value(0),
+    )
+
+
+def category_posts_subquery():
+    """Actual number of posts per category, for use against Category rows."""
+    return _aggregate_subquery(
+        Post.objects.filter(category=OuterRef('pk')), 'category', Count('id')
+    )
+
+
+def post_comments_subquery():
+    """Actual number of comments (replies included) per post."""
+    return _aggregate_subquery(
+        Comment.objects.filter(post=OuterRef('pk')), 'post', Count('id')
+    )
+
+
+def vote_total_subquery(target):
+    """
+    Expected stored upvotes_count per post or comment.
+    
+    That is the vote total (upvotes minus downvotes) less any deltas still
+    buffered in write-behind mode, which the flusher adds later.
+    """
+    votes = _aggregate_subquery(
+        Vote.objects.filter(**{target: OuterRef('pk')}), target, Sum('value')
+    )
+    pending = _aggregate_subquery(
+        PendingVoteDelta.objects.filter(**{f'{target}_id': OuterRef('pk')}), f'{target}_id', Sum('delta')
+    )
+    return votes - pending
+
+
+def comment_replies_subquery():
+    """Actual number of direct replies per comment."""
+    return _aggregate_subquery(
+        Comment.objects.filter(parent=OuterRef('pk')), 'parent', Count('id')
+    )
+
+
+def post_counter_expressions():
+    return {
+        'comments_count': post_comments_subquery(),
+        'upvotes_count': vote_total_subquery('post'),
+    }
+
+
+def comment_counter_expressions():
+    return {
+        'upvotes_count': vote_total_subquery('comment'),
+        'replies_count': comment_replies_subquery(),
+    }
+
+
+def category_counter_expressions():
+    return {'posts_count': category_posts_subquery()}
+
+
+def drifted(queryset, expressions):
+    """
+    Rows of `queryset` where some counter differs from its actual value.
+    
+    `expressions` maps each counter field to a correlated subquery giving
+    the actual value, annotated as `actual_<field>`.
+    """
+    actual = {f'actual_{field}': expression for field, expression in expressions.items()}
+    return queryset.annotate(**actual).filter(reduce(or_, (
+        ~Q(**{field: F(f'actual_{field}')}) for field in expressions
+    )))
+
+
+def refresh_counters(queryset, expressions):
+    """
+    Recompute counter fields of `queryset` rows from `expressions`.
+    
+    Only rows where some counter drifted are written. Returns the number
+    of rows fixed.
+    """
+    return queryset.model.objects.filter(
+        pk__in=drifted(queryset, expressions).values('pk')
+    ).update(**expressions)
+
+
+def refresh_post_counters(queryset=None):
+    """Recompute comments_count and upvotes_count for posts (all by default)."""
+    if queryset is None:
+        queryset = Post.objects.all()
+    return refresh_counters(queryset, post_counter_expressions())
+
+
+def refresh_comment_counters(queryset=None):
+    """Recompute upvotes_count and replies_count for comments (all by default)."""
+    if queryset is None:
+        queryset = Comment.objects.all()
+    return refresh_counters(queryset, comment_counter_expressions())
+
+
+def refresh_category_posts_count(queryset=None):
+    """
+    Recompute posts_count for the given categories (all by default).
+    
+    Only rows whose stored value has drifted are written. Returns the
+    number of categories that were fixed.
+    """
+    if queryset is None:
+        queryset = Category.objects.all()
+    return refresh_counters(queryset, category_counter_expressions())
+
+
+COUNTER_MODELS = {
+    'categories': (Category, category_counter_expressions),
+    'posts': (Post, post_counter_expressions),
+    'comments': (Comment, comment_counter_expressions),
+}
+
+
+def reconcile_counters(name, chunk_size=1000, dry_run=False):
+    """
+    Check and fix every row's counters for one of COUNTER_MODELS.
+    
+    The table is walked in primary-key ranges of `chunk_size`. Each range
+    is checked with one set-based query; only drifted rows are locked and
+    rewritten, in a short transaction of their own, so writers are never
+    blocked for long. Counters are recomputed after the lock is taken, so
+    a vote or comment committing meanwhile is not lost. Fixed posts also
+    get their trending score recomputed. Yields one dict per
+    drifted row: `pk` plus (stored, actual) per counter field.
+    """
+    model, expressions_for = COUNTER_MODELS[name]
+    expressions = expressions_for()
+    fields = list(expressions)
+    bounds = model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return
+    
+    for start in range(bounds['low'], bounds['high'] + 1, chunk_size):
+        chunk = model.objects.filter(pk__gte=start, pk__lt=start + chunk_size)
+        rows = list(
+            drifted(chunk, expressions)
+            .order_by('pk')
+            .values('pk', *fields, *(f'actual_{field}' for field in fields))
+        )
+        if not rows:
+            continue
+        
+        ids = [row['pk'] for row in rows]
+        if not dry_run:
+            with transaction.atomic():
+                list(model.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk'))
+                model.objects.filter(pk__in=ids).update(**expressions)
+                if model is Post:
+                    rescore_posts(ids)
+        
+        for row in rows:
+            yield {
+                'pk': row['pk'],
+                **{field: (row[field], row[f'actual_{field}']) for field in fields},
+            }
@@ -0,0 +1,107 @@
+"""
+Read-only fast path for post list serialization.
+
+`PostListSerializer` instantiates Post, User and Category models and runs
+nested ModelSerializer fields for every row. List endpoints instead fetch
+just the columns they return with `.values()` and assemble the same JSON
+shape here. The output must stay identical to `PostListSerializer`
+(tests compare the rendered bytes), so any field added there has to be
+added here too.
+"""
+from django.contrib.auth import get_user_model
+from rest_framework import serializers
+
+User = get_user_model()
+
+AUTHOR_FIELDS = ('id', 'email', 'first_name', 'last_name', 'profile_picture', 'role')
+CATEGORY_FIELDS = ('id', 'name', 'slug', 'description', 'posts_count', 'created_at')
+POST_FIELDS = (
+    'id', 'title', 'excerpt', 'upvotes_count', 'comments_count', 'is_pinned',
+    'created_at', 'updated_at', 'trending_score',
+)
+
+POST_LIST_COLUMNS = (
+    *POST_FIELDS,
+    *(f'author__{field}' for field in AUTHOR_FIELDS),
+    *(f'category__{field}' for field in CATEGORY_FIELDS),
+)
+
+# Reuse DRF's own formatting so timestamps match the model serializers
+_datetime_field = serializers.DateTimeField()
+
+
+def post_list_values(queryset):
+    """Restrict a post queryset to the columns list responses need, as dicts."""
+    return queryset.values(*POST_LIST_COLUMNS)
+
+
+def _datetime(value):
+    return _datetime_field.to_representation(value)
+
+
+def _file_url(name, request):
+    if not name:
+        return None
+    url = User._meta.get_field('profile_picture').storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def serialize_post_rows(rows, context):
+    """
+    Serialize `post_list_values` rows exactly like `PostListSerializer`.
+    
+    `context` is the same serializer context list views build: `request`,
+    `user_votes` and, in write-behind mode, `pending_votes`.
+    """
+    request = context.get('request')
+    user_votes = context.get('user_votes') or {}
+    pending_votes = context.get('pending_votes') or {}
+    
+    data = []
+    for row in rows:
+        first_name = row['author__first_name']
+        last_name = row['author__last_name']
+        author = {
+            'id': row['author__id'],
+            'email': row['author__email'],
+            'first_name': first_name,
+            'last_name': last_name,
+            'full_name': f'{first_name} {last_name}'.strip(),
+            'profile_picture': _file_url(row['author__profile_picture'], request),
+            'role': row['author__role'],
+        }
+        
+        category = None
+        if row['category__id'] is not None:
+            category = {
+                'id': row['category__id'],
+                'name': row['category__name'],
+                'slug': row['category__slug'],
+                'description': row['category__description'],
+                'posts_count': row['category__posts_count'],
+                'created_at': _datetime(row['category__created_at']),
+            }
+        
+        post_id = row['id']
+        item = {
+            'id': post_id,
+            'title': row['title'],
+            'excerpt': row['excerpt'],
+            'author': author,
+            'category': category,
+        }
+        # PostListSerializer skips `category_name` for posts without a category
+        if category is not None:
+            item['category_name'] = category['name']
+        item.update({
+            'upvotes_count': row['upvotes_count'] + pending_votes.get(post_id, 0),
+            'comments_count': row['comments_count'],
+            'is_pinned': row['is_pinned'],
+            'user_vote': user_votes.get(post_id),
+            'created_at': _datetime(row['created_at']),
+            'updated_at': _datetime(row['updated_at']),
+        })
+        data.append(item)
+    return data
@@ -0,0 +1,61 @@
+"""
+Compare post list serialization throughput: PostListSerializer vs the
+`.values()` fast path.
+
+Runs against the posts already in the database.
+"""
+import time
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from apps.discussions.fast_serializers import post_list_values, serialize_post_rows
+from apps.discussions.models import Post
+from apps.discussions.serializers import PostListSerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark post list serialization (rows/second, query + serialize + render).'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5)
+    
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        queryset = Post.objects.order_by('-created_at', '-id')
+        count = queryset[:rows].count()
+        if not count:
+            raise CommandError('No posts to benchmark; create some posts first.')
+        
+        request = RequestFactory().get('/api/discussions/posts/')
+        request.user = AnonymousUser()
+        # Anonymous vote state, as list views resolve it for a whole page
+        context = {'request': request, 'user_votes': {}}
+        renderer = JSONRenderer()
+        
+        def model_path():
+            posts = list(queryset.select_related('author', 'category').defer('content')[:rows])
+            return renderer.render(PostListSerializer(posts, many=True, context=context).data)
+        
+        def fast_path():
+            values = list(post_list_values(queryset)[:rows])
+            return renderer.render(serialize_post_rows(values, context))
+        
+        if model_path() != fast_path():
+            raise CommandError('Fast path output differs from PostListSerializer')
+        
+        results = {}
+        for name, run in (('PostListSerializer', model_path), ('values() fast path', fast_path)):
+            best = min(self.time(run) for _ in range(repeat))
+            results[name] = count / best
+            self.stdout.write(f'{name}: {results[name]:,.0f} rows/s (best of {repeat}, {count} rows)')
+        
+        speedup = results['values() fast path'] / results['PostListSerializer']
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {speedup:.1f}x'))
+    
+    def time(self, run):
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start
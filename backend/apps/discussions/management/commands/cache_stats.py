@@ -0,0 +1,24 @@
+"""
+Report hit/miss counts of the anonymous discussion response cache.
+"""
+from django.core.management.base import BaseCommand
+from apps.discussions.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counts of the discussion response cache.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after reporting.')
+    
+    def handle(self, *args, **options):
+        for name, counts in get_stats().items():
+            total = counts['hits'] + counts['misses']
+            ratio = counts['hits'] / total if total else 0
+            self.stdout.write(
+                f"{name}: {counts['hits']} hits, {counts['misses']} misses ({ratio:.1%} hit rate)"
+            )
+        
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
@@ -0,0 +1,35 @@
+"""
+Merge buffered vote deltas into upvotes_count (write-behind mode).
+
+Run as a long-lived worker next to the web processes:
+
+    python manage.py flush_vote_counters
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.discussions.votes import flush_pending_deltas
+
+
+class Command(BaseCommand):
+    help = 'Flush buffered vote counter deltas in batches.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--interval', type=float, default=settings.VOTE_COUNTERS_FLUSH_INTERVAL)
+        parser.add_argument('--once', action='store_true', help='Drain the buffer and exit.')
+    
+    def handle(self, *args, **options):
+        while True:
+            flushed = 0
+            while True:
+                batch = flush_pending_deltas(options['batch_size'])
+                flushed += batch
+                if batch < options['batch_size']:
+                    break
+            
+            if flushed:
+                self.stdout.write(f'Flushed {flushed} vote deltas')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,35 @@
+"""
+Import discussions from a JSONL file written by export_discussions.
+
+    python manage.py import_discussions discussions.jsonl
+"""
+import time
+from django.core.management.base import BaseCommand
+from apps.discussions.cache import ROOT_SCOPE, bump_versions
+from apps.discussions.transfer import DEFAULT_BATCH_SIZE, import_jsonl
+from apps.discussions.trending import recompute_trending_scores
+
+
+class Command(BaseCommand):
+    help = 'Bulk import users, categories, posts, comments and votes from a JSONL file.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with open(options['path'], encoding='utf-8') as stream:
+            importer = import_jsonl(stream, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        recompute_trending_scores()
+        bump_versions([ROOT_SCOPE])
+        
+        for record_type, count in importer.counts.items():
+            skipped = importer.skipped[record_type]
+            self.stdout.write(f'{record_type}: {count} imported, {skipped} skipped')
+        
+        total = sum(importer.counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-6):,.0f} rows/s)'
+        ))
@@ -0,0 +1,16 @@
+"""
+Repair drift in Category.posts_count.
+"""
+from django.core.management.base import BaseCommand
+from apps.discussions.cache import bump_versions
+from apps.discussions.counters import refresh_category_posts_count
+
+
+class Command(BaseCommand):
+    help = 'Recompute Category.posts_count from the posts table.'
+    
+    def handle(self, *args, **options):
+        fixed = refresh_category_posts_count()
+        if fixed:
+            bump_versions(['categories'])
+        self.stdout.write(self.style.SUCCESS(f'Fixed posts_count on {fixed} categories'))
@@ -0,0 +1,25 @@
+"""
+Re-apply time decay to Post.trending_score.
+
+Run periodically (e.g. every 10 minutes from cron).
+"""
+from django.core.management.base import BaseCommand
+from apps.discussions.cache import ROOT_SCOPE, bump_versions
+from apps.discussions.trending import WINDOW_DAYS, recompute_trending_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute trending scores for posts in the trending window.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--window-days', type=int, default=WINDOW_DAYS)
+    
+    def handle(self, *args, **options):
+        total = recompute_trending_scores(
+            chunk_size=options['chunk_size'],
+            window_days=options['window_days'],
+        )
+        # Decay reorders every feed, category feeds included
+        bump_versions([ROOT_SCOPE])
+        self.stdout.write(self.style.SUCCESS(f'Rescored {total} posts'))
@@ -0,0 +1,49 @@
+"""
+Recompute denormalized discussion counters and fix the rows that drifted.
+
+Safe to run while the site is live (e.g. nightly from cron):
+
+    python manage.py reconcile_counters
+    python manage.py reconcile_counters --dry-run -v 2
+"""
+from django.core.management.base import BaseCommand
+from apps.discussions.cache import ROOT_SCOPE, bump_versions
+from apps.discussions.counters import COUNTER_MODELS, reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Check category, post and comment counters in primary-key chunks and fix drift.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', choices=list(COUNTER_MODELS), default=list(COUNTER_MODELS))
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it.')
+    
+    def handle(self, *args, **options):
+        total = 0
+        for name in COUNTER_MODELS:
+            if name not in options['only']:
+                continue
+            
+            count = 0
+            for row in reconcile_counters(name, options['chunk_size'], options['dry_run']):
+                count += 1
+                if options['verbosity'] > 1:
+                    pk = row.pop('pk')
+                    changes = ', '.join(
+                        f'{field} {stored} -> {actual}'
+                        for field, (stored, actual) in row.items()
+                        if stored != actual
+                    )
+                    self.stdout.write(f'  {name} #{pk}: {changes}')
+            
+            self.stdout.write(f'{name}: {count} drifted')
+            total += count
+        
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Dry run: {total} rows not fixed'))
+            return
+        
+        if total:
+            bump_versions([ROOT_SCOPE])
+        self.stdout.write(self.style.SUCCESS(f'Fixed {total} rows'))
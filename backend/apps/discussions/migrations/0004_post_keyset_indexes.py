@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discussions', '0003_category_posts_count'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_created_2e2442_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_upvotes_7113ce_idx',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='posts_created_0c572f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='posts_categor_bc6092_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='posts_author__ff7d8c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-upvotes_count', '-created_at', '-id'], name='posts_upvotes_d04297_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['category', '-upvotes_count', '-created_at', '-id'], name='posts_categor_d36bc7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-upvotes_count', '-created_at', '-id'], name='posts_author__462728_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-upvotes_count', '-comments_count', '-created_at', '-id'], name='posts_upvotes_f410c8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['category', '-upvotes_count', '-comments_count', '-created_at', '-id'], name='posts_categor_5e3d15_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-upvotes_count', '-comments_count', '-created_at', '-id'], name='posts_author__9cdecf_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:53
+
+from datetime import timedelta
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_trending_score(apps, schema_editor):
+    # Frozen copy of trending.compute_trending_score at the time of writing
+    Post = apps.get_model('discussions', 'Post')
+    now = timezone.now()
+    posts = list(
+        Post.objects.filter(created_at__gte=now - timedelta(days=7))
+        .only('id', 'upvotes_count', 'comments_count', 'created_at')
+    )
+    for post in posts:
+        age_hours = max((now - post.created_at).total_seconds() / 3600, 0)
+        points = post.upvotes_count + 2 * post.comments_count
+        post.trending_score = points / (age_hours + 2) ** 1.8
+    Post.objects.bulk_update(posts, ['trending_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discussions', '0004_post_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_upvotes_f410c8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_categor_5e3d15_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_author__9cdecf_idx',
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(backfill_trending_score, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-trending_score', '-id'], name='posts_trendin_a4b1dc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['category', '-trending_score', '-id'], name='posts_categor_989779_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-trending_score', '-id'], name='posts_author__57c2bd_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:54
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_tree(apps, schema_editor):
+    Comment = apps.get_model('discussions', 'Comment')
+    
+    parents = dict(Comment.objects.values_list('id', 'parent_id'))
+    paths = {}
+    
+    def resolve(comment_id):
+        # Walk up to the nearest resolved ancestor, then fill back down
+        chain = []
+        while comment_id is not None and comment_id not in paths:
+            chain.append(comment_id)
+            comment_id = parents.get(comment_id)
+        prefix, depth = paths.get(comment_id, ('', -1))
+        for node in reversed(chain):
+            depth += 1
+            prefix = f'{prefix}{node:010d}/'
+            paths[node] = (prefix, depth)
+    
+    for comment_id in parents:
+        resolve(comment_id)
+    
+    comments = [Comment(id=pk, path=path, depth=depth) for pk, (path, depth) in paths.items()]
+    Comment.objects.bulk_update(comments, ['path', 'depth'], batch_size=500)
+    
+    Comment.objects.update(replies_count=Coalesce(
+        Subquery(
+            Comment.objects.filter(parent=OuterRef('pk'))
+            .order_by()
+            .values('parent')
+            .annotate(total=Count('id'))
+            .values('total')
+        ),
+        Value(0),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discussions', '0005_post_trending_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, default='', max_length=512),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='replies_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_comment_tree, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'depth', 'path'], name='comments_post_id_5e4c51_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discussions', '0006_comment_path_depth_replies_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingVoteDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.BigIntegerField(blank=True, null=True)),
+                ('comment_id', models.BigIntegerField(blank=True, null=True)),
+                ('delta', models.SmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'pending_vote_deltas',
+                'indexes': [models.Index(fields=['post_id'], name='pending_vot_post_id_2ed2d2_idx'), models.Index(fields=['comment_id'], name='pending_vot_comment_f7ce8f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:14
+
+import re
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+
+def backfill_excerpt(apps, schema_editor):
+    # Frozen copy of models.make_excerpt at the time of writing
+    Post = apps.get_model('discussions', 'Post')
+    last_pk = 0
+    while True:
+        posts = list(
+            Post.objects.filter(pk__gt=last_pk).order_by('pk').only('id', 'content')[:500]
+        )
+        if not posts:
+            break
+        for post in posts:
+            text = re.sub(r'\s+', ' ', strip_tags(post.content or '')).strip()
+            post.excerpt = Truncator(text).chars(200)
+        Post.objects.bulk_update(posts, ['excerpt'])
+        last_pk = posts[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discussions', '0008_comment_comments_post_id_ca609b_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.RunPython(backfill_excerpt, migrations.RunPython.noop),
+    ]
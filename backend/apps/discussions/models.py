@@ -1,8 +1,11 @@
 """
 Models for discussions: Category, Post, Comment, Vote.
 """
+import re
 from django.db import models
 from django.conf import settings
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
 # from django.contrib.postgres.search import SearchVectorField
 # from django.contrib.postgres.indexes import GinIndex
 
@@ -13,6 +16,10 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True)
     description = models.TextField(blank=True)
+    
+    # Counters (denormalized for performance)
+    posts_count = models.IntegerField(default=0)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -24,9 +31,17 @@ class Category(models.Model):
         return self.name
 
 
+def make_excerpt(content, length=200):
+    """Plain-text preview of post content: tags stripped, whitespace collapsed."""
+    text = re.sub(r'\s+', ' ', strip_tags(content or '')).strip()
+    return Truncator(text).chars(length)
+
+
 class Post(models.Model):
     """Discussion posts."""
     
+    EXCERPT_LENGTH = 200
+    
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -41,6 +56,9 @@ class Post(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField()
     
+    # Plain-text preview for lists, kept in sync with content on save
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, default='')
+    
     # Full-text search (PostgreSQL only - commented for SQLite)
     # search_vector = SearchVectorField(null=True, blank=True)
     
@@ -48,6 +66,9 @@ class Post(models.Model):
     upvotes_count = models.IntegerField(default=0)
     comments_count = models.IntegerField(default=0)
     
+    # Time-decayed ranking (see trending.py)
+    trending_score = models.FloatField(default=0)
+    
     # Flags
     is_pinned = models.BooleanField(default=False)
     is_locked = models.BooleanField(default=False)
@@ -61,12 +82,28 @@ class Post(models.Model):
         ordering = ['-created_at']
         indexes = [
             # GinIndex(fields=['search_vector']),  # PostgreSQL only
-            models.Index(fields=['-created_at']),
-            models.Index(fields=['-upvotes_count']),
+            # Keyset pagination: one index per (filter, ordering) combination
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['category', '-created_at', '-id']),
+            models.Index(fields=['author', '-created_at', '-id']),
+            models.Index(fields=['-upvotes_count', '-created_at', '-id']),
+            models.Index(fields=['category', '-upvotes_count', '-created_at', '-id']),
+            models.Index(fields=['author', '-upvotes_count', '-created_at', '-id']),
+            models.Index(fields=['-trending_score', '-id']),
+            models.Index(fields=['category', '-trending_score', '-id']),
+            models.Index(fields=['author', '-trending_score', '-id']),
         ]
     
     def __str__(self):
         return self.title
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.excerpt = make_excerpt(self.content, self.EXCERPT_LENGTH)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'excerpt'}
+        super().save(*args, **kwargs)
 
 
 class Comment(models.Model):
@@ -91,22 +128,46 @@ class Comment(models.Model):
         related_name='replies'
     )
     
+    # Materialized path of zero-padded ids ("0000000012/0000000034/") and
+    # nesting level, so a whole thread loads with one range query
+    path = models.CharField(max_length=512, blank=True, default='')
+    depth = models.PositiveSmallIntegerField(default=0)
+    
     # Counters
     upvotes_count = models.IntegerField(default=0)
+    replies_count = models.IntegerField(default=0)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    PATH_SEGMENT_WIDTH = 10
+    # Deepest nesting whose path still fits the column (46 segments of 11)
+    MAX_DEPTH = 512 // (PATH_SEGMENT_WIDTH + 1) - 1
+    
     class Meta:
         db_table = 'comments'
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['post', '-created_at']),
+            models.Index(fields=['post', '-updated_at']),
+            models.Index(fields=['post', '-upvotes_count', '-created_at', '-id']),
+            models.Index(fields=['post', 'depth', 'path']),
         ]
     
     def __str__(self):
         return f"Comment by {self.author.email} on {self.post.title}"
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.parent_id:
+            self.depth = self.parent.depth + 1
+        super().save(*args, **kwargs)
+        
+        # The path includes our own id, so it can only be set after insert
+        if not self.path:
+            prefix = self.parent.path if self.parent_id else ''
+            self.path = f'{prefix}{self.pk:0{self.PATH_SEGMENT_WIDTH}d}/'
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
 
 
 class Vote(models.Model):
@@ -164,3 +225,28 @@ class Vote(models.Model):
     def __str__(self):
         target = self.post or self.comment
         return f"{self.user.email} voted {self.value} on {target}"
+
+
+class PendingVoteDelta(models.Model):
+    """
+    Vote counter change buffered for write-behind mode.
+    
+    Voters append rows here instead of updating the hot post/comment row;
+    `flush_vote_counters` merges them into upvotes_count in batches.
+    """
+    
+    post_id = models.BigIntegerField(null=True, blank=True)
+    comment_id = models.BigIntegerField(null=True, blank=True)
+    delta = models.SmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'pending_vote_deltas'
+        indexes = [
+            models.Index(fields=['post_id']),
+            models.Index(fields=['comment_id']),
+        ]
+    
+    def __str__(self):
+        target = f"post {self.post_id}" if self.post_id else f"comment {self.comment_id}"
+        return f"{self.delta:+d} on {target}"
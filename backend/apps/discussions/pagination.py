@@ -0,0 +1,185 @@
+"""
+Pagination classes for discussions app.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(values):
+    """Encode a list of keyset values as an opaque URL-safe token."""
+    data = json.dumps(values, separators=(',', ':'), default=str)
+    return urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a token produced by `encode_cursor`. Raises ValueError."""
+    padded = token + '=' * (-len(token) % 4)
+    values = json.loads(urlsafe_b64decode(padded.encode()).decode())
+    if not isinstance(values, list):
+        raise ValueError('Cursor must encode a list')
+    return values
+
+
+def reverse_ordering(ordering):
+    """Flip the direction of every field in an ordering."""
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over the queryset's own ordering, in both directions.
+    
+    A cursor stores the direction and the ordering values of the edge row
+    of the current page. The adjacent page is fetched with a
+    `WHERE (a, b, id) < (...)` range condition instead of an OFFSET
+    (reversed, then flipped back, for previous pages), so deep pages cost
+    the same as the first one and no COUNT(*) is run. The queryset ordering
+    must be a list of plain, non-nullable fields ending with a unique one
+    (usually `id`).
+    """
+    
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    
+    NEXT = 'n'
+    PREVIOUS = 'p'
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = [str(field) for field in queryset.query.order_by]
+        if not self.ordering:
+            raise ValueError('KeysetPagination requires an ordered queryset')
+        
+        direction, position = self.decode_position(request, queryset.model)
+        backwards = direction == self.PREVIOUS
+        ordering = reverse_ordering(self.ordering) if backwards else self.ordering
+        if backwards:
+            queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.build_filter(position, ordering))
+        
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if backwards:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+    
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+    
+    def decode_position(self, request, model):
+        """Return (direction, ordering values) for the request's cursor."""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return self.NEXT, None
+        
+        try:
+            values = decode_cursor(token)
+            if len(values) != len(self.ordering) + 1 or values[0] not in (self.NEXT, self.PREVIOUS):
+                raise ValueError('Cursor does not match ordering')
+            return values[0], [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values[1:])
+            ]
+        except (ValueError, TypeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+    
+    def build_filter(self, position, ordering):
+        """
+        Expand a row comparison into an OR of lexicographic conditions.
+        
+        The OR alone gives the planner no range to seek to, so it would scan
+        the index from its head; a redundant inclusive bound on the first
+        field lets the index scan start at the cursor.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        
+        first = ordering[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': position[0]}) & condition
+    
+    def get_position(self, row):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+    
+    def get_link(self, direction, row):
+        token = encode_cursor([direction, *self.get_position(row)])
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+    
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(self.NEXT, self.page[-1])
+    
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_link(self.PREVIOUS, self.page[0])
+    
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+    
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class KeysetPaginationMixin:
+    """
+    Let a list view opt into KeysetPagination per request.
+    
+    `?pagination=cursor` (or any `cursor` param) switches from the default
+    page-number pagination to keyset pages; the view's queryset ordering
+    must then be one of its keyset orderings.
+    """
+    
+    def uses_cursor_pagination(self):
+        params = self.request.query_params
+        return params.get('pagination') == 'cursor' or 'cursor' in params
+    
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.uses_cursor_pagination():
+            self._paginator = KeysetPagination()
+        return super().paginator
@@ -4,6 +4,7 @@ Serializers for discussions app.
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Category, Post, Comment, Vote
+from .votes import get_pending_deltas, write_behind_enabled
 from apps.users.serializers import UserListSerializer
 
 User = get_user_model()
@@ -12,18 +13,47 @@ User = get_user_model()
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer for Category model."""
     
-    posts_count = serializers.SerializerMethodField()
-    
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug', 'description', 'posts_count', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'posts_count', 'created_at']
+
+
+class VoteStateMixin:
+    """
+    Resolve per-user vote state from the serializer context.
+    
+    List views put the current user's votes for the whole page into the
+    context as `user_votes` (see `votes.vote_context`); single objects fall
+    back to a direct lookup. In write-behind mode `pending_votes` holds the
+    buffered counter deltas, which are added to upvotes_count.
+    """
+    
+    vote_target = 'post'
+    
+    def get_user_vote(self, obj):
+        """Get current user's vote on this object."""
+        user_votes = self.context.get('user_votes')
+        if user_votes is not None:
+            return user_votes.get(obj.pk)
+        
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            vote = Vote.objects.filter(user=request.user, **{self.vote_target: obj}).first()
+            return vote.value if vote else None
+        return None
     
-    def get_posts_count(self, obj):
-        return obj.posts.count()
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'upvotes_count' in data and write_behind_enabled():
+            pending = self.context.get('pending_votes')
+            if pending is None:
+                pending = get_pending_deltas(self.vote_target, [instance.pk])
+            data['upvotes_count'] += pending.get(instance.pk, 0)
+        return data
 
 
-class PostListSerializer(serializers.ModelSerializer):
+class PostListSerializer(VoteStateMixin, serializers.ModelSerializer):
     """Lightweight serializer for post lists."""
     
     author = UserListSerializer(read_only=True)
@@ -35,21 +65,13 @@ class PostListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = [
-            'id', 'title', 'author', 'category', 'category_name',
+            'id', 'title', 'excerpt', 'author', 'category', 'category_name',
             'upvotes_count', 'comments_count', 'is_pinned',
             'user_vote', 'created_at', 'updated_at'
         ]
 
-    def get_user_vote(self, obj):
-        """Get current user's vote on this post."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            vote = Vote.objects.filter(user=request.user, post=obj).first()
-            return vote.value if vote else None
-        return None
-
 
-class PostDetailSerializer(serializers.ModelSerializer):
+class PostDetailSerializer(VoteStateMixin, serializers.ModelSerializer):
     """Detailed serializer for individual posts."""
     
     author = UserListSerializer(read_only=True)
@@ -65,14 +87,6 @@ class PostDetailSerializer(serializers.ModelSerializer):
             'user_vote', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'author', 'upvotes_count', 'comments_count', 'created_at', 'updated_at']
-    
-    def get_user_vote(self, obj):
-        """Get current user's vote on this post."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            vote = Vote.objects.filter(user=request.user, post=obj).first()
-            return vote.value if vote else None
-        return None
 
 
 class PostCreateSerializer(serializers.ModelSerializer):
@@ -87,12 +101,13 @@ class PostCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(VoteStateMixin, serializers.ModelSerializer):
     """Serializer for comments."""
     
+    vote_target = 'comment'
+    
     author = UserListSerializer(read_only=True)
     user_vote = serializers.SerializerMethodField()
-    replies_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Comment
@@ -101,18 +116,15 @@ class CommentSerializer(serializers.ModelSerializer):
             'upvotes_count', 'replies_count', 'user_vote',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'author', 'post', 'upvotes_count', 'created_at', 'updated_at']
-    
-    def get_user_vote(self, obj):
-        """Get current user's vote on this comment."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            vote = Vote.objects.filter(user=request.user, comment=obj).first()
-            return vote.value if vote else None
-        return None
+        read_only_fields = [
+            'id', 'author', 'post', 'upvotes_count', 'replies_count', 'created_at', 'updated_at'
+        ]
     
-    def get_replies_count(self, obj):
-        return obj.replies.count()
+    def validate_parent(self, value):
+        # Path, depth and reply counts are only maintained on create
+        if self.instance is not None and value != self.instance.parent:
+            raise serializers.ValidationError('A comment cannot be moved to another parent.')
+        return value
 
 
 class VoteSerializer(serializers.ModelSerializer):
@@ -0,0 +1,91 @@
+"""
+Django signals for keeping discussion counters and cached reads in sync.
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Category, Post, Comment
+from .counters import adjust_category_posts_count
+from .cache import invalidate_all, invalidate_post
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_category(sender, instance, raw=False, **kwargs):
+    """Record the stored category so a move can be detected after saving."""
+    if raw or instance._state.adding or instance.pk is None:
+        instance._previous_category_id = None
+        return
+    
+    instance._previous_category_id = (
+        Post.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Post)
+def update_category_posts_count(sender, instance, created, raw=False, **kwargs):
+    """Keep Category.posts_count correct when posts are created or moved."""
+    if raw:
+        return
+    
+    if created:
+        adjust_category_posts_count(instance.category_id, 1)
+        return
+    
+    previous = getattr(instance, '_previous_category_id', None)
+    if previous != instance.category_id:
+        adjust_category_posts_count(previous, -1)
+        adjust_category_posts_count(instance.category_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def decrement_category_posts_count(sender, instance, **kwargs):
+    """
+    Decrement the category counter when a post is deleted.
+    
+    Deleting a category sets its posts' category to NULL through the
+    on_delete=SET_NULL path, which issues a bulk UPDATE without signals.
+    The category row is gone at that point, so there is nothing to adjust.
+    """
+    adjust_category_posts_count(instance.category_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, raw=False, **kwargs):
+    """Expire cached reads showing the post (both categories after a move)."""
+    if raw:
+        return
+    
+    category_ids = {instance.category_id, getattr(instance, '_previous_category_id', None)}
+    invalidate_post(instance.pk, category_ids)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    invalidate_post(instance.pk, [instance.category_id])
+
+
+@receiver(post_save, sender=Comment)
+def invalidate_saved_comment(sender, instance, created, raw=False, **kwargs):
+    """New comments change the post's counters in lists; edits only its detail."""
+    if raw:
+        return
+    
+    invalidate_post(instance.post_id, detail_only=not created)
+
+
+@receiver(post_delete, sender=Comment)
+def invalidate_deleted_comment(sender, instance, **kwargs):
+    """
+    Cascades merge into the transaction's single bump; when the post itself
+    is being deleted its own signal supplies the category, so no lookup runs.
+    """
+    invalidate_post(instance.post_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category(sender, instance, raw=False, **kwargs):
+    """Categories are embedded in every post, so expire all cached reads."""
+    if raw:
+        return
+    
+    invalidate_all()
@@ -1,11 +1,29 @@
 """
 Tests for discussions app.
 """
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import skipIf
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
-from apps.discussions.models import Category, Post, Comment, Vote
+from rest_framework.renderers import JSONRenderer
+from apps.discussions.models import Category, Post, Comment, Vote, PendingVoteDelta
+from apps.discussions import counters, votes
+from apps.discussions.cache import get_stats
+from apps.discussions.fast_serializers import post_list_values, serialize_post_rows
+from apps.discussions.serializers import PostListSerializer
+from apps.discussions.counters import refresh_category_posts_count
+from apps.discussions.transfer import export_records, import_jsonl, write_jsonl
+from apps.discussions.trending import compute_trending_score, recompute_trending_scores
+from apps.discussions.votes import flush_pending_deltas
 
 User = get_user_model()
 
@@ -53,3 +71,1004 @@ class PostTests(TestCase):
         # Check vote was recorded
         vote_exists = Vote.objects.filter(user=self.user, post=post).exists()
         self.assertTrue(vote_exists)
+
+
+class UserVoteResolutionTests(TestCase):
+    """Test user_vote is resolved for a whole page at once."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='voter@pucit.edu.pk',
+            password='TestPass123!',
+            is_verified=True
+        )
+        self.posts = [
+            Post.objects.create(author=self.user, title=f'Post {i}', content='Content')
+            for i in range(5)
+        ]
+        Vote.objects.create(user=self.user, post=self.posts[0], value=1)
+        Vote.objects.create(user=self.user, post=self.posts[1], value=-1)
+        self.client.force_authenticate(user=self.user)
+    
+    def test_post_list_resolves_votes_in_one_query(self):
+        """Test the post list loads the user's votes with a single query."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/discussions/posts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        votes = {post['id']: post['user_vote'] for post in response.data['results']}
+        self.assertEqual(votes[self.posts[0].id], 1)
+        self.assertEqual(votes[self.posts[1].id], -1)
+        self.assertIsNone(votes[self.posts[2].id])
+        
+        vote_queries = [q for q in queries.captured_queries if '"votes"' in q['sql']]
+        self.assertEqual(len(vote_queries), 1)
+
+
+class CategoryPostsCountTests(TestCase):
+    """Test Category.posts_count is maintained incrementally."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='author@pucit.edu.pk',
+            password='TestPass123!',
+            is_verified=True
+        )
+        self.general = Category.objects.create(name='General', slug='general')
+        self.courses = Category.objects.create(name='Courses', slug='courses')
+    
+    def assertCounts(self, general, courses):
+        self.general.refresh_from_db()
+        self.courses.refresh_from_db()
+        self.assertEqual(self.general.posts_count, general)
+        self.assertEqual(self.courses.posts_count, courses)
+    
+    def test_create_move_and_delete(self):
+        """Test the counter follows creates, moves and deletes."""
+        post = Post.objects.create(
+            author=self.user, category=self.general, title='Post', content='Content'
+        )
+        self.assertCounts(1, 0)
+        
+        post.category = self.courses
+        post.save()
+        self.assertCounts(0, 1)
+        
+        post.category = None
+        post.save()
+        self.assertCounts(0, 0)
+        
+        post.category = self.general
+        post.save()
+        post.delete()
+        self.assertCounts(0, 0)
+    
+    def test_refresh_repairs_drift(self):
+        """Test the repair pass fixes counters changed behind our back."""
+        Post.objects.create(author=self.user, category=self.general, title='Post', content='Content')
+        Category.objects.filter(id=self.general.id).update(posts_count=7)
+        Category.objects.filter(id=self.courses.id).update(posts_count=3)
+        
+        self.assertEqual(refresh_category_posts_count(), 2)
+        self.assertCounts(1, 0)
+
+
+class PostCursorPaginationTests(TestCase):
+    """Test keyset pagination of the post feed."""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='reader@pucit.edu.pk',
+            password='TestPass123!',
+            is_verified=True
+        )
+        self.category = Category.objects.create(name='General', slug='general')
+        self.posts = [
+            Post.objects.create(
+                author=self.user,
+                category=self.category if i % 2 else None,
+                title=f'Post {i}',
+                content='Content',
+                upvotes_count=i % 3,
+            )
+            for i in range(8)
+        ]
+    
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(post['id'] for post in response.data['results'])
+            url = response.data['next']
+        return ids
+    
+    def test_walk_popular_with_ties(self):
+        """Test every post is returned once, in popular order, across pages."""
+        ids = self.walk('/api/discussions/posts/?pagination=cursor&ordering=popular&page_size=3')
+        expected = list(
+            Post.objects.order_by('-upvotes_count', '-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+    
+    def test_walk_category_latest(self):
+        """Test the category filter is applied on every page."""
+        ids = self.walk('/api/discussions/posts/?pagination=cursor&category=general&page_size=2')
+        expected = list(
+            Post.objects.filter(category=self.category)
+            .order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+    
+    def test_cursor_bounds_leading_key(self):
+        """Test the cursor filter has a range bound the index can seek to."""
+        first_page = self.client.get('/api/discussions/posts/?pagination=cursor&ordering=popular&page_size=3')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first_page.data['next'])
+        
+        sql = next(q['sql'] for q in queries if 'FROM "posts"' in q['sql'])
+        where = sql.split(' WHERE ', 1)[1]
+        # The bound is ANDed outside the OR of lexicographic conditions
+        self.assertRegex(where, r'^\(?"posts"\."upvotes_count" <= ')
+    
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected."""
+        response = self.client.get('/api/discussions/posts/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TrendingScoreTests(TestCase):
+    """Test the stored, time-decayed trending score."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='trend@pucit.edu.pk',
+            password='TestPass123!',
+            is_verified=True
+        )
+        self.client.force_authenticate(user=self.user)
+    
+    def test_vote_bumps_score(self):
+        """Test a vote updates the stored score along with the counter."""
+        post = Post.objects.create(author=self.user, title='Post', content='Content')
+        self.client.post(f'/api/discussions/posts/{post.id}/vote/', {'value': 1}, format='json')
+        
+        post.refresh_from_db()
+        self.assertEqual(post.upvotes_count, 1)
+        self.assertAlmostEqual(
+            post.trending_score,
+            compute_trending_score(1, 0, post.created_at),
+            places=4
+        )
+    
+    def test_recompute_decays_and_orders(self):
+        """Test the periodic job ranks fresh activity above old activity."""
+        old = Post.objects.create(author=self.user, title='Old', content='Content', upvotes_count=10)
+        fresh = Post.objects.create(author=self.user, title='Fresh', content='Content', upvotes_count=3)
+        stale = Post.objects.create(author=self.user, title='Stale', content='Content', trending_score=5)
+        Post.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=2))
+        Post.objects.filter(id=stale.id).update(created_at=timezone.now() - timedelta(days=30))
+        
+        self.assertEqual(recompute_trending_scores(chunk_size=1), 2)
+        
+        stale.refresh_from_db()
+        self.assertEqual(stale.trending_score, 0)
+        
+        response = self.client.get('/api/discussions/posts/trending/')
+        self.assertEqual([post['id'] for post in response.data][:2], [fresh.id, old.id])
+    
+    def test_command_expires_cached_category_feeds(self):
+        """Test a cached category trending list is reordered after the command runs."""
+        cache.clear()
+        category = Category.objects.create(name='News', slug='news')
+        old = Post.objects.create(
+            author=self.user, category=category, title='Old', content='Content',
+            upvotes_count=10, trending_score=100
+        )
+        fresh = Post.objects.create(author=self.user, category=category, title='Fresh', content='Content', upvotes_count=1)
+        Post.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=6))
+        self.client.force_authenticate(user=None)
+        url = '/api/discussions/posts/?ordering=trending&category=news'
+        
+        response = self.client.get(url)
+        self.assertEqual([post['id'] for post in response.data['results']], [old.id, fresh.id])
+        
+        call_command('recompute_trending', stdout=StringIO())
+        
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual([post['id'] for post in response.data['results']], [fresh.id, old.id])
+
+
+class CommentTreeTests(TestCase):
+    """Test threaded comment loading."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='thread@pucit.edu.pk',
+            password='TestPass123!',
+            is_verified=True
+        )
+        self.post = Post.objects.create(author=self.user, title='Post', content='Content')
+        self.client.force_authenticate(user=self.user)
+    
+    def comment(self, parent=None):
+        response = self.client.post(
+            f'/api/discussions/posts/{self.post.id}/comments/',
+            {'content': 'Reply', 'parent': parent.id if parent else None},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Comment.objects.get(id=response.data['id'])
+    
+    def test_path_and_counters(self):
+        """Test paths, depths and reply counts are stored on create."""
+        root = self.comment()
+        child = self.comment(root)
+        grandchild = self.comment(child)
+        
+        root.refresh_from_db()
+        self.assertEqual(grandchild.depth, 2)
+        self.assertTrue(grandchild.path.startswith(child.path))
+        self.assertTrue(child.path.startswith(root.path))
+        self.assertEqual(root.replies_count, 1)
+    
+    def test_tree_is_nested_in_constant_queries(self):
+        """Test the tree endpoint nests replies without per-comment queries."""
+        root = self.comment()
+        child = self.comment(root)
+        self.comment(child)
+        self.comment()
+        url = f'/api/discussions/posts/{self.post.id}/comments/tree/'
+        
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        for _ in range(5):
+            self.comment(child)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+        
+        self.assertEqual(len(small), len(large))
+        tree = response.data['comments']
+        self.assertEqual([node['id'] for node in tree][0], root.id)
+        self.assertEqual(tree[0]['replies'][0]['id'], child.id)
+        self.assertEqual(len(tree[0]['replies'][0]['replies']), 6)
+    
+    def test_collapse_and_expand(self):
+        """Test large subtrees collapse and can be expanded by root."""
+        root = self.comment()
+        for _ in range(3):
+            self.comment(root)
+        url = f'/api/discussions/posts/{self.post.id}/comments/tree/'
+        
+        response = self.client.get(url, {'collapse': 2})
+        node = response.data['comments'][0]
+        self.assertTrue(node['collapsed'])
+        self.assertTrue(node['has_more_replies'])
+        self.assertEqual(node['replies'], [])
+        
+        response = self.client.get(url, {'collapse': 2, 'root': root.id})
+        node = response.data['comments'][0]
+        self.assertFalse(node['collapsed'])
+        self.assertEqual(len(node['replies']), 3)
+    
+    def test_invalid_root(self):
+        """Test a non-numeric root is rejected instead of erroring."""
+        url = f'/api/discussions/posts/{self.post.id}/comments/tree/'
+        response = self.client.get(url, {'root': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_max_depth(self):
+        """Test replies below the deepest level are rejected and paths fit."""
+        parent = None
+        for _ in range(Comment.MAX_DEPTH + 1):
+            parent = self.comment(parent)
+        self.assertEqual(parent.depth, Comment.MAX_DEPTH)
+        self.assertLessEqual(len(parent.path), Comment._meta.get_field('path').max_length)
+        
+        response = self.client.post(
+            f'/api/discussions/posts/{self.post.id}/comments/',
+            {'content': 'Too deep', 'parent': parent.id},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_parent_cannot_change(self):
+        """Test an update cannot move a comment under another parent."""
+        root = self.comment()
+        other = self.comment()
+        
+        response = self.client.patch(
+            f'/api/discussions/comments/{other.id}/', {'parent': root.id}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        other.refresh_from_db()
+        self.assertIsNone(other.parent_id)
+        
+        response = self.client.patch(
+            f'/api/discussions/comments/{other.id}/', {'content': 'Edited'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class VoteEngineTests(TestCase):
+    """Test vote toggle/change semantics and counter consistency."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='engine@pucit.edu.pk',
+            password='TestPass123!',
+            is_verified=True
+        )
+        self.post = Post.objects.create(author=self.user, title='Post', content='Content')
+        self.client.force_authenticate(user=self.user)
+        self.url = f'/api/discussions/posts/{self.post.id}/vote/'
+    
+    def test_create_change_and_toggle(self):
+        """Test the response carries the new count and vote state."""
+        response = self.client.post(self.url, {'value': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['upvotes_count'], response.data['user_vote']), (1, 1))
+        
+        response = self.client.post(self.url, {'value': -1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['upvotes_count'], response.data['user_vote']), (-1, -1))
+        
+        response = self.client.post(self.url, {'value': -1}, format='json')
+        self.assertEqual((response.data['upvotes_count'], response.data['user_vote']), (0, None))
+        self.assertFalse(Vote.objects.filter(post=self.post).exists())
+    
+    def test_missing_target_and_invalid_value(self):
+        """Test bad requests do not touch any rows."""
+        response = self.client.post('/api/discussions/posts/999999/vote/', {'value': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(self.url, {'value': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Vote.objects.exists())
+
+
+@skipIf(connection.vendor == 'sqlite', 'SQLite serializes writers at the database level')
+class ConcurrentVoteTests(TransactionTestCase):
+    """Test concurrent votes for the same (user, target) pair."""
+    
+    def test_concurrent_votes_keep_counter_consistent(self):
+        """Test racing double-clicks leave the counter equal to the vote sum."""
+        user = User.objects.create_user(email='racer@pucit.edu.pk', password='TestPass123!')
+        post = Post.objects.create(author=user, title='Post', content='Content')
+        workers = 8
+        barrier = threading.Barrier(workers)
+        errors = []
+        
+        def vote(value):
+            try:
+                barrier.wait()
+                votes.apply_vote(user, 'post', post.id, value)
+            except Exception as exc:  # pragma: no cover - reported below
+                errors.append(exc)
+            finally:
+                connection.close()
+        
+        threads = [
+            threading.Thread(target=vote, args=(1 if i % 3 else -1,))
+            for i in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        post.refresh_from_db()
+        vote_sum = sum(Vote.objects.filter(post=post).values_list('value', flat=True))
+        self.assertEqual(post.upvotes_count, vote_sum)
+        self.assertLessEqual(Vote.objects.filter(post=post).count(), 1)
+
+
+@override_settings(VOTE_COUNTERS_WRITE_BEHIND=True)
+class WriteBehindVoteTests(TestCase):
+    """Test buffered vote counters."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.users = [
+            User.objects.create_user(email=f'wb{i}@pucit.edu.pk', password='TestPass123!')
+            for i in range(3)
+        ]
+        self.post = Post.objects.create(author=self.users[0], title='Post', content='Content')
+    
+    def vote(self, user, value):
+        self.client.force_authenticate(user=user)
+        return self.client.post(f'/api/discussions/posts/{self.post.id}/vote/', {'value': value}, format='json')
+    
+    def test_votes_are_buffered_and_read_back(self):
+        """Test votes skip the post row but reads include pending deltas."""
+        for user in self.users:
+            response = self.vote(user, 1)
+        self.assertEqual(response.data['upvotes_count'], 3)
+        
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.upvotes_count, 0)
+        self.assertEqual(PendingVoteDelta.objects.count(), 3)
+        
+        response = self.client.get(f'/api/discussions/posts/{self.post.id}/')
+        self.assertEqual(response.data['upvotes_count'], 3)
+        response = self.client.get('/api/discussions/posts/')
+        self.assertEqual(response.data['results'][0]['upvotes_count'], 3)
+    
+    def test_flush_merges_deltas(self):
+        """Test a flush applies merged deltas and empties the buffer."""
+        self.vote(self.users[0], 1)
+        self.vote(self.users[1], -1)
+        self.vote(self.users[2], 1)
+        self.vote(self.users[2], 1)
+        
+        self.assertEqual(flush_pending_deltas(batch_size=3), 3)
+        self.assertEqual(flush_pending_deltas(), 1)
+        self.assertEqual(flush_pending_deltas(), 0)
+        
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.upvotes_count, 0)
+        self.assertFalse(PendingVoteDelta.objects.exists())
+        
+        self.vote(self.users[2], 1)
+        flush_pending_deltas()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.upvotes_count, 1)
+        self.assertGreater(self.post.trending_score, 0)
+
+
+class ResponseCacheTests(TestCase):
+    """Test the versioned response cache for anonymous reads."""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='cache@pucit.edu.pk', password='TestPass123!')
+        # Committed, so writes in the tests start a new invalidation batch
+        with self.captureOnCommitCallbacks(execute=True):
+            self.news = Category.objects.create(name='News', slug='news')
+            self.help = Category.objects.create(name='Help', slug='help')
+            self.post = Post.objects.create(author=self.user, category=self.news, title='Post', content='Content')
+    
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+    
+    def test_anonymous_reads_are_cached(self):
+        """Test repeated anonymous reads are served from the cache."""
+        url = f'/api/discussions/posts/{self.post.id}/'
+        self.assertEqual(self.get(url)['X-Cache'], 'MISS')
+        # Only the conditional GET validator lookup hits the database
+        with self.assertNumQueries(1):
+            response = self.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['title'], 'Post')
+        self.assertEqual(get_stats()['post-detail'], {'hits': 1, 'misses': 1})
+    
+    def test_query_params_are_normalized(self):
+        """Test parameter order and empty values do not split the cache."""
+        self.get('/api/discussions/posts/?category=news&ordering=popular')
+        response = self.get('/api/discussions/posts/?ordering=popular&search=&category=news')
+        self.assertEqual(response['X-Cache'], 'HIT')
+    
+    def test_authenticated_reads_bypass_cache(self):
+        """Test authenticated users always get their own fresh response."""
+        self.client.force_authenticate(user=self.user)
+        response = self.get('/api/discussions/posts/')
+        self.assertNotIn('X-Cache', response)
+    
+    def test_writes_bump_versions(self):
+        """Test posts, comments and votes invalidate the reads showing them."""
+        self.get('/api/discussions/posts/')
+        self.get('/api/discussions/posts/?category=help')
+        self.get('/api/discussions/categories/')
+        
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                f'/api/discussions/posts/{self.post.id}/comments/', {'content': 'Hi'}, format='json'
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/discussions/posts/{self.post.id}/vote/', {'value': 1}, format='json')
+        self.client.force_authenticate(user=None)
+        
+        response = self.get('/api/discussions/posts/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['comments_count'], 1)
+        self.assertEqual(response.data['results'][0]['upvotes_count'], 1)
+        
+        # Other categories keep their cached feeds
+        self.assertEqual(self.get('/api/discussions/posts/?category=help')['X-Cache'], 'HIT')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(author=self.user, category=self.help, title='Other', content='Content')
+        response = self.get('/api/discussions/posts/?category=help')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['results']), 1)
+        response = self.get('/api/discussions/categories/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+    
+    def test_cascade_delete_bumps_once(self):
+        """Test deleting a thread registers one bump with a fixed query count."""
+        self.get('/api/discussions/posts/?category=news')
+        for count in (2, 10):
+            with self.captureOnCommitCallbacks(execute=True):
+                root = Comment.objects.create(post=self.post, author=self.user, content='Root')
+                for _ in range(count):
+                    Comment.objects.create(post=self.post, author=self.user, content='Reply', parent=root)
+            
+            with self.captureOnCommitCallbacks() as callbacks:
+                root.delete()
+            self.assertEqual(len(callbacks), 1)
+            with self.assertNumQueries(2):
+                callbacks[0]()
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, author=self.user, content='Left behind')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.post.delete()
+        self.assertEqual(len(callbacks), 1)
+        # The deleted post's category is known, so only the slug is looked up
+        with self.assertNumQueries(1):
+            callbacks[0]()
+        self.assertEqual(self.get('/api/discussions/posts/?category=news')['X-Cache'], 'MISS')
+    
+    def test_category_change_expires_everything(self):
+        """Test renaming a category invalidates posts embedding it."""
+        url = f'/api/discussions/posts/{self.post.id}/'
+        self.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.news.name = 'Announcements'
+            self.news.save()
+        response = self.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['category_name'], 'Announcements')
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag / Last-Modified revalidation of post endpoints."""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='etag@pucit.edu.pk', password='TestPass123!')
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = Post.objects.create(author=self.user, title='Post', content='Content')
+        self.detail_url = f'/api/discussions/posts/{self.post.id}/'
+        self.comments_url = f'/api/discussions/posts/{self.post.id}/comments/'
+    
+    def test_matching_etag_returns_304(self):
+        """Test a revalidation with the current ETag skips serialization."""
+        for url in (self.detail_url, self.comments_url):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('Last-Modified', response)
+            
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertIn('Authorization', response['Vary'])
+    
+    def test_changes_invalidate_etag(self):
+        """Test comments, votes and comment votes change the ETag."""
+        etag = self.client.get(self.comments_url)['ETag']
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.comments_url, {'content': 'First'}, format='json')
+        response = self.client.get(self.comments_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        
+        comment = Comment.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/discussions/comments/{comment.id}/vote/', {'value': 1}, format='json')
+        response = self.client.get(self.comments_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['upvotes_count'], 1)
+    
+    def test_if_modified_since_alone_is_not_trusted(self):
+        """Test a vote is not hidden behind If-Modified-Since."""
+        last_modified = self.client.get(self.detail_url)['Last-Modified']
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/discussions/posts/{self.post.id}/vote/', {'value': 1}, format='json')
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['upvotes_count'], 1)
+    
+    def test_etag_follows_database_not_cache_version(self):
+        """Test vote changes made by another worker still change the ETag."""
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = Comment.objects.create(post=self.post, author=self.user, content='First')
+        etag = self.client.get(self.comments_url)['ETag']
+        
+        # Another worker's cache version bump never reaches this process
+        Comment.objects.filter(id=comment.id).update(upvotes_count=1)
+        response = self.client.get(self.comments_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        
+        PendingVoteDelta.objects.create(comment_id=comment.id, delta=1)
+        response = self.client.get(self.comments_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        
+        Vote.objects.create(user=self.user, comment=comment, value=1)
+        response = self.client.get(self.comments_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_etag_depends_on_user_and_query(self):
+        """Test other users and other pages do not share an ETag."""
+        etag = self.client.get(self.comments_url)['ETag']
+        self.assertNotEqual(self.client.get(self.comments_url + '?page=1')['ETag'], etag)
+        
+        self.client.force_authenticate(user=None)
+        response = self.client.get(self.comments_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_missing_post_returns_404(self):
+        """Test unknown posts are not answered with validators."""
+        response = self.client.get('/api/discussions/posts/999999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', response)
+
+
+class FastPostListTests(TestCase):
+    """Test the `.values()` post list path matches PostListSerializer."""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='fast@pucit.edu.pk', password='TestPass123!', first_name='Fast', last_name=''
+        )
+        User.objects.filter(id=self.user.id).update(profile_picture='profile_pictures/me.png')
+        category = Category.objects.create(name='News', slug='news', description='All news')
+        Post.objects.create(author=self.user, category=category, title='With category', content='Content')
+        post = Post.objects.create(author=self.user, title='Without category', content='Content')
+        Vote.objects.create(user=self.user, post=post, value=-1)
+    
+    def render_both(self, request):
+        queryset = Post.objects.order_by('-created_at', '-id')
+        posts = list(queryset.select_related('author', 'category').defer('content'))
+        rows = list(post_list_values(queryset))
+        renderer = JSONRenderer()
+        model_output = renderer.render(PostListSerializer(posts, many=True, context={
+            'request': request, **votes.vote_context(self.user, posts),
+        }).data)
+        fast_output = renderer.render(serialize_post_rows(rows, {
+            'request': request, **votes.vote_context(self.user, rows),
+        }))
+        return model_output, fast_output
+    
+    def test_output_is_byte_identical(self):
+        """Test both paths render the same bytes, with and without a request."""
+        request = RequestFactory().get('/api/discussions/posts/')
+        for req in (request, None):
+            model_output, fast_output = self.render_both(req)
+            self.assertEqual(model_output, fast_output)
+        self.assertIn(b'"user_vote":-1', fast_output)
+    
+    @override_settings(VOTE_COUNTERS_WRITE_BEHIND=True)
+    def test_pending_votes_are_included(self):
+        """Test buffered vote deltas are added like the model serializer does."""
+        PendingVoteDelta.objects.create(post_id=Post.objects.first().id, delta=3)
+        model_output, fast_output = self.render_both(None)
+        self.assertEqual(model_output, fast_output)
+    
+    def test_list_does_not_load_content(self):
+        """Test the list endpoint only selects the columns it returns."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/discussions/posts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertFalse(any('"content"' in query['sql'] for query in queries.captured_queries))
+
+
+class TransferTests(TestCase):
+    """Test JSONL export and import of discussions."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(email='export@pucit.edu.pk', password='TestPass123!')
+        self.category = Category.objects.create(name='News', slug='news')
+        self.post = Post.objects.create(author=self.user, category=self.category, title='Post', content='Content')
+        root = Comment.objects.create(post=self.post, author=self.user, content='Root')
+        reply = Comment.objects.create(post=self.post, author=self.user, content='Reply', parent=root)
+        Comment.objects.create(post=self.post, author=self.user, content='Nested', parent=reply)
+        Vote.objects.create(user=self.user, post=self.post, value=1)
+        Vote.objects.create(user=self.user, comment=reply, value=-1)
+    
+    def export(self):
+        stream = StringIO()
+        write_jsonl(export_records(), stream)
+        stream.seek(0)
+        return stream
+    
+    def test_round_trip_remaps_and_rebuilds(self):
+        """Test an import into the same database duplicates posts with new ids."""
+        old_created_at = Post.objects.get().created_at
+        importer = import_jsonl(self.export(), batch_size=2)
+        
+        self.assertEqual(importer.counts['post'], 1)
+        self.assertEqual(importer.counts['comment'], 3)
+        self.assertEqual(importer.skipped['user'], 1)
+        self.assertEqual(importer.skipped['category'], 1)
+        
+        post = Post.objects.exclude(id=self.post.id).get()
+        self.assertEqual(post.category_id, self.category.id)
+        self.assertEqual(post.created_at, old_created_at)
+        self.assertEqual(post.comments_count, 3)
+        self.assertEqual(post.upvotes_count, 1)
+        
+        comments = list(post.comments.order_by('depth'))
+        self.assertEqual([c.depth for c in comments], [0, 1, 2])
+        self.assertTrue(comments[2].path.startswith(comments[1].path))
+        self.assertEqual(comments[1].replies_count, 1)
+        self.assertEqual(comments[1].upvotes_count, -1)
+        
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.posts_count, 2)
+    
+    def test_duplicate_votes_are_counted_as_skipped(self):
+        """Test votes that already exist are not reported as imported."""
+        stream = self.export()
+        lines = stream.getvalue().splitlines()
+        votes = [line for line in lines if '"type":"vote"' in line]
+        importer = import_jsonl(StringIO('\n'.join(lines + votes)), batch_size=1)
+        
+        self.assertEqual(importer.counts['vote'], 2)
+        self.assertEqual(importer.skipped['vote'], 2)
+        self.assertEqual(Vote.objects.count(), 4)
+    
+    def test_import_creates_missing_users(self):
+        """Test authors unknown to the target are created without a password."""
+        stream = self.export()
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        
+        import_jsonl(stream)
+        user = User.objects.get()
+        self.assertEqual(user.email, 'export@pucit.edu.pk')
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(Post.objects.get().author, user)
+
+
+class ReconcileCountersTests(TestCase):
+    """Test chunked counter reconciliation."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='reconcile@pucit.edu.pk', password='TestPass123!')
+        self.category = Category.objects.create(name='News', slug='news')
+        self.posts = [
+            Post.objects.create(author=self.user, category=self.category, title=f'Post {i}', content='Content')
+            for i in range(3)
+        ]
+        self.comment = Comment.objects.create(post=self.posts[0], author=self.user, content='Root')
+        Comment.objects.create(post=self.posts[0], author=self.user, content='Reply', parent=self.comment)
+        Vote.objects.create(user=self.user, post=self.posts[1], value=1)
+        Vote.objects.create(user=self.user, comment=self.comment, value=-1)
+        
+        # Simulate drift everywhere
+        Post.objects.update(comments_count=7, upvotes_count=7)
+        Comment.objects.update(upvotes_count=7, replies_count=7)
+        Category.objects.update(posts_count=7)
+    
+    def reconcile(self, name, **kwargs):
+        return list(counters.reconcile_counters(name, chunk_size=2, **kwargs))
+    
+    def test_dry_run_reports_without_fixing(self):
+        """Test a dry run lists drifted rows and writes nothing."""
+        rows = self.reconcile('posts', dry_run=True)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['comments_count'], (7, 2))
+        self.assertEqual(Post.objects.get(id=self.posts[0].id).comments_count, 7)
+    
+    def test_reconcile_fixes_only_drifted_rows(self):
+        """Test every counter is recomputed and a second run finds nothing."""
+        for name in counters.COUNTER_MODELS:
+            self.assertTrue(self.reconcile(name))
+        
+        self.assertEqual(
+            list(Post.objects.order_by('id').values_list('comments_count', 'upvotes_count')),
+            [(2, 0), (0, 1), (0, 0)]
+        )
+        self.comment.refresh_from_db()
+        self.assertEqual((self.comment.upvotes_count, self.comment.replies_count), (-1, 1))
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.posts_count, 3)
+        
+        for name in counters.COUNTER_MODELS:
+            self.assertEqual(self.reconcile(name), [])
+    
+    def test_reconcile_rescores_trending(self):
+        """Test fixed posts get a trending score from the corrected counters."""
+        self.reconcile('posts')
+        
+        for post in Post.objects.all():
+            self.assertAlmostEqual(
+                post.trending_score,
+                compute_trending_score(post.upvotes_count, post.comments_count, post.created_at),
+                places=4
+            )
+    
+    def test_pending_deltas_are_not_counted_twice(self):
+        """Test buffered write-behind deltas are left for the flusher."""
+        PendingVoteDelta.objects.create(post_id=self.posts[1].id, delta=1)
+        self.reconcile('posts')
+        self.assertEqual(Post.objects.get(id=self.posts[1].id).upvotes_count, 0)
+    
+    def test_comment_delete_subtracts_replies(self):
+        """Test deleting a comment removes its whole subtree from comments_count."""
+        self.reconcile('posts')
+        self.client.force_authenticate(user=self.user)
+        response = self.client.delete(f'/api/discussions/comments/{self.comment.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Post.objects.get(id=self.posts[0].id).comments_count, 0)
+
+
+class PostExcerptTests(TestCase):
+    """Test stored post excerpts."""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='excerpt@pucit.edu.pk', password='TestPass123!')
+    
+    def test_excerpt_is_plain_and_bounded(self):
+        """Test tags are stripped, whitespace collapsed and length capped."""
+        post = Post.objects.create(
+            author=self.user, title='Post', content='<p>Hello\n\n  <b>world</b></p>' + ' word' * 100
+        )
+        self.assertTrue(post.excerpt.startswith('Hello world word'))
+        self.assertLessEqual(len(post.excerpt), Post.EXCERPT_LENGTH)
+        self.assertTrue(post.excerpt.endswith('…'))
+    
+    def test_excerpt_follows_content(self):
+        """Test edits through save(update_fields=...) refresh the excerpt."""
+        post = Post.objects.create(author=self.user, title='Post', content='Old text')
+        post.content = 'New text'
+        post.save(update_fields=['content'])
+        self.assertEqual(Post.objects.get(id=post.id).excerpt, 'New text')
+    
+    def test_list_returns_excerpt(self):
+        """Test feeds expose the excerpt but not the content."""
+        Post.objects.create(author=self.user, title='Post', content='Preview me')
+        result = self.client.get('/api/discussions/posts/').data['results'][0]
+        self.assertEqual(result['excerpt'], 'Preview me')
+        self.assertNotIn('content', result)
+
+
+class CommentCursorPaginationTests(TestCase):
+    """Test keyset pagination of a post's comments in both directions."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='pager@pucit.edu.pk', password='TestPass123!')
+        self.post = Post.objects.create(author=self.user, title='Post', content='Content')
+        self.comments = [
+            Comment.objects.create(post=self.post, author=self.user, content=f'Comment {i}', upvotes_count=i % 3)
+            for i in range(7)
+        ]
+        self.url = f'/api/discussions/posts/{self.post.id}/comments/?pagination=cursor&page_size=3'
+    
+    def walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([comment['id'] for comment in response.data['results']])
+            url = response.data[link]
+        return pages, response.data
+    
+    def expected(self, *ordering):
+        return list(Comment.objects.filter(post=self.post).order_by(*ordering).values_list('id', flat=True))
+    
+    def test_orders(self):
+        """Test each ordering returns every comment once, in order."""
+        for ordering, fields in [
+            ('newest', ('-created_at', '-id')),
+            ('oldest', ('created_at', 'id')),
+            ('top', ('-upvotes_count', '-created_at', '-id')),
+        ]:
+            pages, _ = self.walk(f'{self.url}&ordering={ordering}', 'next')
+            self.assertEqual(sum(pages, []), self.expected(*fields))
+    
+    def test_walk_back(self):
+        """Test previous links walk back through the same pages."""
+        forward, last = self.walk(f'{self.url}&ordering=top', 'next')
+        self.assertEqual([len(page) for page in forward], [3, 3, 1])
+        
+        backward, first = self.walk(last['previous'], 'previous')
+        self.assertEqual(backward, forward[-2::-1])
+        self.assertIsNone(first['previous'])
+        self.assertIsNotNone(first['next'])
+    
+    def test_first_page_has_no_previous(self):
+        """Test the first page does not link backwards."""
+        response = self.client.get(self.url)
+        self.assertIsNone(response.data['previous'])
+
+
+class VoteBatchTests(TestCase):
+    """Test the batch vote endpoint."""
+    
+    url = '/api/discussions/votes/batch/'
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='batch@pucit.edu.pk', password='TestPass123!')
+        self.client.force_authenticate(user=self.user)
+        self.posts = [
+            Post.objects.create(author=self.user, title=f'Post {i}', content='Content') for i in range(2)
+        ]
+        self.comment = Comment.objects.create(post=self.posts[0], author=self.user, content='Comment')
+    
+    def batch(self, votes):
+        return self.client.post(self.url, {'votes': votes}, format='json')
+    
+    def test_mixed_batch(self):
+        """Test per-item results, in-batch toggles and grouped counters."""
+        response = self.batch([
+            {'target': 'post', 'id': self.posts[0].id, 'value': 1},
+            {'target': 'post', 'id': self.posts[1].id, 'value': 1},
+            {'target': 'post', 'id': self.posts[1].id, 'value': 1},
+            {'target': 'comment', 'id': self.comment.id, 'value': -1},
+            {'target': 'post', 'id': self.posts[0].id, 'value': 5},
+            {'target': 'comment', 'id': 999999, 'value': 1},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        
+        self.assertEqual(
+            [result.get('message') for result in results],
+            ['Vote recorded', 'Vote recorded', 'Vote removed', 'Vote recorded', None, None]
+        )
+        self.assertEqual(results[0]['upvotes_count'], 1)
+        self.assertEqual(results[2]['upvotes_count'], 0)
+        self.assertIsNone(results[2]['user_vote'])
+        self.assertEqual(results[3]['upvotes_count'], -1)
+        self.assertEqual(results[4]['error'], 'Invalid vote')
+        self.assertEqual(results[5]['error'], 'Comment not found')
+        
+        self.assertEqual(
+            list(Post.objects.order_by('id').values_list('upvotes_count', flat=True)), [1, 0]
+        )
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.upvotes_count, -1)
+        self.assertEqual(Vote.objects.count(), 2)
+    
+    def test_matches_single_votes(self):
+        """Test a change from an existing vote behaves like the single endpoint."""
+        self.client.post(f'/api/discussions/posts/{self.posts[0].id}/vote/', {'value': 1}, format='json')
+        response = self.batch([{'target': 'post', 'id': self.posts[0].id, 'value': -1}])
+        result = response.data['results'][0]
+        self.assertEqual(result['message'], 'Vote updated')
+        self.assertEqual(result['upvotes_count'], -1)
+        self.assertEqual(result['user_vote'], -1)
+    
+    @override_settings(VOTE_COUNTERS_WRITE_BEHIND=True)
+    def test_write_behind_buffers_one_delta_per_target(self):
+        """Test buffered mode writes one merged delta row per target."""
+        response = self.batch([
+            {'target': 'post', 'id': self.posts[0].id, 'value': 1},
+            {'target': 'post', 'id': self.posts[0].id, 'value': -1},
+        ])
+        self.assertEqual(response.data['results'][1]['upvotes_count'], -1)
+        self.assertEqual(list(PendingVoteDelta.objects.values_list('delta', flat=True)), [-1])
+    
+    def test_rejects_bad_payloads(self):
+        """Test the batch must be a non-empty, bounded list."""
+        too_many = [{'target': 'post', 'id': 1, 'value': 1}] * (votes.MAX_BATCH_VOTES + 1)
+        for payload in ([], 'post', too_many):
+            response = self.batch(payload)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,76 @@
+"""
+Threaded comment loading for discussions app.
+
+Comments store a materialized `path` and `depth` (see Comment.save), so a
+whole thread, or a depth/size-bounded slice of it, is one range query over
+the (post, depth, path) index. Rows come back breadth-first, so when the
+size limit is hit the top of the thread is kept and deep branches are cut.
+"""
+from .models import Comment
+
+DEFAULT_MAX_DEPTH = 5
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 500
+DEFAULT_COLLAPSE_THRESHOLD = 20
+
+
+def load_thread(post_id, root=None, max_depth=DEFAULT_MAX_DEPTH, limit=DEFAULT_LIMIT):
+    """
+    Fetch a post's comments breadth-first, optionally below a root comment.
+    
+    Returns (comments, truncated) where `truncated` tells whether the size
+    limit cut the slice short.
+    """
+    queryset = Comment.objects.filter(post_id=post_id).select_related('author')
+    base_depth = 0
+    if root is not None:
+        queryset = queryset.filter(path__startswith=root.path)
+        base_depth = root.depth
+    
+    comments = list(
+        queryset.filter(depth__lte=base_depth + max_depth)
+        .order_by('depth', 'path')[:limit + 1]
+    )
+    return comments[:limit], len(comments) > limit
+
+
+def build_tree(comments, serialized, collapse_threshold=DEFAULT_COLLAPSE_THRESHOLD, root_id=None):
+    """
+    Nest serialized comments under their parents.
+    
+    `serialized` is the serializer output for `comments`, in the same order.
+    Nodes with more than `collapse_threshold` direct replies are returned
+    collapsed: their replies are dropped and can be fetched separately with
+    the node as root (the root itself is never collapsed). `has_more_replies` marks nodes whose replies are not
+    all included (collapsed, below the depth limit or past the size limit).
+    """
+    nodes = {}
+    roots = []
+    hidden = set()
+    
+    for comment, data in zip(comments, serialized):
+        if comment.parent_id in hidden:
+            hidden.add(comment.id)
+            continue
+        
+        node = dict(data)
+        node['depth'] = comment.depth
+        node['collapsed'] = (
+            comment.id != root_id and comment.replies_count > collapse_threshold
+        )
+        node['replies'] = []
+        if node['collapsed']:
+            hidden.add(comment.id)
+        
+        parent = nodes.get(comment.parent_id)
+        if parent is not None:
+            parent['replies'].append(node)
+        else:
+            roots.append(node)
+        nodes[comment.id] = node
+    
+    # Breadth-first rows are in path order, so replies are already oldest first
+    for node in nodes.values():
+        node['has_more_replies'] = node['replies_count'] > len(node['replies'])
+    
+    return roots
@@ -0,0 +1,327 @@
+"""
+Bulk export/import of discussions as JSON Lines.
+
+Each line is one record: {"type": "user" | "category" | "post" | "comment"
+| "vote", ...}. Records are written in dependency order (users, categories,
+posts, comments oldest first, votes), so an import can stream the file
+once. Ids in the file are source ids; on import they are remapped:
+users by email, categories by slug, posts and comments to their new ids.
+"""
+import json
+from contextlib import contextmanager
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from .models import Category, Post, Comment, Vote, make_excerpt
+from .counters import (
+    refresh_category_posts_count,
+    refresh_comment_counters,
+    refresh_post_counters,
+)
+
+User = get_user_model()
+
+EXPORT_FIELDS = {
+    'user': (User, ['id', 'email', 'first_name', 'last_name', 'role']),
+    'category': (Category, ['id', 'name', 'slug', 'description', 'created_at']),
+    'post': (Post, [
+        'id', 'author_id', 'category_id', 'title', 'content',
+        'is_pinned', 'is_locked', 'created_at', 'updated_at',
+    ]),
+    'comment': (Comment, [
+        'id', 'post_id', 'author_id', 'parent_id', 'content', 'created_at', 'updated_at',
+    ]),
+    'vote': (Vote, ['user_id', 'post_id', 'comment_id', 'value', 'created_at']),
+}
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def export_records(types=tuple(EXPORT_FIELDS), chunk_size=2000):
+    """
+    Yield export records one at a time.
+    
+    Rows are streamed with a server-side cursor where the database supports
+    it, so memory use does not grow with the table size.
+    """
+    for record_type in types:
+        model, fields = EXPORT_FIELDS[record_type]
+        rows = model.objects.order_by('id').values_list(*fields).iterator(chunk_size=chunk_size)
+        for row in rows:
+            yield {'type': record_type, **dict(zip(fields, row))}
+
+
+def _encode(value):
+    # Full isoformat; DjangoJSONEncoder would truncate to milliseconds
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f'Cannot serialize {type(value).__name__}')
+
+
+def write_jsonl(records, stream):
+    """Write records to a text stream. Returns the number written."""
+    count = 0
+    for record in records:
+        stream.write(json.dumps(record, default=_encode, separators=(',', ':')))
+        stream.write('\n')
+        count += 1
+    return count
+
+
+@contextmanager
+def exported_timestamps(models):
+    """
+    Keep the timestamps set on instances instead of auto_now(_add) values.
+    
+    Changes field options process-wide, so it is only meant for management
+    commands, never for code running inside the web server.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+class Importer:
+    """
+    Insert exported records with batched bulk_create.
+    
+    Records of one type are buffered and inserted once `batch_size` is
+    reached, when the record type changes, or when a comment replies to a
+    comment still in the buffer (its new id is not known yet). bulk_create
+    skips signals and `Comment.save`, so counters are left alone during
+    the import and comment paths are filled in per batch; call
+    `finish()` to rebuild the counters afterwards.
+    """
+    
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.user_ids = {}
+        self.category_ids = {}
+        self.post_ids = {}
+        self.comment_ids = {}
+        self.comment_paths = {}
+        self.counts = {record_type: 0 for record_type in EXPORT_FIELDS}
+        self.skipped = {record_type: 0 for record_type in EXPORT_FIELDS}
+        self.buffer_type = None
+        self.buffer = []
+        self.buffer_ids = set()
+        self.handlers = {
+            'user': self._import_users,
+            'category': self._import_categories,
+            'post': self._import_posts,
+            'comment': self._import_comments,
+            'vote': self._import_votes,
+        }
+    
+    def feed(self, record):
+        record_type = record.pop('type')
+        if record_type not in EXPORT_FIELDS:
+            raise ValueError(f'Unknown record type: {record_type}')
+        
+        if record_type != self.buffer_type:
+            self.flush()
+            self.buffer_type = record_type
+        elif record_type == 'comment' and record.get('parent_id') in self.buffer_ids:
+            self.flush()
+        
+        self.buffer.append(record)
+        self.buffer_ids.add(record.get('id'))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        if self.buffer:
+            with transaction.atomic(), exported_timestamps([Category, Post, Comment, Vote]):
+                self.handlers[self.buffer_type](self.buffer)
+        self.buffer = []
+        self.buffer_ids = set()
+    
+    def _import_users(self, records):
+        emails = [record['email'] for record in records]
+        existing = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+        new_users = []
+        for record in records:
+            if record['email'] in existing:
+                continue
+            user = User(
+                email=record['email'],
+                first_name=record['first_name'],
+                last_name=record['last_name'],
+                role=record['role'],
+            )
+            # Imported accounts sign in after a password reset
+            user.set_unusable_password()
+            new_users.append(user)
+        User.objects.bulk_create(new_users)
+        existing.update((user.email, user.id) for user in new_users)
+        
+        for record in records:
+            self.user_ids[record['id']] = existing[record['email']]
+        self.counts['user'] += len(new_users)
+        self.skipped['user'] += len(records) - len(new_users)
+    
+    def _import_categories(self, records):
+        slugs = [record['slug'] for record in records]
+        existing = dict(Category.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+        new_categories = [
+            Category(
+                name=record['name'],
+                slug=record['slug'],
+                description=record['description'],
+                created_at=parse_datetime(record['created_at']),
+            )
+            for record in records
+            if record['slug'] not in existing
+        ]
+        Category.objects.bulk_create(new_categories)
+        existing.update((category.slug, category.id) for category in new_categories)
+        
+        for record in records:
+            self.category_ids[record['id']] = existing[record['slug']]
+        self.counts['category'] += len(new_categories)
+        self.skipped['category'] += len(records) - len(new_categories)
+    
+    def _import_posts(self, records):
+        posts = []
+        sources = []
+        for record in records:
+            author_id = self.user_ids.get(record['author_id'])
+            if author_id is None:
+                self.skipped['post'] += 1
+                continue
+            posts.append(Post(
+                author_id=author_id,
+                category_id=self.category_ids.get(record['category_id']),
+                title=record['title'],
+                content=record['content'],
+                excerpt=make_excerpt(record['content'], Post.EXCERPT_LENGTH),
+                is_pinned=record['is_pinned'],
+                is_locked=record['is_locked'],
+                created_at=parse_datetime(record['created_at']),
+                updated_at=parse_datetime(record['updated_at']),
+            ))
+            sources.append(record)
+        Post.objects.bulk_create(posts)
+        
+        for post, record in zip(posts, sources):
+            self.post_ids[record['id']] = post.id
+        self.counts['post'] += len(posts)
+    
+    def _import_comments(self, records):
+        comments = []
+        sources = []
+        for record in records:
+            post_id = self.post_ids.get(record['post_id'])
+            author_id = self.user_ids.get(record['author_id'])
+            parent_id = self.comment_ids.get(record['parent_id'])
+            if post_id is None or author_id is None or (record['parent_id'] and parent_id is None):
+                self.skipped['comment'] += 1
+                continue
+            parent_path = self.comment_paths.get(parent_id, '')
+            if parent_path.count('/') > Comment.MAX_DEPTH:
+                # The path column cannot hold a deeper thread
+                self.skipped['comment'] += 1
+                continue
+            comments.append(Comment(
+                post_id=post_id,
+                author_id=author_id,
+                parent_id=parent_id,
+                content=record['content'],
+                depth=parent_path.count('/'),
+                created_at=parse_datetime(record['created_at']),
+                updated_at=parse_datetime(record['updated_at']),
+            ))
+            sources.append(record)
+        Comment.objects.bulk_create(comments)
+        
+        # Paths end with the comment's own id, known only after the insert
+        for comment, record in zip(comments, sources):
+            self.comment_ids[record['id']] = comment.id
+            comment.path = (
+                f'{self.comment_paths.get(comment.parent_id, "")}'
+                f'{comment.id:0{Comment.PATH_SEGMENT_WIDTH}d}/'
+            )
+            self.comment_paths[comment.id] = comment.path
+        Comment.objects.bulk_update(comments, ['path'])
+        self.counts['comment'] += len(comments)
+    
+    def _import_votes(self, records):
+        resolved = []
+        for record in records:
+            user_id = self.user_ids.get(record['user_id'])
+            post_id = self.post_ids.get(record['post_id'])
+            comment_id = self.comment_ids.get(record['comment_id'])
+            if user_id is None or (post_id is None and comment_id is None):
+                self.skipped['vote'] += 1
+                continue
+            resolved.append((user_id, post_id, comment_id, record))
+        
+        # Votes the target already has (or repeated in the file) are left as
+        # they are and counted as skipped, so `counts` is what was inserted
+        seen = set(
+            Vote.objects.filter(user_id__in={user_id for user_id, _, _, _ in resolved})
+            .filter(
+                Q(post_id__in={post_id for _, post_id, _, _ in resolved if post_id})
+                | Q(comment_id__in={comment_id for _, _, comment_id, _ in resolved if comment_id})
+            )
+            .values_list('user_id', 'post_id', 'comment_id')
+        )
+        votes = []
+        for user_id, post_id, comment_id, record in resolved:
+            if (user_id, post_id, comment_id) in seen:
+                self.skipped['vote'] += 1
+                continue
+            seen.add((user_id, post_id, comment_id))
+            votes.append(Vote(
+                user_id=user_id,
+                post_id=post_id,
+                comment_id=comment_id,
+                value=record['value'],
+                created_at=parse_datetime(record['created_at']),
+            ))
+        # ignore_conflicts still covers votes cast while the import runs
+        Vote.objects.bulk_create(votes, ignore_conflicts=True)
+        self.counts['vote'] += len(votes)
+    
+    def finish(self):
+        """
+        Flush the last batch and rebuild the counters of imported rows.
+        
+        Returns the number of rows whose counters were set.
+        """
+        self.flush()
+        fixed = 0
+        post_ids = list(self.post_ids.values())
+        comment_ids = list(self.comment_ids.values())
+        for start in range(0, len(post_ids), self.batch_size):
+            chunk = post_ids[start:start + self.batch_size]
+            fixed += refresh_post_counters(Post.objects.filter(id__in=chunk))
+        for start in range(0, len(comment_ids), self.batch_size):
+            chunk = comment_ids[start:start + self.batch_size]
+            fixed += refresh_comment_counters(Comment.objects.filter(id__in=chunk))
+        fixed += refresh_category_posts_count(
+            Category.objects.filter(id__in=set(self.category_ids.values()))
+        )
+        return fixed
+
+
+def import_jsonl(stream, batch_size=DEFAULT_BATCH_SIZE):
+    """Import records from a JSONL text stream. Returns the finished Importer."""
+    importer = Importer(batch_size=batch_size)
+    for line in stream:
+        line = line.strip()
+        if line:
+            importer.feed(json.loads(line))
+    importer.finish()
+    return importer
@@ -0,0 +1,104 @@
+"""
+Time-decayed trending score for posts.
+
+score = (upvotes + COMMENT_WEIGHT * comments) / (age_hours + AGE_OFFSET_HOURS) ** GRAVITY
+
+The score is stored on Post.trending_score so trending feeds are a top-N
+read of an index. Votes and comments bump it in the same UPDATE that
+changes the counters; `recompute_trending_scores` re-applies the decay
+periodically.
+"""
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField, Value
+from django.utils import timezone
+from .models import Post
+
+GRAVITY = 1.8
+COMMENT_WEIGHT = 2
+AGE_OFFSET_HOURS = 2
+
+# Posts older than this are no longer trending and have their score zeroed
+WINDOW_DAYS = 7
+
+
+def decay_factor(created_at, now=None):
+    """Multiplier applied to a post's points for its age."""
+    now = now or timezone.now()
+    age_hours = max((now - created_at).total_seconds() / 3600, 0)
+    return 1.0 / (age_hours + AGE_OFFSET_HOURS) ** GRAVITY
+
+
+def compute_trending_score(upvotes_count, comments_count, created_at, now=None):
+    """Trending score for a post with the given counters."""
+    points = upvotes_count + COMMENT_WEIGHT * comments_count
+    return points * decay_factor(created_at, now)
+
+
+def trending_score_expression(created_at, upvotes_delta=0, comments_delta=0, now=None):
+    """
+    SQL expression for the score after applying counter deltas.
+    
+    Meant to be used in the same UPDATE as the counter change; the column
+    references see the old counter values, hence the explicit deltas.
+    """
+    points = (
+        F('upvotes_count') + upvotes_delta +
+        COMMENT_WEIGHT * (F('comments_count') + comments_delta)
+    )
+    return ExpressionWrapper(
+        points * Value(decay_factor(created_at, now)),
+        output_field=FloatField()
+    )
+
+
+def rescore_posts(post_ids, window_days=WINDOW_DAYS, now=None):
+    """
+    Recompute the score of the given posts from their stored counters.
+    
+    For use after counters were rewritten outside the vote/comment paths,
+    in the caller's transaction. Posts outside the window get 0.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=window_days)
+    posts = list(Post.objects.filter(id__in=post_ids).only('id', 'created_at'))
+    for post in posts:
+        if post.created_at < cutoff:
+            post.trending_score = 0
+        else:
+            post.trending_score = trending_score_expression(post.created_at, now=now)
+    Post.objects.bulk_update(posts, ['trending_score'])
+
+
+def recompute_trending_scores(chunk_size=500, window_days=WINDOW_DAYS, now=None):
+    """
+    Re-apply time decay to every post in the trending window.
+    
+    Posts are processed in primary-key chunks, each in its own short
+    transaction. Posts that left the window are zeroed in one UPDATE.
+    Returns the number of posts rescored.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=window_days)
+    
+    Post.objects.filter(created_at__lt=cutoff).exclude(trending_score=0).update(trending_score=0)
+    
+    recent = Post.objects.filter(created_at__gte=cutoff).order_by('pk')
+    last_pk = 0
+    total = 0
+    while True:
+        rows = list(recent.filter(pk__gt=last_pk).only('id', 'created_at')[:chunk_size])
+        if not rows:
+            break
+        
+        # Expressions read the counters at write time, so concurrent votes
+        # landing between the SELECT and the UPDATE are not overwritten.
+        for post in rows:
+            post.trending_score = trending_score_expression(post.created_at, now=now)
+        with transaction.atomic():
+            Post.objects.bulk_update(rows, ['trending_score'])
+        
+        total += len(rows)
+        last_pk = rows[-1].pk
+    
+    return total
@@ -10,7 +10,9 @@ from .views import (
     CommentDetailView,
     vote_post,
     vote_comment,
+    vote_batch,
     trending_posts,
+    comment_tree,
 )
 
 app_name = 'discussions'
@@ -27,6 +29,10 @@ urlpatterns = [
     
     # Comments
     path('posts/<int:post_id>/comments/', CommentListCreateView.as_view(), name='comment-list'),
+    path('posts/<int:post_id>/comments/tree/', comment_tree, name='comment-tree'),
     path('comments/<int:pk>/', CommentDetailView.as_view(), name='comment-detail'),
     path('comments/<int:comment_id>/vote/', vote_comment, name='comment-vote'),
+    
+    # Votes
+    path('votes/batch/', vote_batch, name='vote-batch'),
 ]
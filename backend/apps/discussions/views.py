@@ -1,12 +1,14 @@
 """
 Views for discussions app.
 """
-from rest_framework import generics, status, permissions, filters
+from rest_framework import generics, status, permissions, filters, serializers
 from rest_framework.decorators import api_view, permission_classes as perm_classes
 from rest_framework.response import Response
+from functools import partial
+from django.db import transaction
 from django.db.models import F, Q
 from django.shortcuts import get_object_or_404
-from .models import Category, Post, Comment, Vote
+from .models import Category, Post, Comment
 from .serializers import (
     CategorySerializer,
     PostListSerializer,
@@ -14,9 +16,54 @@ from .serializers import (
     PostCreateSerializer,
     CommentSerializer,
 )
+from .votes import (
+    MAX_BATCH_VOTES,
+    VOTE_TARGETS,
+    apply_vote,
+    apply_votes,
+    parse_vote_value,
+    vote_context,
+)
+from .pagination import KeysetPaginationMixin
+from .cache import cached_response
+from .conditional import ConditionalPostMixin
+from .fast_serializers import post_list_values, serialize_post_rows
+from .trending import trending_score_expression
+from . import threads
 from apps.users.permissions import IsModeratorOrAdmin
 
 
+# Keyset-friendly orderings; each ends with `-id` so rows are totally ordered
+# and is served by a matching composite index on Post.
+POST_ORDERINGS = {
+    '-created_at': ('-created_at', '-id'),
+    'popular': ('-upvotes_count', '-created_at', '-id'),
+    'trending': ('-trending_score', '-id'),
+}
+
+# Comment orderings, served by the (post, -created_at) and
+# (post, -upvotes_count, -created_at, -id) indexes on Comment.
+COMMENT_ORDERINGS = {
+    'newest': ('-created_at', '-id'),
+    'oldest': ('created_at', 'id'),
+    'top': ('-upvotes_count', '-created_at', '-id'),
+}
+
+
+class VoteStateListMixin:
+    """Resolve the current user's vote state for a whole page in one query."""
+    
+    vote_target = 'post'
+    
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if kwargs.get('many') and args:
+            serializer.context.update(
+                vote_context(self.request.user, args[0], self.vote_target)
+            )
+        return serializer
+
+
 class CategoryListView(generics.ListCreateAPIView):
     """List all categories or create new one (admin only)."""
     
@@ -27,12 +74,19 @@ class CategoryListView(generics.ListCreateAPIView):
         if self.request.method == 'POST':
             return [IsModeratorOrAdmin()]
         return [permissions.AllowAny()]
+    
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request, 'category-list', ['categories'],
+            partial(super().list, request, *args, **kwargs)
+        )
 
 
-class PostListCreateView(generics.ListCreateAPIView):
+class PostListCreateView(KeysetPaginationMixin, generics.ListCreateAPIView):
     """List all posts or create new post."""
     
-    queryset = Post.objects.select_related('author', 'category').all()
+    # Lists never return content; `fast_list` selects only the columns it needs
+    queryset = Post.objects.select_related('author', 'category').defer('content')
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [filters.SearchFilter]
     search_fields = ['title', 'content', 'author__first_name', 'author__last_name']
@@ -45,10 +99,13 @@ class PostListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         queryset = super().get_queryset()
         
-        # Filter by category
+        # Filter by category (resolved to an id so the composite indexes apply)
         category = self.request.query_params.get('category')
         if category:
-            queryset = queryset.filter(category__slug=category)
+            category_id = Category.objects.filter(slug=category).values_list('id', flat=True).first()
+            if category_id is None:
+                return queryset.none()
+            queryset = queryset.filter(category_id=category_id)
         
         # Filter by author
         author = self.request.query_params.get('author')
@@ -57,18 +114,33 @@ class PostListCreateView(generics.ListCreateAPIView):
         
         # Ordering
         ordering = self.request.query_params.get('ordering', '-created_at')
-        if ordering == 'popular':
-            queryset = queryset.order_by('-upvotes_count', '-created_at')
-        elif ordering == 'trending':
-            # Simple trending: high upvotes + recent
-            queryset = queryset.order_by('-upvotes_count', '-comments_count', '-created_at')
+        if ordering in POST_ORDERINGS:
+            queryset = queryset.order_by(*POST_ORDERINGS[ordering])
+        elif self.uses_cursor_pagination():
+            queryset = queryset.order_by(*POST_ORDERINGS['-created_at'])
         else:
             queryset = queryset.order_by(ordering)
         
         return queryset
+    
+    def list(self, request, *args, **kwargs):
+        # Category feeds only depend on their own category's version
+        category = request.query_params.get('category')
+        scopes = [f'category:{category}'] if category else ['posts']
+        return cached_response(request, 'post-list', scopes, partial(self.fast_list, request))
+    
+    def fast_list(self, request):
+        """List posts from `.values()` rows instead of model instances (see fast_serializers.py)."""
+        queryset = post_list_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        data = serialize_post_rows(rows, {'request': request, **vote_context(request.user, rows)})
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
 
 
-class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
+class PostDetailView(ConditionalPostMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, or delete a post."""
     
     queryset = Post.objects.select_related('author', 'category').all()
@@ -80,6 +152,12 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
             return [permissions.IsAuthenticated()]
         return [permissions.AllowAny()]
     
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(
+            request, 'post-detail', [f'post:{kwargs["pk"]}'],
+            partial(super().retrieve, request, *args, **kwargs)
+        )
+    
     def perform_update(self, serializer):
         # Only author or moderator can update
         user = self.request.user
@@ -95,25 +173,45 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance.delete()
 
 
-class CommentListCreateView(generics.ListCreateAPIView):
-    """List comments for a post or create new comment."""
+class CommentListCreateView(
+    ConditionalPostMixin, KeysetPaginationMixin, VoteStateListMixin, generics.ListCreateAPIView
+):
+    """List comments for a post (`?ordering=newest|oldest|top`) or create new comment."""
     
+    vote_target = 'comment'
+    post_lookup_kwarg = 'post_id'
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     
     def get_queryset(self):
         post_id = self.kwargs.get('post_id')
-        return Comment.objects.filter(post_id=post_id).select_related('author')
+        ordering = self.request.query_params.get('ordering')
+        return Comment.objects.filter(post_id=post_id).select_related('author').order_by(
+            *COMMENT_ORDERINGS.get(ordering, COMMENT_ORDERINGS['newest'])
+        )
     
     def perform_create(self, serializer):
         post = get_object_or_404(Post, id=self.kwargs['post_id'])
         if post.is_locked and not self.request.user.is_moderator_or_admin():
             raise serializers.ValidationError("This post is locked.")
         
-        serializer.save(author=self.request.user, post=post)
+        parent = serializer.validated_data.get('parent')
+        if parent and parent.post_id != post.id:
+            raise serializers.ValidationError({'parent': 'Parent comment belongs to another post.'})
+        if parent and parent.depth >= Comment.MAX_DEPTH:
+            raise serializers.ValidationError({'parent': 'Replies cannot be nested any deeper.'})
         
-        # Update comment count
-        Post.objects.filter(id=post.id).update(comments_count=F('comments_count') + 1)
+        # The notification outbox entry commits together with the comment
+        with transaction.atomic():
+            serializer.save(author=self.request.user, post=post)
+            
+            # Update comment and reply counts
+            Post.objects.filter(id=post.id).update(
+                comments_count=F('comments_count') + 1,
+                trending_score=trending_score_expression(post.created_at, comments_delta=1),
+            )
+            if parent:
+                Comment.objects.filter(id=parent.id).update(replies_count=F('replies_count') + 1)
 
 
 class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -133,86 +231,195 @@ class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
         post = instance.post
+        parent_id = instance.parent_id
+        # Replies are deleted with the comment (CASCADE), so count the subtree
+        removed = Comment.objects.filter(post_id=post.id, path__startswith=instance.path).count()
         instance.delete()
         
-        # Update post comment count
-        Post.objects.filter(id=post.id).update(comments_count=F('comments_count') - 1)
+        # Update post comment count and the parent's reply count
+        Post.objects.filter(id=post.id).update(
+            comments_count=F('comments_count') - removed,
+            trending_score=trending_score_expression(post.created_at, comments_delta=-removed),
+        )
+        if parent_id:
+            Comment.objects.filter(id=parent_id).update(replies_count=F('replies_count') - 1)
 
 
-@api_view(['POST'])
-@perm_classes([permissions.IsAuthenticated])
-def vote_post(request, post_id):
-    """Upvote or downvote a post."""
-    post = get_object_or_404(Post, id=post_id)
-    value = request.data.get('value')
+def _int_param(request, name, default, minimum, maximum):
+    try:
+        value = int(request.query_params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    return min(max(value, minimum), maximum)
+
+
+@api_view(['GET'])
+@perm_classes([permissions.AllowAny])
+def comment_tree(request, post_id):
+    """
+    Get a post's comments as a nested thread.
     
-    if value not in [1, -1]:
-        return Response({'error': 'Invalid vote value'}, status=status.HTTP_400_BAD_REQUEST)
+    Query params: `root` (comment id to expand), `max_depth`, `limit` and
+    `collapse` (reply count above which a subtree is returned collapsed).
+    """
+    if not Post.objects.filter(id=post_id).exists():
+        return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Check if user already voted
-    vote, created = Vote.objects.get_or_create(
-        user=request.user,
-        post=post,
-        defaults={'value': value}
+    root = None
+    root_id = request.query_params.get('root')
+    if root_id:
+        try:
+            root_id = int(root_id)
+        except ValueError:
+            return Response({'error': 'Invalid root comment id'}, status=status.HTTP_400_BAD_REQUEST)
+        root = Comment.objects.filter(id=root_id, post_id=post_id).only('id', 'path', 'depth').first()
+        if root is None:
+            return Response({'error': 'Comment not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    comments, truncated = threads.load_thread(
+        post_id,
+        root=root,
+        max_depth=_int_param(request, 'max_depth', threads.DEFAULT_MAX_DEPTH, 0, 50),
+        limit=_int_param(request, 'limit', threads.DEFAULT_LIMIT, 1, threads.MAX_LIMIT),
+    )
+    serializer = CommentSerializer(comments, many=True, context={
+        'request': request,
+        **vote_context(request.user, comments, 'comment'),
+    })
+    tree = threads.build_tree(
+        comments,
+        serializer.data,
+        collapse_threshold=_int_param(
+            request, 'collapse', threads.DEFAULT_COLLAPSE_THRESHOLD, 0, threads.MAX_LIMIT
+        ),
+        root_id=root.id if root else None,
     )
     
-    if not created:
-        if vote.value == value:
-            # Remove vote
-            vote.delete()
-            Post.objects.filter(id=post_id).update(upvotes_count=F('upvotes_count') - value)
-            return Response({'message': 'Vote removed'}, status=status.HTTP_200_OK)
-        else:
-            # Change vote
-            old_value = vote.value
-            vote.value = value
-            vote.save()
-            Post.objects.filter(id=post_id).update(upvotes_count=F('upvotes_count') - old_value + value)
-            return Response({'message': 'Vote updated'}, status=status.HTTP_200_OK)
-    else:
-        # New vote
-        Post.objects.filter(id=post_id).update(upvotes_count=F('upvotes_count') + value)
-        return Response({'message': 'Vote recorded'}, status=status.HTTP_201_CREATED)
+    return Response({
+        'post': post_id,
+        'root': root.id if root else None,
+        'truncated': truncated,
+        'comments': tree,
+    })
+
+
+VOTE_MESSAGES = {
+    'recorded': 'Vote recorded',
+    'updated': 'Vote updated',
+    'removed': 'Vote removed',
+}
+
+
+def _vote_response(request, target, target_id):
+    value = parse_vote_value(request.data.get('value'))
+    if value is None:
+        return Response({'error': 'Invalid vote value'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    model = VOTE_TARGETS[target]
+    try:
+        result = apply_vote(request.user, target, target_id, value)
+    except model.DoesNotExist:
+        return Response(
+            {'error': f'{model._meta.verbose_name.capitalize()} not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    return Response(
+        {
+            'message': VOTE_MESSAGES[result.action],
+            'upvotes_count': result.upvotes_count,
+            'user_vote': result.user_vote,
+        },
+        status=status.HTTP_201_CREATED if result.action == 'recorded' else status.HTTP_200_OK
+    )
+
+
+@api_view(['POST'])
+@perm_classes([permissions.IsAuthenticated])
+def vote_post(request, post_id):
+    """Upvote or downvote a post (voting again with the same value removes the vote)."""
+    return _vote_response(request, 'post', post_id)
 
 
 @api_view(['POST'])
 @perm_classes([permissions.IsAuthenticated])
 def vote_comment(request, comment_id):
-    """Upvote or downvote a comment."""
-    comment = get_object_or_404(Comment, id=comment_id)
-    value = request.data.get('value')
+    """Upvote or downvote a comment (voting again with the same value removes the vote)."""
+    return _vote_response(request, 'comment', comment_id)
+
+
+def _parse_vote_operation(item):
+    """Return (target, target_id, value) for a batch item, or None if invalid."""
+    if not isinstance(item, dict) or item.get('target') not in VOTE_TARGETS:
+        return None
+    try:
+        target_id = int(item.get('id'))
+    except (TypeError, ValueError):
+        return None
+    value = parse_vote_value(item.get('value'))
+    if value is None:
+        return None
+    return item['target'], target_id, value
+
+
+@api_view(['POST'])
+@perm_classes([permissions.IsAuthenticated])
+def vote_batch(request):
+    """
+    Apply many votes in one request and transaction.
     
-    if value not in [1, -1]:
-        return Response({'error': 'Invalid vote value'}, status=status.HTTP_400_BAD_REQUEST)
+    Body: {"votes": [{"target": "post" | "comment", "id": 1, "value": 1 | -1}, ...]}.
+    Items keep the single-vote toggle/change semantics and are applied in
+    order; each gets its own result, so invalid or missing targets do not
+    fail the rest of the batch.
+    """
+    items = request.data.get('votes') if isinstance(request.data, dict) else None
+    if not isinstance(items, list) or not 1 <= len(items) <= MAX_BATCH_VOTES:
+        return Response(
+            {'error': f'votes must be a list of 1 to {MAX_BATCH_VOTES} items'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    vote, created = Vote.objects.get_or_create(
-        user=request.user,
-        comment=comment,
-        defaults={'value': value}
-    )
+    parsed = [_parse_vote_operation(item) for item in items]
+    outcomes = iter(apply_votes(request.user, [op for op in parsed if op is not None]))
     
-    if not created:
-        if vote.value == value:
-            vote.delete()
-            Comment.objects.filter(id=comment_id).update(upvotes_count=F('upvotes_count') - value)
-            return Response({'message': 'Vote removed'}, status=status.HTTP_200_OK)
-        else:
-            old_value = vote.value
-            vote.value = value
-            vote.save()
-            Comment.objects.filter(id=comment_id).update(upvotes_count=F('upvotes_count') - old_value + value)
-            return Response({'message': 'Vote updated'}, status=status.HTTP_200_OK)
-    else:
-        Comment.objects.filter(id=comment_id).update(upvotes_count=F('upvotes_count') + value)
-        return Response({'message': 'Vote recorded'}, status=status.HTTP_201_CREATED)
+    results = []
+    for index, operation in enumerate(parsed):
+        if operation is None:
+            results.append({'index': index, 'error': 'Invalid vote'})
+            continue
+        
+        target, target_id, _ = operation
+        result = next(outcomes)
+        if result is None:
+            model = VOTE_TARGETS[target]
+            results.append({
+                'index': index, 'target': target, 'id': target_id,
+                'error': f'{model._meta.verbose_name.capitalize()} not found',
+            })
+            continue
+        
+        results.append({
+            'index': index,
+            'target': target,
+            'id': target_id,
+            'message': VOTE_MESSAGES[result.action],
+            'upvotes_count': result.upvotes_count,
+            'user_vote': result.user_vote,
+        })
+    
+    return Response({'results': results})
 
 
 @api_view(['GET'])
 def trending_posts(request):
     """Get trending posts."""
-    posts = Post.objects.select_related('author', 'category').order_by(
-        '-upvotes_count', '-comments_count', '-created_at'
-    )[:10]
-    
-    serializer = PostListSerializer(posts, many=True)
-    return Response(serializer.data)
+    return cached_response(request, 'post-trending', ['posts'], partial(_trending_response, request))
+
+
+def _trending_response(request):
+    rows = list(post_list_values(Post.objects.order_by(*POST_ORDERINGS['trending']))[:10])
+    return Response(serialize_post_rows(rows, {
+        'request': request,
+        **vote_context(request.user, rows),
+    }))
@@ -0,0 +1,298 @@
+"""
+Vote helpers for discussions app.
+"""
+from collections import defaultdict, namedtuple
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Sum
+from .models import Post, Comment, Vote, PendingVoteDelta
+from .cache import invalidate_post
+from .trending import trending_score_expression
+
+VOTE_TARGETS = {
+    'post': Post,
+    'comment': Comment,
+}
+
+# Field linking a vote target to the cached post it is shown on
+VOTE_TARGET_PARENTS = {
+    'post': 'category',
+    'comment': 'post',
+}
+
+# Upper bound on operations accepted by one batch vote request
+MAX_BATCH_VOTES = 100
+
+VoteResult = namedtuple('VoteResult', ['action', 'user_vote', 'upvotes_count'])
+
+
+def object_ids(objects):
+    """Primary keys of model instances or `.values()` rows."""
+    return [obj['id'] if isinstance(obj, dict) else obj.pk for obj in objects]
+
+
+def get_user_votes(user, objects, target='post'):
+    """
+    Resolve the user's votes for a page of posts or comments in one query.
+    
+    Returns a dict mapping object id to vote value. Objects the user has
+    not voted on are missing from the map.
+    """
+    if user is None or not user.is_authenticated:
+        return {}
+    
+    ids = object_ids(objects)
+    if not ids:
+        return {}
+    
+    field = f'{target}_id'
+    return dict(
+        Vote.objects.filter(user=user, **{f'{field}__in': ids}).values_list(field, 'value')
+    )
+
+
+def parse_vote_value(raw):
+    """Return 1 or -1 for a valid vote value (int or numeric string), else None."""
+    value = str(raw)
+    return int(value) if value in ('1', '-1') else None
+
+
+def lock_voter(user):
+    """
+    Lock the voter's user row for the rest of the transaction.
+    
+    A user's votes are applied one after another, so racing requests for
+    the same (user, target) pair always see each other's committed vote
+    row. Votes from different users never wait on each other.
+    """
+    get_user_model().objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True).first()
+
+
+def apply_vote_row(user, target, target_id, value):
+    """
+    Apply toggle/change/create semantics to the user's vote row.
+    
+    Returns (action, delta, user_vote) where `delta` is the change to the
+    target's upvotes_count. Must run inside a transaction, after
+    `lock_voter`.
+    """
+    lookup = {'user': user, f'{target}_id': target_id}
+    current = Vote.objects.filter(**lookup).values_list('id', 'value').first()
+    
+    if current is None:
+        Vote.objects.create(value=value, **lookup)
+        return 'recorded', value, value
+    
+    vote_id, old_value = current
+    if old_value == value:
+        Vote.objects.filter(id=vote_id).delete()
+        return 'removed', -value, None
+    
+    Vote.objects.filter(id=vote_id).update(value=value)
+    return 'updated', value - old_value, value
+
+
+def write_behind_enabled():
+    return settings.VOTE_COUNTERS_WRITE_BEHIND
+
+
+def get_pending_deltas(target, ids):
+    """Sum of buffered (not yet flushed) vote deltas per target id."""
+    if not ids:
+        return {}
+    field = f'{target}_id'
+    return dict(
+        PendingVoteDelta.objects.filter(**{f'{field}__in': ids})
+        .values(field)
+        .annotate(total=Sum('delta'))
+        .values_list(field, 'total')
+    )
+
+
+def vote_context(user, objects, target='post'):
+    """
+    Serializer context with the per-page vote state for `objects`.
+    
+    Always resolves the user's votes; in write-behind mode it also loads
+    the buffered deltas so counts shown stay close to real time.
+    """
+    objects = list(objects)
+    context = {'user_votes': get_user_votes(user, objects, target)}
+    if write_behind_enabled():
+        context['pending_votes'] = get_pending_deltas(target, object_ids(objects))
+    return context
+
+
+def write_counter_deltas(target, objs, deltas):
+    """
+    Add per-target deltas to upvotes_count with one bulk UPDATE.
+    
+    `objs` are the targets (with created_at loaded, for the trending
+    score); `deltas` maps their ids to the change. Always writes the
+    counters directly, whatever the write-behind setting.
+    """
+    objs = [obj for obj in objs if deltas.get(obj.id)]
+    if not objs:
+        return
+    
+    fields = ['upvotes_count']
+    for obj in objs:
+        obj.upvotes_count = F('upvotes_count') + deltas[obj.id]
+        if target == 'post':
+            obj.trending_score = trending_score_expression(
+                obj.created_at, upvotes_delta=deltas[obj.id]
+            )
+    if target == 'post':
+        fields.append('trending_score')
+    VOTE_TARGETS[target].objects.bulk_update(objs, fields)
+
+
+def get_upvotes_counts(target, ids):
+    """Current upvotes_count per target id, buffered deltas included."""
+    counts = dict(
+        VOTE_TARGETS[target].objects.filter(id__in=ids).values_list('id', 'upvotes_count')
+    )
+    if write_behind_enabled():
+        for target_id, delta in get_pending_deltas(target, ids).items():
+            if target_id in counts:
+                counts[target_id] += delta
+    return counts
+
+
+def invalidate_vote_target(target, target_obj):
+    """Expire cached reads showing the target's counter."""
+    if target == 'post':
+        invalidate_post(target_obj.id, [target_obj.category_id])
+    else:
+        invalidate_post(target_obj.post_id, detail_only=True)
+
+
+def apply_counter_delta(target, target_obj, delta):
+    """Apply a vote delta to the target's counter (and trending score for posts)."""
+    if not delta:
+        return
+    
+    if write_behind_enabled():
+        PendingVoteDelta.objects.create(delta=delta, **{f'{target}_id': target_obj.id})
+        return
+    
+    updates = {'upvotes_count': F('upvotes_count') + delta}
+    if target == 'post':
+        updates['trending_score'] = trending_score_expression(
+            target_obj.created_at, upvotes_delta=delta
+        )
+    VOTE_TARGETS[target].objects.filter(id=target_obj.id).update(**updates)
+
+
+def apply_vote(user, target, target_id, value):
+    """
+    Create, change or remove a user's vote on a post or comment.
+    
+    The vote row change and the counter delta are applied in one
+    transaction with the voter locked, so concurrent requests for the
+    same (user, target) pair cannot drift upvotes_count. Raises the
+    target model's DoesNotExist if the target is missing.
+    """
+    model = VOTE_TARGETS[target]
+    
+    with transaction.atomic():
+        target_obj = model.objects.only('id', 'created_at', VOTE_TARGET_PARENTS[target]).get(id=target_id)
+        lock_voter(user)
+        action, delta, user_vote = apply_vote_row(user, target, target_id, value)
+        apply_counter_delta(target, target_obj, delta)
+        upvotes_count = get_upvotes_counts(target, [target_id])[target_id]
+        invalidate_vote_target(target, target_obj)
+    
+    return VoteResult(action, user_vote, upvotes_count)
+
+
+def apply_votes(user, operations):
+    """
+    Apply a batch of (target, target_id, value) votes in one transaction.
+    
+    Operations run in order with the same semantics as `apply_vote`, so
+    voting twice on a target in one batch toggles the vote off. Counter
+    changes are summed per target and written with one bulk UPDATE (or
+    buffered rows in write-behind mode) per model. Returns one VoteResult
+    per operation, or None where the target does not exist;
+    `upvotes_count` is the count after the whole batch.
+    """
+    ids_by_target = defaultdict(set)
+    for target, target_id, _ in operations:
+        ids_by_target[target].add(target_id)
+    
+    with transaction.atomic():
+        found = {
+            target: {
+                obj.id: obj for obj in VOTE_TARGETS[target].objects.only(
+                    'id', 'created_at', VOTE_TARGET_PARENTS[target]
+                ).filter(id__in=ids)
+            }
+            for target, ids in ids_by_target.items()
+        }
+        lock_voter(user)
+        
+        deltas = {target: defaultdict(int) for target in found}
+        outcomes = []
+        for target, target_id, value in operations:
+            if target_id not in found[target]:
+                outcomes.append(None)
+                continue
+            action, delta, user_vote = apply_vote_row(user, target, target_id, value)
+            deltas[target][target_id] += delta
+            outcomes.append((target, target_id, action, user_vote))
+        
+        counts = {}
+        for target, objs in found.items():
+            if write_behind_enabled():
+                PendingVoteDelta.objects.bulk_create([
+                    PendingVoteDelta(delta=delta, **{f'{target}_id': target_id})
+                    for target_id, delta in deltas[target].items() if delta
+                ])
+            else:
+                write_counter_deltas(target, objs.values(), deltas[target])
+            counts[target] = get_upvotes_counts(target, list(objs))
+            for obj in objs.values():
+                invalidate_vote_target(target, obj)
+    
+    return [
+        VoteResult(outcome[2], outcome[3], counts[outcome[0]][outcome[1]]) if outcome else None
+        for outcome in outcomes
+    ]
+
+
+def flush_pending_deltas(batch_size=1000):
+    """
+    Merge one batch of buffered vote deltas into the stored counters.
+    
+    Deltas are summed per target and written with one UPDATE per model;
+    the flushed rows are deleted in the same transaction, so a crash
+    either applies a batch completely or leaves it buffered. Rows locked
+    by another flusher are skipped. Returns the number of deltas merged.
+    """
+    with transaction.atomic():
+        rows = list(
+            PendingVoteDelta.objects.select_for_update(skip_locked=True)
+            .order_by('id')
+            .values_list('id', 'post_id', 'comment_id', 'delta')[:batch_size]
+        )
+        if not rows:
+            return 0
+        
+        merged = {'post': defaultdict(int), 'comment': defaultdict(int)}
+        for _, post_id, comment_id, delta in rows:
+            if post_id:
+                merged['post'][post_id] += delta
+            else:
+                merged['comment'][comment_id] += delta
+        
+        for target, deltas in merged.items():
+            deltas = {pk: delta for pk, delta in deltas.items() if delta}
+            if deltas:
+                objs = VOTE_TARGETS[target].objects.filter(id__in=deltas).only('id', 'created_at')
+                write_counter_deltas(target, objs, deltas)
+        
+        PendingVoteDelta.objects.filter(id__in=[row[0] for row in rows]).delete()
+    
+    return len(rows)
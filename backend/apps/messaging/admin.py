@@ -1,24 +1,35 @@
 from django.contrib import admin
-from .models import Conversation, PrivateMessage, ChatRoom, ChatMessage
+from .models import (
+    Conversation, ConversationParticipant, PrivateMessage, ChatRoom, ChatMessage, MessageArchiveSegment
+)
+
+
+class ConversationParticipantInline(admin.TabularInline):
+    model = ConversationParticipant
+    extra = 0
+    raw_id_fields = ['user']
+    readonly_fields = ['last_read_id']
 
 
 @admin.register(Conversation)
 class ConversationAdmin(admin.ModelAdmin):
-    list_display = ['id', 'created_at', 'updated_at']
-    filter_horizontal = ['participants']
+    list_display = ['id', 'last_message', 'created_at', 'updated_at']
+    raw_id_fields = ['last_message']
+    inlines = [ConversationParticipantInline]
 
 
 @admin.register(PrivateMessage)
 class PrivateMessageAdmin(admin.ModelAdmin):
-    list_display = ['id', 'conversation', 'sender', 'is_read', 'created_at']
-    list_filter = ['is_read', 'created_at']
+    list_display = ['id', 'conversation', 'sender', 'created_at']
+    list_filter = ['created_at']
     search_fields = ['content', 'sender__email']
 
 
 @admin.register(ChatRoom)
 class ChatRoomAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'is_active', 'created_at']
+    list_display = ['id', 'name', 'is_active', 'message_count', 'last_message_at', 'created_at']
     list_filter = ['is_active']
+    readonly_fields = ['message_count', 'last_message_at']
     search_fields = ['name', 'description']
 
 
@@ -27,3 +38,10 @@ class ChatMessageAdmin(admin.ModelAdmin):
     list_display = ['id', 'room', 'sender', 'created_at']
     list_filter = ['room', 'created_at']
     search_fields = ['content', 'sender__email']
+
+
+@admin.register(MessageArchiveSegment)
+class MessageArchiveSegmentAdmin(admin.ModelAdmin):
+    list_display = ['id', 'conversation', 'room', 'message_count', 'first_created_at', 'last_created_at']
+    raw_id_fields = ['conversation', 'room']
+    exclude = ['data']
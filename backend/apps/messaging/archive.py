@@ -0,0 +1,167 @@
+"""
+Cold-storage archival of private and chat room messages.
+
+`archive_owner` moves messages older than a cutoff out of the hot table
+into MessageArchiveSegment rows of up to `segment_size` messages each, so
+private_messages and chat_messages only hold the recent window that most
+reads hit. The `archived_*` readers decode segments back into unsaved
+message instances, which history endpoints merge with hot rows once a
+cursor reaches past the hot window.
+"""
+import json
+import zlib
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from .models import ChatMessage, Conversation, MessageArchiveSegment, PrivateMessage
+
+User = get_user_model()
+
+DEFAULT_SEGMENT_SIZE = 500
+
+# Owner field of each archived message model
+OWNER_FIELDS = {
+    PrivateMessage: 'conversation_id',
+    ChatMessage: 'room_id',
+}
+
+
+def encode_rows(rows):
+    data = json.dumps(
+        [[row['id'], row['sender_id'], row['content'], row['created_at'].isoformat()] for row in rows],
+        separators=(',', ':')
+    )
+    return zlib.compress(data.encode(), 9)
+
+
+def decode_segment(segment):
+    """Rows of a segment as (created_at, id, sender_id, content), oldest first."""
+    return [
+        (parse_datetime(created_at), message_id, sender_id, content)
+        for message_id, sender_id, content, created_at in json.loads(zlib.decompress(bytes(segment.data)))
+    ]
+
+
+def owner_ids(model, cutoff):
+    """Ids of conversations / rooms that have messages older than `cutoff`."""
+    field = OWNER_FIELDS[model]
+    return list(
+        model.objects.filter(created_at__lt=cutoff)
+        .order_by(field).values_list(field, flat=True).distinct()
+    )
+
+
+def archive_owner(model, owner_id, cutoff, segment_size=DEFAULT_SEGMENT_SIZE, dry_run=False):
+    """
+    Archive one conversation's or room's messages older than `cutoff`.
+    
+    Each segment is written and its messages deleted in one transaction.
+    A conversation's `last_message` stays hot, since the conversation
+    points at it. Returns the number of messages archived.
+    """
+    field = OWNER_FIELDS[model]
+    old = model.objects.filter(**{field: owner_id, 'created_at__lt': cutoff})
+    if model is PrivateMessage:
+        last_message_id = Conversation.objects.filter(id=owner_id).values_list('last_message_id', flat=True).first()
+        old = old.exclude(id=last_message_id) if last_message_id else old
+    if dry_run:
+        return old.count()
+    
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                old.order_by('created_at', 'id')
+                .values('id', 'sender_id', 'content', 'created_at')[:segment_size]
+            )
+            if not rows:
+                break
+            MessageArchiveSegment.objects.create(
+                **{field: owner_id},
+                first_id=min(row['id'] for row in rows),
+                last_id=max(row['id'] for row in rows),
+                first_created_at=rows[0]['created_at'],
+                last_created_at=rows[-1]['created_at'],
+                message_count=len(rows),
+                data=encode_rows(rows),
+            )
+            # Raw delete: no post_delete signals, so room counters keep
+            # counting archived messages and no per-row queries are run
+            ids = [row['id'] for row in rows]
+            model.objects.filter(id__in=ids)._raw_delete(model.objects.db)
+        archived += len(rows)
+    return archived
+
+
+def _instances(model, field, owner_id, rows):
+    """Unsaved message instances for decoded rows, senders loaded in one query."""
+    senders = User.objects.in_bulk({sender_id for _, _, sender_id, _ in rows})
+    messages = []
+    for created_at, message_id, sender_id, content in rows:
+        message = model(id=message_id, sender_id=sender_id, content=content, created_at=created_at)
+        setattr(message, field, owner_id)
+        if sender_id in senders:
+            message.sender = senders[sender_id]
+        messages.append(message)
+    return messages
+
+
+def _segments(model, owner_id):
+    return MessageArchiveSegment.objects.filter(**{OWNER_FIELDS[model]: owner_id})
+
+
+def archived_before(model, owner_id, position, limit):
+    """
+    Up to `limit` archived messages before `position` ((created_at, id), or
+    None for the newest), newest first.
+    """
+    segments = _segments(model, owner_id)
+    if position is not None:
+        segments = segments.filter(first_created_at__lte=position[0])
+    rows = []
+    for segment in segments.order_by('-last_created_at', '-last_id').iterator(chunk_size=4):
+        for row in reversed(decode_segment(segment)):
+            if position is None or row[:2] < tuple(position):
+                rows.append(row)
+        if len(rows) >= limit:
+            break
+    rows.sort(reverse=True)
+    return _instances(model, OWNER_FIELDS[model], owner_id, rows[:limit])
+
+
+def archived_after(model, owner_id, position, limit):
+    """Up to `limit` archived messages after `position`, oldest first."""
+    segments = _segments(model, owner_id).filter(last_created_at__gte=position[0])
+    rows = []
+    for segment in segments.order_by('first_created_at', 'first_id').iterator(chunk_size=4):
+        rows.extend(row for row in decode_segment(segment) if row[:2] > tuple(position))
+        if len(rows) >= limit:
+            break
+    rows.sort()
+    return _instances(model, OWNER_FIELDS[model], owner_id, rows[:limit])
+
+
+def archived_position(model, owner_id, message_id):
+    """(created_at, id) of an archived message, or None if it is not archived."""
+    segments = _segments(model, owner_id).filter(first_id__lte=message_id, last_id__gte=message_id)
+    for segment in segments:
+        for created_at, row_id, _, _ in decode_segment(segment):
+            if row_id == message_id:
+                return created_at, row_id
+    return None
+
+
+def message_position(model, owner_id, message_id):
+    """(created_at, id) of a hot or archived message, or None."""
+    row = (
+        model.objects.filter(**{OWNER_FIELDS[model]: owner_id, 'id': message_id})
+        .values_list('created_at', 'id').first()
+    )
+    return row or archived_position(model, owner_id, message_id)
+
+
+def before_position(position):
+    """Filter for hot messages before a (created_at, id) position."""
+    created_at, message_id = position
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
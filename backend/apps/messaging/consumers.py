@@ -0,0 +1,108 @@
+"""
+WebSocket consumer for chat rooms.
+"""
+import json
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.db import transaction
+from .models import ChatRoom, ChatMessage
+from .realtime import (
+    chat_message_event, message_frame, missed_messages, replay_frame, room_group_name
+)
+from .serializers import CreateChatMessageSerializer
+
+
+class ChatRoomConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket consumer for one chat room.
+    
+    Clients send `{"content": "..."}` to post a message and receive
+    `{"type": "message", "message": {...}}` frames for every message in the
+    room, their own included. Connecting with `?last_id=<id>` first
+    replays what was missed since that message; as the group is joined
+    before the replay is read, a message may arrive in both, so clients
+    should de-duplicate by id.
+    """
+    
+    async def connect(self):
+        """Handle WebSocket connection."""
+        self.user = self.scope['user']
+        
+        if self.user.is_anonymous:
+            await self.close()
+            return
+        
+        self.room_id = self.scope['url_route']['kwargs']['room_id']
+        if not await self.room_is_active():
+            await self.close()
+            return
+        
+        self.group_name = room_group_name(self.room_id)
+        
+        # Join room group
+        await self.channel_layer.group_add(
+            self.group_name,
+            self.channel_name
+        )
+        
+        await self.accept()
+        
+        last_id = self.get_last_id()
+        if last_id is not None:
+            await self.send(text_data=await self.get_replay_frame(last_id))
+    
+    async def disconnect(self, close_code):
+        """Handle WebSocket disconnection."""
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(
+                self.group_name,
+                self.channel_name
+            )
+    
+    async def receive(self, text_data=None, bytes_data=None):
+        """Store a message sent by the client and broadcast it to the room."""
+        try:
+            data = json.loads(text_data or '')
+        except ValueError:
+            data = None
+        serializer = CreateChatMessageSerializer(data=data if isinstance(data, dict) else {})
+        if not serializer.is_valid():
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'error': serializer.errors,
+            }))
+            return
+        
+        frame = await self.create_message(serializer.validated_data['content'])
+        await self.channel_layer.group_send(self.group_name, chat_message_event(frame))
+    
+    async def chat_message(self, event):
+        """Receive an already serialized message from the group and send it."""
+        await self.send(text_data=event['frame'])
+    
+    def get_last_id(self):
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        try:
+            return int(query['last_id'][0])
+        except (KeyError, ValueError):
+            return None
+    
+    @database_sync_to_async
+    def room_is_active(self):
+        return ChatRoom.objects.filter(id=self.room_id, is_active=True).exists()
+    
+    @database_sync_to_async
+    def create_message(self, content):
+        # Counters and the sync log are written by signals in the same transaction
+        with transaction.atomic():
+            message = ChatMessage.objects.create(
+                room_id=self.room_id,
+                sender=self.user,
+                content=content
+            )
+        return message_frame(message)
+    
+    @database_sync_to_async
+    def get_replay_frame(self, last_id):
+        return replay_frame(*missed_messages(self.room_id, last_id))
@@ -0,0 +1,111 @@
+"""
+Counters for messaging app.
+
+`ChatRoom.message_count` and `last_message_at` are kept up to date by the
+signals in signals.py and keep covering messages moved into archive
+segments; `refresh_chat_room_counters` recomputes them from chat_messages
+plus the room's segments and only writes the rooms that drifted. Unread counts of
+private conversations are not stored: they are counted past each
+participant's read watermark.
+"""
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from .models import ChatRoom, ChatMessage, ConversationParticipant, MessageArchiveSegment, PrivateMessage
+
+
+def record_chat_message(message):
+    """Count a new message in its room and move last_message_at forward."""
+    ChatRoom.objects.filter(id=message.room_id).update(
+        message_count=F('message_count') + 1,
+        last_message_at=Greatest(
+            Coalesce('last_message_at', Value(message.created_at)),
+            Value(message.created_at)
+        )
+    )
+
+
+def forget_chat_message(message):
+    """Uncount a deleted message; last_message_at falls back to the newest left."""
+    ChatRoom.objects.filter(id=message.room_id, message_count__gt=0).update(
+        message_count=F('message_count') - 1,
+        last_message_at=room_last_message_subquery()
+    )
+
+
+def room_message_count_subquery():
+    """
+    Actual number of messages per room, hot and archived, for use against
+    ChatRoom rows.
+    """
+    hot = Subquery(
+        ChatMessage.objects.filter(room=OuterRef('pk')).order_by()
+        .values('room').annotate(total=Count('id')).values('total')
+    )
+    archived = Subquery(
+        MessageArchiveSegment.objects.filter(room=OuterRef('pk')).order_by()
+        .values('room').annotate(total=Sum('message_count')).values('total')
+    )
+    return Coalesce(hot, Value(0)) + Coalesce(archived, Value(0))
+
+
+def room_last_message_subquery():
+    """Timestamp of each room's newest message, hot or archived (NULL when empty)."""
+    hot = Subquery(
+        ChatMessage.objects.filter(room=OuterRef('pk')).order_by()
+        .values('room').annotate(latest=Max('created_at')).values('latest')
+    )
+    archived = Subquery(
+        MessageArchiveSegment.objects.filter(room=OuterRef('pk')).order_by()
+        .values('room').annotate(latest=Max('last_created_at')).values('latest')
+    )
+    # Greatest() is NULL on SQLite as soon as one side is
+    return Greatest(Coalesce(hot, archived), Coalesce(archived, hot))
+
+
+def refresh_chat_room_counters(queryset=None):
+    """
+    Recompute message_count and last_message_at for rooms (all by default).
+    
+    Only rows whose stored values drifted are written. Returns the number
+    of rooms fixed.
+    """
+    if queryset is None:
+        queryset = ChatRoom.objects.all()
+    drifted = queryset.annotate(
+        actual_count=room_message_count_subquery(),
+        actual_last=room_last_message_subquery(),
+    ).filter(
+        ~Q(message_count=F('actual_count')) |
+        Q(last_message_at__lt=F('actual_last')) |
+        Q(last_message_at__gt=F('actual_last')) |
+        Q(last_message_at__isnull=True, actual_last__isnull=False) |
+        Q(last_message_at__isnull=False, actual_last__isnull=True)
+    )
+    return ChatRoom.objects.filter(pk__in=drifted.values('pk')).update(
+        message_count=room_message_count_subquery(),
+        last_message_at=room_last_message_subquery(),
+    )
+
+
+def unread_count_subquery(user):
+    """
+    Per-conversation count of messages from others past `user`'s read
+    watermark, for use against Conversation rows.
+    
+    Counted over the (conversation, id) index range above the watermark,
+    so the cost follows the number of unread messages, not the history.
+    """
+    last_read_id = ConversationParticipant.objects.filter(
+        conversation=OuterRef(OuterRef('pk')), user=user
+    ).values('last_read_id')[:1]
+    return Coalesce(
+        Subquery(
+            PrivateMessage.objects.filter(conversation=OuterRef('pk'), id__gt=Subquery(last_read_id))
+            .exclude(sender=user)
+            .order_by()
+            .values('conversation')
+            .annotate(total=Count('id'))
+            .values('total')
+        ),
+        Value(0),
+    )
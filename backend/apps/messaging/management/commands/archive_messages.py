@@ -0,0 +1,33 @@
+"""
+Move old private and chat room messages into compressed archive segments.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.messaging.archive import DEFAULT_SEGMENT_SIZE, archive_owner, owner_ids
+from apps.messaging.models import ChatMessage, PrivateMessage
+
+
+class Command(BaseCommand):
+    help = 'Archive messages older than MESSAGING_ARCHIVE_AFTER_DAYS into compressed segments.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.MESSAGING_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--segment-size', type=int, default=DEFAULT_SEGMENT_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+    
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        for model, label in [(PrivateMessage, 'conversations'), (ChatMessage, 'chat rooms')]:
+            owners = owner_ids(model, cutoff)
+            archived = 0
+            for owner_id in owners:
+                archived += archive_owner(
+                    model, owner_id, cutoff,
+                    segment_size=options['segment_size'], dry_run=options['dry_run']
+                )
+            verb = 'Would archive' if options['dry_run'] else 'Archived'
+            self.stdout.write(self.style.SUCCESS(
+                f'{verb} {archived} {model._meta.verbose_name_plural} from {len(owners)} {label}'
+            ))
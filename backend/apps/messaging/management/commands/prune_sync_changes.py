@@ -0,0 +1,19 @@
+"""
+Delete messaging sync log entries past their retention.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.messaging.sync import prune_changes
+
+
+class Command(BaseCommand):
+    help = 'Delete sync change log entries older than MESSAGING_SYNC_RETENTION_DAYS.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+    
+    def handle(self, *args, **options):
+        deleted = prune_changes(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} sync changes older than {settings.MESSAGING_SYNC_RETENTION_DAYS} days'
+        ))
@@ -0,0 +1,13 @@
+"""
+Repair drift in ChatRoom.message_count and last_message_at.
+"""
+from django.core.management.base import BaseCommand
+from apps.messaging.counters import refresh_chat_room_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute ChatRoom.message_count and last_message_at from chat_messages and archive segments.'
+    
+    def handle(self, *args, **options):
+        fixed = refresh_chat_room_counters()
+        self.stdout.write(self.style.SUCCESS(f'Fixed counters on {fixed} chat rooms'))
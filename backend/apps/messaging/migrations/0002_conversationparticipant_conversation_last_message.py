@@ -0,0 +1,84 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_conversation_state(apps, schema_editor):
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ConversationParticipant = apps.get_model('messaging', 'ConversationParticipant')
+    PrivateMessage = apps.get_model('messaging', 'PrivateMessage')
+    
+    latest = PrivateMessage.objects.filter(conversation=OuterRef('pk')).order_by('-created_at', '-id')
+    Conversation.objects.update(last_message=Subquery(latest.values('id')[:1]))
+    
+    last_pk = 0
+    while True:
+        memberships = list(
+            ConversationParticipant.objects.filter(pk__gt=last_pk).order_by('pk')[:500]
+        )
+        if not memberships:
+            break
+        for membership in memberships:
+            received = PrivateMessage.objects.filter(
+                conversation_id=membership.conversation_id
+            ).exclude(sender_id=membership.user_id)
+            membership.unread_count = received.filter(is_read=False).count()
+            last_read = received.filter(is_read=True).order_by('-id').values_list('id', flat=True).first()
+            last_sent = PrivateMessage.objects.filter(
+                conversation_id=membership.conversation_id, sender_id=membership.user_id
+            ).order_by('-id').values_list('id', flat=True).first()
+            membership.last_read_id = max(last_read or 0, last_sent or 0)
+        ConversationParticipant.objects.bulk_update(memberships, ['unread_count', 'last_read_id'])
+        last_pk = memberships[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('messaging', '0001_initial'),
+    ]
+
+    operations = [
+        # The auto-created M2M table becomes an explicit through model
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ConversationParticipant',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='messaging.conversation')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'conversations_participants',
+                        'unique_together': {('conversation', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='conversation',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='conversations', through='messaging.ConversationParticipant', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='last_read_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.privatemessage'),
+        ),
+        migrations.RunPython(backfill_conversation_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:46
+
+from collections import defaultdict
+from django.db import migrations
+
+
+def merge_direct_conversations(apps, schema_editor):
+    """Fold duplicate conversations of the same pair into the oldest one."""
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ConversationParticipant = apps.get_model('messaging', 'ConversationParticipant')
+    PrivateMessage = apps.get_model('messaging', 'PrivateMessage')
+    
+    members = defaultdict(set)
+    last_read = {}
+    rows = ConversationParticipant.objects.values_list('conversation_id', 'user_id', 'last_read_id')
+    for conversation_id, user_id, last_read_id in rows.iterator():
+        members[conversation_id].add(user_id)
+        last_read[conversation_id, user_id] = last_read_id
+    
+    pairs = defaultdict(list)
+    for conversation_id, user_ids in members.items():
+        if len(user_ids) <= 2:
+            user_ids = sorted(user_ids)
+            pairs[user_ids[0], user_ids[-1]].append(conversation_id)
+    
+    keepers = []
+    for (user_low, user_high), conversation_ids in pairs.items():
+        keeper_id, *duplicate_ids = sorted(conversation_ids)
+        if duplicate_ids:
+            PrivateMessage.objects.filter(conversation_id__in=duplicate_ids).update(conversation_id=keeper_id)
+            Conversation.objects.filter(id__in=duplicate_ids).delete()
+            
+            latest = PrivateMessage.objects.filter(conversation_id=keeper_id).order_by('-created_at', '-id').first()
+            Conversation.objects.filter(id=keeper_id).update(last_message=latest)
+            for membership in ConversationParticipant.objects.filter(conversation_id=keeper_id):
+                membership.unread_count = PrivateMessage.objects.filter(
+                    conversation_id=keeper_id, is_read=False
+                ).exclude(sender_id=membership.user_id).count()
+                membership.last_read_id = max(
+                    last_read.get((conversation_id, membership.user_id), 0)
+                    for conversation_id in conversation_ids
+                )
+                membership.save(update_fields=['unread_count', 'last_read_id'])
+        keepers.append(Conversation(id=keeper_id, user_low_id=user_low, user_high_id=user_high))
+    
+    Conversation.objects.bulk_update(keepers, ['user_low', 'user_high'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    # Data only; the unique constraint is added in a separate migration since
+    # PostgreSQL refuses DDL on tables with pending deferred FK checks
+
+    dependencies = [
+        ('messaging', '0003_conversation_user_high_conversation_user_low'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_direct_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('messaging', '0004_merge_direct_conversations'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(condition=models.Q(('user_low__isnull', False)), fields=('user_low', 'user_high'), name='unique_direct_conversation'),
+        ),
+    ]
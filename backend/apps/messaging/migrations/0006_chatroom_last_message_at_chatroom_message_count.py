@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:31
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_chat_room_counters(apps, schema_editor):
+    ChatRoom = apps.get_model('messaging', 'ChatRoom')
+    ChatMessage = apps.get_model('messaging', 'ChatMessage')
+    messages = ChatMessage.objects.filter(room=OuterRef('pk')).order_by().values('room')
+    ChatRoom.objects.update(
+        message_count=Coalesce(
+            Subquery(messages.annotate(total=Count('id')).values('total')),
+            Value(0),
+        ),
+        last_message_at=Subquery(messages.annotate(latest=Max('created_at')).values('latest')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0005_conversation_unique_direct_conversation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_chat_room_counters, migrations.RunPython.noop),
+    ]
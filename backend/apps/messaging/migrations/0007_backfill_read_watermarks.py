@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:05
+
+from django.db import migrations
+from django.db.models import F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_read_watermarks(apps, schema_editor):
+    """Raise each watermark to the newest message the user had marked read."""
+    ConversationParticipant = apps.get_model('messaging', 'ConversationParticipant')
+    PrivateMessage = apps.get_model('messaging', 'PrivateMessage')
+    newest_read = (
+        PrivateMessage.objects.filter(conversation=OuterRef('conversation'), is_read=True)
+        .exclude(sender=OuterRef('user'))
+        .order_by()
+        .values('conversation')
+        .annotate(newest=Max('id'))
+        .values('newest')
+    )
+    ConversationParticipant.objects.update(
+        last_read_id=Greatest(F('last_read_id'), Coalesce(Subquery(newest_read), Value(0)))
+    )
+
+
+class Migration(migrations.Migration):
+    # Data only; is_read is dropped in the next migration, since PostgreSQL
+    # refuses DDL on tables with pending deferred FK checks
+    
+    dependencies = [
+        ('messaging', '0006_chatroom_last_message_at_chatroom_message_count'),
+    ]
+    
+    operations = [
+        migrations.RunPython(backfill_read_watermarks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0007_backfill_read_watermarks'),
+    ]
+    
+    operations = [
+        migrations.RemoveField(
+            model_name='conversationparticipant',
+            name='unread_count',
+        ),
+        migrations.RemoveField(
+            model_name='privatemessage',
+            name='is_read',
+        ),
+        migrations.AddIndex(
+            model_name='privatemessage',
+            index=models.Index(fields=['conversation', 'id'], name='private_mes_convers_a10ed9_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0008_remove_conversationparticipant_unread_count_and_more'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('message', 'Private message'), ('chat_message', 'Chat room message'), ('conversation', 'Conversation'), ('read', 'Read watermark')], max_length=20)),
+                ('object_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='messaging.conversation')),
+                ('room', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='messaging.chatroom')),
+            ],
+            options={
+                'db_table': 'messaging_sync_changes',
+                'indexes': [models.Index(fields=['conversation', 'id'], name='messaging_s_convers_901c24_idx'), models.Index(fields=['room', 'id'], name='messaging_s_room_id_6bdbb9_idx'), models.Index(fields=['created_at'], name='messaging_s_created_fa39fc_idx')],
+            },
+        ),
+    ]
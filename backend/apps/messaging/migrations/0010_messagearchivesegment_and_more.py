@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0009_syncchange'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='MessageArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_id', models.BigIntegerField()),
+                ('last_id', models.BigIntegerField()),
+                ('first_created_at', models.DateTimeField()),
+                ('last_created_at', models.DateTimeField()),
+                ('message_count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archive_segments', to='messaging.conversation')),
+                ('room', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archive_segments', to='messaging.chatroom')),
+            ],
+            options={
+                'db_table': 'message_archive_segments',
+                'indexes': [models.Index(fields=['conversation', 'last_created_at'], name='message_arc_convers_ff926d_idx'), models.Index(fields=['room', 'last_created_at'], name='message_arc_room_id_a3f9d2_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='messagearchivesegment',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('conversation__isnull', False), ('room__isnull', True)), models.Q(('conversation__isnull', True), ('room__isnull', False)), _connector='OR'), name='archive_segment_conversation_or_room'),
+        ),
+    ]
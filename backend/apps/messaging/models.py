@@ -1,30 +1,158 @@
 """
 Models for messaging: private conversations and general chat.
 """
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
 
 
+class ConversationManager(models.Manager):
+    """Manager with race-free lookup of direct (two-person) conversations."""
+    
+    def get_or_create_direct(self, user, other):
+        """
+        Return (conversation, created) for the direct conversation of two users.
+        
+        Looked up by the canonical (low id, high id) pair, which is unique,
+        so concurrent callers end up sharing one conversation.
+        """
+        user_low, user_high = sorted([user.id, other.id])
+        try:
+            return self.get(user_low_id=user_low, user_high_id=user_high), False
+        except self.model.DoesNotExist:
+            pass
+        
+        try:
+            with transaction.atomic():
+                conversation = self.create(user_low_id=user_low, user_high_id=user_high)
+                conversation.participants.add(user_low, user_high)
+                SyncChange.objects.create(kind=SyncChange.CONVERSATION, conversation=conversation)
+            return conversation, True
+        except IntegrityError:
+            # Another request created it first
+            return self.get(user_low_id=user_low, user_high_id=user_high), False
+
+
 class Conversation(models.Model):
     """Private conversation between two users."""
     
     participants = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
+        through='ConversationParticipant',
         related_name='conversations'
     )
+    
+    # Canonical participant pair of a direct conversation (lower id first)
+    user_low = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    user_high = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    
+    # Denormalized pointer to the newest message, set when a message is sent
+    last_message = models.ForeignKey(
+        'PrivateMessage',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ConversationManager()
+    
     class Meta:
         db_table = 'conversations'
         ordering = ['-updated_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user_low', 'user_high'],
+                name='unique_direct_conversation',
+                condition=models.Q(user_low__isnull=False)
+            ),
+        ]
     
     def __str__(self):
         return f"Conversation {self.id}"
     
+    def get_membership(self, user):
+        """Get the user's ConversationParticipant row, using prefetched memberships."""
+        for membership in self.memberships.all():
+            if membership.user_id == user.id:
+                return membership
+        return None
+    
     def get_other_participant(self, user):
         """Get the other participant in a two-person conversation."""
-        return self.participants.exclude(id=user.id).first()
+        for membership in self.memberships.all():
+            if membership.user_id != user.id:
+                return membership.user
+        return None
+    
+    def read_watermarks(self):
+        """Map each participant's user id to the newest message id they read."""
+        return {membership.user_id: membership.last_read_id for membership in self.memberships.all()}
+    
+    def unread_count_for(self, user, last_read_id=None):
+        """Count messages from others after the user's read watermark."""
+        if last_read_id is None:
+            last_read_id = self.memberships.filter(user=user).values_list('last_read_id', flat=True).first()
+        if last_read_id is None:
+            return 0
+        return self.messages.filter(id__gt=last_read_id).exclude(sender=user).count()
+    
+    def mark_read(self, user, message_id=None):
+        """
+        Move the user's read watermark up to `message_id` (default: the
+        last message), never backwards and never past the last message.
+        
+        A single row update (plus its sync change); returns True if the
+        watermark moved.
+        """
+        last_message_id = self.last_message_id or 0
+        upto = last_message_id if message_id is None else min(message_id, last_message_id)
+        with transaction.atomic():
+            moved = ConversationParticipant.objects.filter(
+                conversation=self, user=user, last_read_id__lt=upto
+            ).update(last_read_id=upto)
+            if moved:
+                SyncChange.objects.create(kind=SyncChange.READ, conversation=self)
+        return bool(moved)
+
+
+class ConversationParticipant(models.Model):
+    """Membership of a user in a conversation, with their read state."""
+    
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='memberships'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='conversation_memberships'
+    )
+    
+    # Read watermark: every message up to this id counts as read
+    last_read_id = models.BigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'conversations_participants'
+        unique_together = [['conversation', 'user']]
+    
+    def __str__(self):
+        return f"{self.user.email} in conversation {self.conversation_id}"
 
 
 class PrivateMessage(models.Model):
@@ -41,7 +169,6 @@ class PrivateMessage(models.Model):
         related_name='sent_messages'
     )
     content = models.TextField()
-    is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -49,6 +176,8 @@ class PrivateMessage(models.Model):
         ordering = ['created_at']
         indexes = [
             models.Index(fields=['conversation', 'created_at']),
+            # Unread counts: messages past a read watermark
+            models.Index(fields=['conversation', 'id']),
         ]
     
     def __str__(self):
@@ -61,6 +190,11 @@ class ChatRoom(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
+    
+    # Denormalized from chat_messages, maintained by signals
+    message_count = models.PositiveIntegerField(default=0)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -96,3 +230,108 @@ class ChatMessage(models.Model):
     
     def __str__(self):
         return f"{self.sender.email} in {self.room.name}: {self.content[:50]}"
+
+
+class SyncChange(models.Model):
+    """
+    Entry in the messaging change log read by the delta sync endpoint.
+    
+    The auto-increment id is the change sequence that sync tokens point
+    into. Each entry names what changed and whose clients should see it:
+    the participants of `conversation`, or subscribers of `room`.
+    """
+    
+    MESSAGE = 'message'
+    CHAT_MESSAGE = 'chat_message'
+    CONVERSATION = 'conversation'
+    READ = 'read'
+    
+    KIND_CHOICES = [
+        (MESSAGE, 'Private message'),
+        (CHAT_MESSAGE, 'Chat room message'),
+        (CONVERSATION, 'Conversation'),
+        (READ, 'Read watermark'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    room = models.ForeignKey(
+        ChatRoom,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    # Id of the PrivateMessage / ChatMessage, for message changes
+    object_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'messaging_sync_changes'
+        indexes = [
+            models.Index(fields=['conversation', 'id']),
+            models.Index(fields=['room', 'id']),
+            models.Index(fields=['created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} change {self.id}"
+
+
+class MessageArchiveSegment(models.Model):
+    """
+    A run of archived messages of one conversation or chat room.
+    
+    Messages past MESSAGING_ARCHIVE_AFTER_DAYS are moved out of the hot
+    tables into segments (see archive.py). `data` is zlib-compressed JSON:
+    a list of [id, sender id, content, created_at] rows in (created_at,
+    id) order. The bounds let history reads pick segments by position.
+    """
+    
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='archive_segments'
+    )
+    room = models.ForeignKey(
+        ChatRoom,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='archive_segments'
+    )
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    first_created_at = models.DateTimeField()
+    last_created_at = models.DateTimeField()
+    message_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'message_archive_segments'
+        indexes = [
+            models.Index(fields=['conversation', 'last_created_at']),
+            models.Index(fields=['room', 'last_created_at']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=(
+                    models.Q(conversation__isnull=False, room__isnull=True) |
+                    models.Q(conversation__isnull=True, room__isnull=False)
+                ),
+                name='archive_segment_conversation_or_room'
+            ),
+        ]
+    
+    def __str__(self):
+        owner = f"conversation {self.conversation_id}" if self.conversation_id else f"room {self.room_id}"
+        return f"{self.message_count} archived messages of {owner}"
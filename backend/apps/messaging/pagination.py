@@ -0,0 +1,128 @@
+"""
+Pagination classes for messaging app.
+"""
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from apps.discussions.pagination import decode_cursor, encode_cursor
+from .archive import archived_after, archived_before
+from .models import PrivateMessage
+
+
+class MessageHistoryPagination(BasePagination):
+    """
+    Keyset pages over a conversation's messages, oldest first within a page.
+    
+    Without a cursor the latest page is returned. The `previous` link
+    carries a `before` token and `next` an `after` token, each holding the
+    (created_at, id) of the edge message, so every page is a range scan of
+    the (conversation, created_at) index however long the history is.
+    Given the conversation id, pages reaching past the hot rows continue
+    into its archive segments.
+    """
+    
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    before_query_param = 'before'
+    after_query_param = 'after'
+    invalid_cursor_message = 'Invalid cursor'
+    
+    def __init__(self, conversation_id=None):
+        self.conversation_id = conversation_id
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        before = self.decode_position(request, self.before_query_param)
+        after = self.decode_position(request, self.after_query_param)
+        
+        if after is not None and before is None:
+            created_at, message_id = after
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+            ).order_by('created_at', 'id')
+            results = []
+            if self.conversation_id is not None:
+                # Archived messages are older than the hot ones
+                results = archived_after(PrivateMessage, self.conversation_id, after, self.page_size + 1)
+            results += list(queryset[:self.page_size + 1 - len(results)])
+            self.has_next = len(results) > self.page_size
+            self.has_previous = True
+            self.page = results[:self.page_size]
+            return self.page
+        
+        if before is not None:
+            created_at, message_id = before
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+            )
+        results = list(queryset.order_by('-created_at', '-id')[:self.page_size + 1])
+        if len(results) <= self.page_size and self.conversation_id is not None:
+            edge = (results[-1].created_at, results[-1].id) if results else before
+            results += archived_before(
+                PrivateMessage, self.conversation_id, edge, self.page_size + 1 - len(results)
+            )
+        self.has_previous = len(results) > self.page_size
+        self.has_next = before is not None
+        self.page = results[:self.page_size]
+        self.page.reverse()
+        return self.page
+    
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+    
+    def decode_position(self, request, param):
+        """Return (created_at, id) for a cursor param, or None if absent."""
+        token = request.query_params.get(param)
+        if not token:
+            return None
+        
+        try:
+            created_at, message_id = decode_cursor(token)
+            created_at = PrivateMessage._meta.get_field('created_at').to_python(created_at)
+            if created_at is None:
+                raise ValueError('Cursor has no timestamp')
+            return created_at, int(message_id)
+        except (ValueError, TypeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+    
+    def get_link(self, param, message):
+        token = encode_cursor([message.created_at.isoformat(), message.id])
+        other = self.after_query_param if param == self.before_query_param else self.before_query_param
+        return replace_query_param(remove_query_param(self.base_url, other), param, token)
+    
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(self.after_query_param, self.page[-1])
+    
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_link(self.before_query_param, self.page[0])
+    
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+    
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,67 @@
+"""
+Channel-layer fan-out of chat room messages.
+
+A message is serialized to its JSON frame once, by whoever stored it (the
+WebSocket consumer or the HTTP `send` action), and that text is what the
+group carries; each subscribed consumer just writes it to its socket.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from rest_framework.renderers import JSONRenderer
+from .models import ChatMessage
+from .serializers import ChatMessageSerializer
+
+REPLAY_LIMIT = 100
+
+
+def room_group_name(room_id):
+    return f'chat_room_{room_id}'
+
+
+def message_frame(message):
+    """JSON text of the frame that delivers one chat message."""
+    return JSONRenderer().render({
+        'type': 'message',
+        'message': ChatMessageSerializer(message).data,
+    }).decode()
+
+
+def replay_frame(messages, truncated):
+    """JSON text of the frame with the messages a reconnecting client missed."""
+    return JSONRenderer().render({
+        'type': 'replay',
+        'messages': ChatMessageSerializer(messages, many=True).data,
+        'truncated': truncated,
+    }).decode()
+
+
+def missed_messages(room_id, last_id):
+    """
+    Return (messages, truncated) for the messages after `last_id`, oldest
+    first.
+    
+    Only the newest REPLAY_LIMIT are returned; `truncated` tells the
+    client there was more and it should reload the room instead.
+    """
+    rows = list(
+        ChatMessage.objects.filter(room_id=room_id, id__gt=last_id)
+        .select_related('sender')
+        .order_by('-created_at', '-id')[:REPLAY_LIMIT + 1]
+    )
+    truncated = len(rows) > REPLAY_LIMIT
+    rows = rows[:REPLAY_LIMIT]
+    rows.reverse()
+    return rows, truncated
+
+
+def chat_message_event(frame):
+    return {'type': 'chat.message', 'frame': frame}
+
+
+def broadcast_chat_message(message):
+    """Send a stored chat message to everyone connected to its room."""
+    channel_layer = get_channel_layer()
+    async_to_sync(channel_layer.group_send)(
+        room_group_name(message.room_id),
+        chat_message_event(message_frame(message))
+    )
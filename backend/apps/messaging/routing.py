@@ -0,0 +1,9 @@
+"""
+WebSocket URL routing for messaging.
+"""
+from django.urls import path
+from .consumers import ChatRoomConsumer
+
+websocket_urlpatterns = [
+    path('ws/chat-rooms/<int:room_id>/', ChatRoomConsumer.as_asgi()),
+]
@@ -3,7 +3,9 @@ Serializers for messaging app.
 """
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.urls import reverse
 from .models import Conversation, PrivateMessage, ChatRoom, ChatMessage
+from .pagination import MessageHistoryPagination
 
 User = get_user_model()
 
@@ -17,41 +19,80 @@ class UserMinimalSerializer(serializers.ModelSerializer):
         fields = ['id', 'email', 'first_name', 'last_name', 'full_name', 'profile_picture']
 
 
+def read_by_recipients(message_id, sender_id, watermarks):
+    """A message is read once every participant but its sender read up to it."""
+    others = [last_read_id for user_id, last_read_id in watermarks.items() if user_id != sender_id]
+    return bool(others) and all(last_read_id >= message_id for last_read_id in others)
+
+
 class PrivateMessageSerializer(serializers.ModelSerializer):
-    """Serializer for private messages."""
+    """
+    Serializer for private messages.
+    
+    `is_read` comes from the participants' read watermarks, passed as
+    `read_watermarks` ({user id: last read message id}) in the context.
+    """
     sender = UserMinimalSerializer(read_only=True)
+    is_read = serializers.SerializerMethodField()
     
     class Meta:
         model = PrivateMessage
         fields = ['id', 'sender', 'content', 'is_read', 'created_at']
         read_only_fields = ['id', 'sender', 'created_at']
+    
+    def get_is_read(self, obj):
+        watermarks = self.context.get('read_watermarks') or {}
+        return read_by_recipients(obj.id, obj.sender_id, watermarks)
 
 
 class ConversationSerializer(serializers.ModelSerializer):
-    """Serializer for conversations."""
-    participants = UserMinimalSerializer(many=True, read_only=True)
+    """
+    Serializer for conversations.
+    
+    Reads only the denormalized `last_message`, the conversation's
+    memberships and an `unread_count` annotation, so list views that
+    select/prefetch/annotate them (see `ConversationViewSet.get_queryset`)
+    serialize without extra queries. `read_receipts` lists each
+    participant's read watermark.
+    """
+    participants = serializers.SerializerMethodField()
     last_message = serializers.SerializerMethodField()
     unread_count = serializers.SerializerMethodField()
     other_participant = serializers.SerializerMethodField()
+    read_receipts = serializers.SerializerMethodField()
     
     class Meta:
         model = Conversation
-        fields = ['id', 'participants', 'other_participant', 'last_message', 'unread_count', 'created_at', 'updated_at']
+        fields = [
+            'id', 'participants', 'other_participant', 'last_message', 'unread_count',
+            'read_receipts', 'created_at', 'updated_at',
+        ]
+    
+    def get_participants(self, obj):
+        users = [membership.user for membership in obj.memberships.all()]
+        return UserMinimalSerializer(users, many=True, context=self.context).data
     
     def get_last_message(self, obj):
-        last_msg = obj.messages.order_by('-created_at').first()
+        last_msg = obj.last_message
         if last_msg:
             return {
                 'content': last_msg.content[:100],
-                'sender_id': last_msg.sender.id,
+                'sender_id': last_msg.sender_id,
                 'created_at': last_msg.created_at,
-                'is_read': last_msg.is_read
+                'is_read': read_by_recipients(last_msg.id, last_msg.sender_id, obj.read_watermarks())
             }
         return None
     
     def get_unread_count(self, obj):
-        user = self.context.get('request').user
-        return obj.messages.filter(is_read=False).exclude(sender=user).count()
+        if hasattr(obj, 'unread_count'):
+            return obj.unread_count
+        return obj.unread_count_for(self.context.get('request').user)
+    
+    def get_read_receipts(self, obj):
+        return [
+            {'user_id': user_id, 'last_read_id': last_read_id}
+            for user_id, last_read_id in obj.read_watermarks().items()
+        ]
     
     def get_other_participant(self, obj):
         user = self.context.get('request').user
@@ -62,11 +103,35 @@ class ConversationSerializer(serializers.ModelSerializer):
 
 
 class ConversationDetailSerializer(ConversationSerializer):
-    """Detailed conversation with messages."""
-    messages = PrivateMessageSerializer(many=True, read_only=True)
+    """
+    Detailed conversation with its latest page of messages.
+    
+    `messages_previous` links to the older history, or is null when the
+    whole conversation fits on the page.
+    """
+    messages = serializers.SerializerMethodField()
+    messages_previous = serializers.SerializerMethodField()
     
     class Meta(ConversationSerializer.Meta):
-        fields = ConversationSerializer.Meta.fields + ['messages']
+        fields = ConversationSerializer.Meta.fields + ['messages', 'messages_previous']
+    
+    def to_representation(self, instance):
+        request = self.context['request']
+        self._history = MessageHistoryPagination(conversation_id=instance.pk)
+        self._history_page = self._history.paginate_queryset(
+            instance.messages.select_related('sender'), request
+        )
+        self._history.base_url = request.build_absolute_uri(
+            reverse('conversation-messages', args=[instance.pk])
+        )
+        return super().to_representation(instance)
+    
+    def get_messages(self, obj):
+        context = {**self.context, 'read_watermarks': obj.read_watermarks()}
+        return PrivateMessageSerializer(self._history_page, many=True, context=context).data
+    
+    def get_messages_previous(self, obj):
+        return self._history.get_previous_link()
 
 
 class CreateMessageSerializer(serializers.Serializer):
@@ -85,14 +150,11 @@ class CreateMessageSerializer(serializers.Serializer):
 
 class ChatRoomSerializer(serializers.ModelSerializer):
     """Serializer for chat rooms."""
-    message_count = serializers.SerializerMethodField()
     
     class Meta:
         model = ChatRoom
-        fields = ['id', 'name', 'description', 'is_active', 'message_count', 'created_at']
-    
-    def get_message_count(self, obj):
-        return obj.messages.count()
+        fields = ['id', 'name', 'description', 'is_active', 'message_count', 'last_message_at', 'created_at']
+        read_only_fields = ['message_count', 'last_message_at']
 
 
 class ChatMessageSerializer(serializers.ModelSerializer):
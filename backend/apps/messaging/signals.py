@@ -0,0 +1,42 @@
+"""
+Django signals for keeping messaging counters and the sync log up to date.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import ChatMessage, PrivateMessage, SyncChange
+from .counters import forget_chat_message, record_chat_message
+
+
+@receiver(post_save, sender=ChatMessage)
+def count_chat_message(sender, instance, created, raw=False, **kwargs):
+    """Update the room counters for every stored message (HTTP or WebSocket)."""
+    if created and not raw:
+        record_chat_message(instance)
+
+
+@receiver(post_delete, sender=ChatMessage)
+def uncount_chat_message(sender, instance, **kwargs):
+    """Update the room counters when a message is deleted."""
+    forget_chat_message(instance)
+
+
+@receiver(post_save, sender=PrivateMessage)
+def log_private_message(sender, instance, created, raw=False, **kwargs):
+    """Record a new private message for the participants' delta sync."""
+    if created and not raw:
+        SyncChange.objects.create(
+            kind=SyncChange.MESSAGE,
+            conversation_id=instance.conversation_id,
+            object_id=instance.id
+        )
+
+
+@receiver(post_save, sender=ChatMessage)
+def log_chat_message(sender, instance, created, raw=False, **kwargs):
+    """Record a new chat room message for subscribers' delta sync."""
+    if created and not raw:
+        SyncChange.objects.create(
+            kind=SyncChange.CHAT_MESSAGE,
+            room_id=instance.room_id,
+            object_id=instance.id
+        )
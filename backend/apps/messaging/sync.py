@@ -0,0 +1,185 @@
+"""
+Delta sync for messaging clients.
+
+Writes append a SyncChange row in the same transaction (see signals.py and
+the Conversation model). A sync token is a signed (user, sequence) pair;
+a sync request returns the changes visible to the user after that
+sequence, materialized in a few bulk queries, plus the token to resume
+from. Ids are handed out at insert but become visible at commit, so only
+changes older than MESSAGING_SYNC_SETTLE_SECONDS are served: a slower
+transaction holding a lower id has committed by then and is not skipped.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core import signing
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from rest_framework import serializers
+from .counters import unread_count_subquery
+from .models import (
+    ChatMessage, Conversation, ConversationParticipant, PrivateMessage, SyncChange
+)
+from .serializers import ChatMessageSerializer, PrivateMessageSerializer
+
+SYNC_TOKEN_SALT = 'messaging.sync'
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 1000
+
+_datetime_field = serializers.DateTimeField()
+
+
+class InvalidSyncToken(Exception):
+    """The token is malformed, tampered with, or belongs to another user."""
+
+
+class ExpiredSyncToken(Exception):
+    """The token is older than the change log retention; a full reload is needed."""
+
+
+def retention():
+    return timedelta(days=settings.MESSAGING_SYNC_RETENTION_DAYS)
+
+
+def make_token(user, sequence):
+    return signing.dumps({'u': user.id, 's': sequence}, salt=SYNC_TOKEN_SALT)
+
+
+def read_token(user, token):
+    """Return the sequence a token points at."""
+    try:
+        data = signing.loads(token, salt=SYNC_TOKEN_SALT, max_age=retention())
+    except signing.SignatureExpired:
+        raise ExpiredSyncToken()
+    except signing.BadSignature:
+        raise InvalidSyncToken()
+    if not isinstance(data, dict) or data.get('u') != user.id or not isinstance(data.get('s'), int):
+        raise InvalidSyncToken()
+    return data['s']
+
+
+def visible_changes(user, room_ids):
+    """Changes whose audience includes `user` (rooms are the ones they joined)."""
+    conversation_ids = ConversationParticipant.objects.filter(user=user).values('conversation_id')
+    return SyncChange.objects.filter(
+        Q(conversation_id__in=conversation_ids) | Q(room_id__in=room_ids)
+    )
+
+
+def settle_cutoff():
+    """Changes created after this may still have slower writers below them."""
+    return timezone.now() - timedelta(seconds=settings.MESSAGING_SYNC_SETTLE_SECONDS)
+
+
+def settled_head(cutoff):
+    """Highest sequence number that has settled."""
+    return (
+        SyncChange.objects.filter(created_at__lte=cutoff)
+        .order_by('-id').values_list('id', flat=True).first()
+    ) or 0
+
+
+def current_sequence():
+    return settled_head(settle_cutoff())
+
+
+def read_changes(user, sequence, room_ids=(), limit=DEFAULT_LIMIT):
+    """
+    Return (changes, next sequence, has_more) after `sequence`.
+    
+    At most `limit` settled changes are returned. Once caught up the next
+    sequence jumps to the settled head, so changes for other users are
+    not rescanned by the next request.
+    """
+    cutoff = settle_cutoff()
+    rows = list(
+        visible_changes(user, room_ids).filter(id__gt=sequence)
+        .order_by('id')
+        .values('id', 'kind', 'conversation_id', 'room_id', 'object_id', 'created_at')[:limit + 1]
+    )
+    
+    changes = []
+    unsettled = False
+    for row in rows:
+        if row['created_at'] > cutoff:
+            unsettled = True
+            break
+        changes.append(row)
+    
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if has_more or unsettled:
+        next_sequence = changes[-1]['id'] if changes else sequence
+    else:
+        next_sequence = max(sequence, settled_head(cutoff))
+    return changes, next_sequence, has_more
+
+
+def build_payload(user, changes, context):
+    """Materialize changes: new messages plus current state of touched conversations."""
+    message_ids = [c['object_id'] for c in changes if c['kind'] == SyncChange.MESSAGE]
+    chat_message_ids = [c['object_id'] for c in changes if c['kind'] == SyncChange.CHAT_MESSAGE]
+    conversation_ids = {c['conversation_id'] for c in changes if c['conversation_id']}
+    
+    conversations = list(
+        Conversation.objects.filter(id__in=conversation_ids)
+        .prefetch_related(Prefetch('memberships', queryset=ConversationParticipant.objects.order_by('id')))
+        .annotate(unread_count=unread_count_subquery(user))
+        .order_by('id')
+    ) if conversation_ids else []
+    watermarks = {conversation.id: conversation.read_watermarks() for conversation in conversations}
+    
+    messages = []
+    if message_ids:
+        for message in PrivateMessage.objects.filter(id__in=message_ids).select_related('sender').order_by('id'):
+            data = PrivateMessageSerializer(message, context={
+                **context, 'read_watermarks': watermarks.get(message.conversation_id, {}),
+            }).data
+            messages.append({**data, 'conversation': message.conversation_id})
+    
+    chat_messages = []
+    if chat_message_ids:
+        rows = ChatMessage.objects.filter(id__in=chat_message_ids).select_related('sender').order_by('id')
+        for message in rows:
+            data = ChatMessageSerializer(message, context=context).data
+            chat_messages.append({**data, 'room': message.room_id})
+    
+    return {
+        'messages': messages,
+        'chat_messages': chat_messages,
+        'conversations': [
+            {
+                'id': conversation.id,
+                'participants': list(watermarks[conversation.id]),
+                'last_message_id': conversation.last_message_id,
+                'unread_count': conversation.unread_count,
+                'read_receipts': [
+                    {'user_id': user_id, 'last_read_id': last_read_id}
+                    for user_id, last_read_id in watermarks[conversation.id].items()
+                ],
+                'updated_at': _datetime_field.to_representation(conversation.updated_at),
+            }
+            for conversation in conversations
+        ],
+    }
+
+
+def prune_changes(chunk_size=5000):
+    """
+    Delete change log entries older than the retention period.
+    
+    Works down from the newest expired id in id-range chunks. Returns the
+    number of entries deleted.
+    """
+    boundary = (
+        SyncChange.objects.filter(created_at__lt=timezone.now() - retention())
+        .order_by('-id').values_list('id', flat=True).first()
+    )
+    deleted = 0
+    while boundary:
+        count, _ = SyncChange.objects.filter(id__lte=boundary, id__gt=boundary - chunk_size).delete()
+        deleted += count
+        boundary = (
+            SyncChange.objects.filter(id__lte=boundary - chunk_size)
+            .order_by('-id').values_list('id', flat=True).first()
+        )
+    return deleted
@@ -0,0 +1,667 @@
+"""
+Tests for messaging app.
+"""
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.messaging.models import (
+    ChatMessage, ChatRoom, Conversation, ConversationParticipant, MessageArchiveSegment,
+    PrivateMessage, SyncChange
+)
+from apps.messaging.routing import websocket_urlpatterns
+
+User = get_user_model()
+
+
+class ConversationListTests(TestCase):
+    """Test the conversation list and denormalized per-participant state."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='me@pucit.edu.pk', password='TestPass123!')
+        self.other = User.objects.create_user(email='you@pucit.edu.pk', password='TestPass123!')
+        self.client.force_authenticate(user=self.user)
+    
+    def send(self, sender, **data):
+        self.client.force_authenticate(user=sender)
+        response = self.client.post('/api/messaging/send/', data)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+    
+    def make_conversations(self, count):
+        start = User.objects.count()
+        for i in range(start, start + count):
+            peer = User.objects.create_user(email=f'peer{i}@pucit.edu.pk', password='TestPass123!')
+            conversation, _ = Conversation.objects.get_or_create_direct(self.user, peer)
+            message = PrivateMessage.objects.create(conversation=conversation, sender=peer, content=f'hi {i}')
+            Conversation.objects.filter(id=conversation.id).update(last_message=message)
+    
+    def test_send_maintains_last_message_and_unread_counts(self):
+        """Test sending updates the last message and unread counts."""
+        first = self.send(self.other, recipient_id=self.user.id, content='Hello')
+        conversation = Conversation.objects.get()
+        self.send(self.other, conversation_id=conversation.id, content='Again')
+        
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message.content, 'Again')
+        self.assertGreater(conversation.last_message_id, first['id'])
+        self.assertEqual(conversation.unread_count_for(self.user), 2)
+        self.assertEqual(conversation.unread_count_for(self.other), 0)
+        
+        response = self.client.get('/api/messaging/conversations/')
+        item = response.data['results'][0]
+        self.assertEqual(item['unread_count'], 2)
+        self.assertEqual(item['last_message']['content'], 'Again')
+        self.assertFalse(item['last_message']['is_read'])
+        self.assertEqual(item['other_participant']['id'], self.other.id)
+    
+    def test_retrieve_marks_conversation_read(self):
+        """Test opening a conversation marks it read."""
+        self.send(self.other, recipient_id=self.user.id, content='Hello')
+        conversation = Conversation.objects.get()
+        
+        response = self.client.get(f'/api/messaging/conversations/{conversation.id}/')
+        self.assertEqual(response.data['unread_count'], 0)
+        self.assertTrue(response.data['messages'][0]['is_read'])
+        mine = ConversationParticipant.objects.get(conversation=conversation, user=self.user)
+        self.assertEqual(mine.last_read_id, conversation.last_message_id)
+        
+        # Once read, opening it again writes nothing
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'/api/messaging/conversations/{conversation.id}/')
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE')])
+    
+    def test_list_query_count_is_constant(self):
+        """Test the list query count does not grow with conversations."""
+        self.make_conversations(3)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/messaging/conversations/')
+        self.assertEqual(response.data['count'], 3)
+        
+        self.make_conversations(50)
+        # Count, page of conversations with last messages and unread counts,
+        # memberships with users
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/messaging/conversations/')
+        self.assertEqual(response.data['count'], 53)
+
+
+class DirectConversationTests(TestCase):
+    """Test canonical pair lookup of two-person conversations."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='me@pucit.edu.pk', password='TestPass123!')
+        self.other = User.objects.create_user(email='you@pucit.edu.pk', password='TestPass123!')
+        self.client.force_authenticate(user=self.user)
+    
+    def test_pair_is_canonical(self):
+        """Test both orderings of a pair resolve to one conversation."""
+        conversation, created = Conversation.objects.get_or_create_direct(self.other, self.user)
+        self.assertTrue(created)
+        self.assertEqual(conversation.user_low_id, min(self.user.id, self.other.id))
+        self.assertEqual(conversation.user_high_id, max(self.user.id, self.other.id))
+        
+        again, created = Conversation.objects.get_or_create_direct(self.user, self.other)
+        self.assertFalse(created)
+        self.assertEqual(again.id, conversation.id)
+        self.assertEqual(set(conversation.participants.values_list('id', flat=True)), {self.user.id, self.other.id})
+    
+    def test_lookup_is_single_query(self):
+        """Test an existing pair is found with one query."""
+        Conversation.objects.get_or_create_direct(self.user, self.other)
+        with CaptureQueriesContext(connection) as queries:
+            Conversation.objects.get_or_create_direct(self.other, self.user)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('conversations_participants', queries[0]['sql'])
+    
+    def test_start_and_send_share_conversation(self):
+        """Test start and send use the same conversation."""
+        response = self.client.post('/api/messaging/conversations/start/', {'recipient_id': self.other.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post('/api/messaging/conversations/start/', {'recipient_id': self.other.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.post('/api/messaging/send/', {'recipient_id': self.other.id, 'content': 'Hi'})
+        self.assertEqual(Conversation.objects.count(), 1)
+
+
+class MergeDuplicateConversationsMigrationTests(TransactionTestCase):
+    """Test the canonical pair migration folds duplicate DMs together."""
+    
+    migrate_from = ('messaging', '0002_conversationparticipant_conversation_last_message')
+    migrate_to = ('messaging', '0005_conversation_unique_direct_conversation')
+    
+    def test_duplicates_are_merged(self):
+        """Test duplicate conversations are merged with their messages."""
+        executor = MigrationExecutor(connection)
+        executor.migrate([self.migrate_from])
+        apps = executor.loader.project_state([self.migrate_from]).apps
+        OldUser = apps.get_model('users', 'User')
+        OldConversation = apps.get_model('messaging', 'Conversation')
+        OldParticipant = apps.get_model('messaging', 'ConversationParticipant')
+        OldMessage = apps.get_model('messaging', 'PrivateMessage')
+        
+        a = OldUser.objects.create(email='a@pucit.edu.pk')
+        b = OldUser.objects.create(email='b@pucit.edu.pk')
+        conversation_ids = []
+        for content in ['first', 'second']:
+            conversation = OldConversation.objects.create()
+            OldParticipant.objects.create(conversation=conversation, user=b)
+            OldParticipant.objects.create(conversation=conversation, user=a)
+            OldMessage.objects.create(conversation=conversation, sender=a, content=content)
+            conversation_ids.append(conversation.id)
+        
+        executor = MigrationExecutor(connection)
+        executor.migrate([self.migrate_to])
+        
+        apps = executor.loader.project_state([self.migrate_to]).apps
+        conversation = apps.get_model('messaging', 'Conversation').objects.get()
+        self.assertEqual(conversation.id, conversation_ids[0])
+        self.assertEqual((conversation.user_low_id, conversation.user_high_id), tuple(sorted([a.id, b.id])))
+        self.assertEqual(conversation.messages.count(), 2)
+        self.assertEqual(conversation.last_message.content, 'second')
+        membership = apps.get_model('messaging', 'ConversationParticipant').objects.get(user_id=b.id)
+        self.assertEqual(membership.unread_count, 2)
+    
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+class ReadWatermarkTests(TestCase):
+    """Test read state from per-participant watermarks."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='me@pucit.edu.pk', password='TestPass123!')
+        self.other = User.objects.create_user(email='you@pucit.edu.pk', password='TestPass123!')
+        self.client.force_authenticate(user=self.user)
+        self.conversation, _ = Conversation.objects.get_or_create_direct(self.user, self.other)
+        self.ids = []
+        for i in range(4):
+            message = PrivateMessage.objects.create(
+                conversation=self.conversation, sender=self.other, content=f'm{i}'
+            )
+            self.ids.append(message.id)
+        Conversation.objects.filter(id=self.conversation.id).update(last_message=message)
+        self.url = f'/api/messaging/conversations/{self.conversation.id}/read/'
+    
+    def test_partial_read_and_receipts(self):
+        """Test reading up to a message and the sender's receipts."""
+        with self.assertNumQueries(7):
+            # Membership check, watermark update and sync change in a
+            # savepoint, then watermark and unread count
+            response = self.client.post(self.url, {'message_id': self.ids[1]})
+        self.assertEqual(response.data, {'last_read_id': self.ids[1], 'unread_count': 2})
+        
+        # Watermarks never move back
+        response = self.client.post(self.url, {'message_id': self.ids[0]})
+        self.assertEqual(response.data['last_read_id'], self.ids[1])
+        
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get(f'/api/messaging/conversations/{self.conversation.id}/messages/')
+        self.assertEqual([m['is_read'] for m in response.data['results']], [True, True, False, False])
+        response = self.client.get('/api/messaging/conversations/')
+        receipts = {r['user_id']: r['last_read_id'] for r in response.data['results'][0]['read_receipts']}
+        self.assertEqual(receipts[self.user.id], self.ids[1])
+    
+    def test_read_defaults_to_last_message_and_is_clamped(self):
+        """Test read defaults to the last message and is clamped to it."""
+        response = self.client.post(self.url, {'message_id': self.ids[-1] + 1000})
+        self.assertEqual(response.data, {'last_read_id': self.ids[-1], 'unread_count': 0})
+        
+        response = self.client.post(self.url, {'message_id': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_marking_read_touches_one_row(self):
+        """Test marking read writes only the reader's membership row."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('conversations_participants', updates[0])
+
+
+class MessageHistoryTests(TestCase):
+    """Test keyset pages of a conversation's messages."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='me@pucit.edu.pk', password='TestPass123!')
+        self.other = User.objects.create_user(email='you@pucit.edu.pk', password='TestPass123!')
+        self.client.force_authenticate(user=self.user)
+        self.conversation, _ = Conversation.objects.get_or_create_direct(self.user, self.other)
+        PrivateMessage.objects.bulk_create([
+            PrivateMessage(
+                conversation=self.conversation,
+                sender=self.user if i % 2 else self.other,
+                content=f'message {i}'
+            )
+            for i in range(120)
+        ])
+        self.ids = list(self.conversation.messages.order_by('created_at', 'id').values_list('id', flat=True))
+    
+    def test_detail_returns_latest_page(self):
+        """Test the detail view embeds the latest page of messages."""
+        response = self.client.get(f'/api/messaging/conversations/{self.conversation.id}/')
+        self.assertEqual([m['id'] for m in response.data['messages']], self.ids[-50:])
+        self.assertIn(f'/conversations/{self.conversation.id}/messages/?before=', response.data['messages_previous'])
+    
+    def test_walk_history_backwards_and_forwards(self):
+        """Test history cursors walk both ways without gaps."""
+        url = f'/api/messaging/conversations/{self.conversation.id}/messages/?page_size=50'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen = [m['id'] for m in response.data['results']] + seen
+            url = response.data['previous']
+        self.assertEqual(seen, self.ids)
+        
+        # The oldest page links forward to the newer messages
+        response = self.client.get(response.data['next'])
+        self.assertEqual([m['id'] for m in response.data['results']], self.ids[20:70])
+    
+    def test_history_query_count(self):
+        """Test a history page takes a fixed number of queries."""
+        url = f'/api/messaging/conversations/{self.conversation.id}/messages/'
+        # Membership check, one page with senders joined, read watermarks
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'page_size': 100})
+        self.assertEqual(len(response.data['results']), 100)
+    
+    def test_invalid_cursor_and_non_member(self):
+        """Test bad cursors and non-members are rejected."""
+        url = f'/api/messaging/conversations/{self.conversation.id}/messages/'
+        response = self.client.get(url, {'before': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        stranger = User.objects.create_user(email='them@pucit.edu.pk', password='TestPass123!')
+        self.client.force_authenticate(user=stranger)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ChatRoomConsumerTests(TransactionTestCase):
+    """Test chat room WebSocket delivery and reconnect replay."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(email='me@pucit.edu.pk', password='TestPass123!')
+        self.other = User.objects.create_user(email='you@pucit.edu.pk', password='TestPass123!')
+        self.room = ChatRoom.objects.create(name='General')
+    
+    def connect(self, user, query=''):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'/ws/chat-rooms/{self.room.id}/{query}'
+        )
+        communicator.scope['user'] = user
+        return communicator
+    
+    async def test_message_is_stored_and_broadcast(self):
+        """Test a WebSocket message is stored and broadcast to the room."""
+        mine = self.connect(self.user)
+        theirs = self.connect(self.other)
+        self.assertTrue((await mine.connect())[0])
+        self.assertTrue((await theirs.connect())[0])
+        
+        await mine.send_to(text_data=json.dumps({'content': 'Hello room'}))
+        received = [json.loads(await c.receive_from()) for c in (mine, theirs)]
+        self.assertEqual(received[0], received[1])
+        self.assertEqual(received[0]['type'], 'message')
+        self.assertEqual(received[0]['message']['content'], 'Hello room')
+        self.assertEqual(received[0]['message']['sender']['id'], self.user.id)
+        
+        stored = await sync_to_async(ChatMessage.objects.get)()
+        self.assertEqual(received[0]['message']['id'], stored.id)
+        
+        await mine.send_to(text_data=json.dumps({'content': ''}))
+        self.assertEqual(json.loads(await mine.receive_from())['type'], 'error')
+        await mine.disconnect()
+        await theirs.disconnect()
+    
+    async def test_http_send_is_broadcast(self):
+        """Test messages sent over HTTP reach WebSocket clients."""
+        listener = self.connect(self.other)
+        await listener.connect()
+        
+        def post():
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            return client.post(f'/api/messaging/chat-rooms/{self.room.id}/send/', {'content': 'Via HTTP'})
+        response = await sync_to_async(post)()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        frame = json.loads(await listener.receive_from())
+        self.assertEqual(frame['message']['id'], response.data['id'])
+        await listener.disconnect()
+    
+    async def test_reconnect_replays_gap(self):
+        """Test reconnecting with last_id replays missed messages."""
+        def create(count):
+            return [
+                ChatMessage.objects.create(room=self.room, sender=self.other, content=f'm{i}').id
+                for i in range(count)
+            ]
+        ids = await sync_to_async(create)(5)
+        
+        communicator = self.connect(self.user, f'?last_id={ids[1]}')
+        await communicator.connect()
+        frame = json.loads(await communicator.receive_from())
+        self.assertEqual(frame['type'], 'replay')
+        self.assertFalse(frame['truncated'])
+        self.assertEqual([m['id'] for m in frame['messages']], ids[2:])
+        await communicator.disconnect()
+    
+    async def test_anonymous_and_inactive_room_rejected(self):
+        """Test anonymous users and inactive rooms are refused."""
+        communicator = self.connect(AnonymousUser())
+        self.assertFalse((await communicator.connect())[0])
+        
+        await sync_to_async(ChatRoom.objects.filter(id=self.room.id).update)(is_active=False)
+        communicator = self.connect(self.user)
+        self.assertFalse((await communicator.connect())[0])
+
+
+class ChatRoomCounterTests(TestCase):
+    """Test stored message_count / last_message_at on chat rooms."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='me@pucit.edu.pk', password='TestPass123!')
+        self.client.force_authenticate(user=self.user)
+        self.room = ChatRoom.objects.create(name='General')
+    
+    def test_send_and_delete_maintain_counters(self):
+        """Test sending and deleting keep room counters in step."""
+        url = f'/api/messaging/chat-rooms/{self.room.id}/send/'
+        first = self.client.post(url, {'content': 'one'}).data
+        second = self.client.post(url, {'content': 'two'}).data
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.message_count, 2)
+        self.assertEqual(self.room.last_message_at, ChatMessage.objects.get(id=second['id']).created_at)
+        
+        ChatMessage.objects.get(id=second['id']).delete()
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.message_count, 1)
+        self.assertEqual(self.room.last_message_at, ChatMessage.objects.get(id=first['id']).created_at)
+        
+        ChatMessage.objects.all().delete()
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.message_count, 0)
+        self.assertIsNone(self.room.last_message_at)
+    
+    def test_room_list_does_not_count_per_room(self):
+        """Test the room list reads stored counters instead of counting per room."""
+        for i in range(10):
+            room = ChatRoom.objects.create(name=f'Room {i}')
+            ChatMessage.objects.create(room=room, sender=self.user, content='hi')
+        # Pagination count plus the page itself
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/messaging/chat-rooms/')
+        counts = {room['name']: room['message_count'] for room in response.data['results']}
+        self.assertEqual(counts['Room 0'], 1)
+        self.assertEqual(counts['General'], 0)
+    
+    def test_repair_command_fixes_drift(self):
+        """Test the rebuild command repairs drifted counters."""
+        ChatMessage.objects.create(room=self.room, sender=self.user, content='hi')
+        ChatRoom.objects.create(name='Empty')
+        ChatRoom.objects.filter(id=self.room.id).update(message_count=7, last_message_at=None)
+        
+        out = StringIO()
+        call_command('rebuild_chat_room_counts', stdout=out)
+        self.assertIn('Fixed counters on 1 chat rooms', out.getvalue())
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.message_count, 1)
+        self.assertIsNotNone(self.room.last_message_at)
+        
+        out = StringIO()
+        call_command('rebuild_chat_room_counts', stdout=out)
+        self.assertIn('Fixed counters on 0 chat rooms', out.getvalue())
+
+
+@override_settings(MESSAGING_SYNC_SETTLE_SECONDS=0)
+class DeltaSyncTests(TestCase):
+    """Test delta sync over the messaging change log."""
+    
+    url = '/api/messaging/sync/'
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='me@pucit.edu.pk', password='TestPass123!')
+        self.other = User.objects.create_user(email='you@pucit.edu.pk', password='TestPass123!')
+        self.client.force_authenticate(user=self.user)
+        self.room = ChatRoom.objects.create(name='General')
+        self.token = self.client.get(self.url).data['token']
+    
+    def send(self, content):
+        self.client.force_authenticate(user=self.other)
+        response = self.client.post('/api/messaging/send/', {'recipient_id': self.user.id, 'content': content})
+        self.client.force_authenticate(user=self.user)
+        return response.data
+    
+    def test_returns_changes_since_token(self):
+        """Test sync returns only changes after the token."""
+        message = self.send('Hello')
+        ChatMessage.objects.create(room=self.room, sender=self.other, content='Room hello')
+        
+        response = self.client.get(self.url, {'token': self.token, 'rooms': self.room.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([m['id'] for m in response.data['messages']], [message['id']])
+        self.assertEqual([m['content'] for m in response.data['chat_messages']], ['Room hello'])
+        conversation = response.data['conversations'][0]
+        self.assertEqual(conversation['unread_count'], 1)
+        self.assertEqual(conversation['last_message_id'], message['id'])
+        self.assertFalse(response.data['has_more'])
+        
+        # Caught up: the next token returns nothing new
+        response = self.client.get(self.url, {'token': response.data['token'], 'rooms': self.room.id})
+        self.assertEqual(response.data['messages'], [])
+        self.assertEqual(response.data['conversations'], [])
+    
+    def test_read_watermark_changes_reach_the_sender(self):
+        """Test read watermark changes reach the sender."""
+        self.send('Hello')
+        conversation = Conversation.objects.get()
+        self.client.force_authenticate(user=self.other)
+        token = self.client.get(self.url).data['token']
+        
+        conversation.mark_read(self.user)
+        response = self.client.get(self.url, {'token': token})
+        receipts = {r['user_id']: r['last_read_id'] for r in response.data['conversations'][0]['read_receipts']}
+        self.assertEqual(receipts[self.user.id], conversation.last_message_id)
+    
+    def test_pages_are_bounded_and_resumable(self):
+        """Test sync pages are bounded and resume from the returned token."""
+        ids = [self.send(f'm{i}')['id'] for i in range(5)]
+        seen = []
+        token = self.token
+        for _ in range(5):
+            response = self.client.get(self.url, {'token': token, 'limit': 2})
+            seen += [m['id'] for m in response.data['messages']]
+            token = response.data['token']
+            if not response.data['has_more']:
+                break
+        self.assertEqual(seen, ids)
+    
+    def test_only_own_conversations_and_listed_rooms(self):
+        """Test other users' conversations never reach a stranger's sync."""
+        self.send('Hello')
+        ChatMessage.objects.create(room=self.room, sender=self.other, content='Room hello')
+        stranger = User.objects.create_user(email='them@pucit.edu.pk', password='TestPass123!')
+        self.client.force_authenticate(user=stranger)
+        token = self.client.get(self.url).data['token']
+        SyncChange.objects.all().delete()
+        self.send('Again')
+        
+        self.client.force_authenticate(user=stranger)
+        response = self.client.get(self.url, {'token': token})
+        self.assertEqual(response.data['messages'], [])
+        self.assertEqual(response.data['chat_messages'], [])
+    
+    @override_settings(MESSAGING_SYNC_SETTLE_SECONDS=60)
+    def test_unsettled_changes_wait(self):
+        """Test changes inside the settle lag are held back."""
+        self.send('Hello')
+        response = self.client.get(self.url, {'token': self.token})
+        self.assertEqual(response.data['messages'], [])
+        
+        SyncChange.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        response = self.client.get(self.url, {'token': response.data['token']})
+        self.assertEqual(len(response.data['messages']), 1)
+    
+    def test_bad_and_expired_tokens(self):
+        """Test malformed and expired tokens are rejected."""
+        response = self.client.get(self.url, {'token': self.token + 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get(self.url, {'token': self.token})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        self.client.force_authenticate(user=self.user)
+        with mock.patch('apps.messaging.sync.retention', return_value=timedelta(seconds=-1)):
+            response = self.client.get(self.url, {'token': self.token})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+    
+    def test_prune_command(self):
+        """Test the prune command deletes old change log entries."""
+        self.send('Old')
+        SyncChange.objects.update(created_at=timezone.now() - timedelta(days=60))
+        self.send('New')
+        out = StringIO()
+        call_command('prune_sync_changes', stdout=out)
+        self.assertIn('Deleted 2 sync changes', out.getvalue())
+        self.assertEqual(SyncChange.objects.count(), 1)
+
+
+class MessageArchiveTests(TestCase):
+    """Test archival into compressed segments and transparent history reads."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='me@pucit.edu.pk', password='TestPass123!')
+        self.other = User.objects.create_user(email='you@pucit.edu.pk', password='TestPass123!')
+        self.client.force_authenticate(user=self.user)
+        self.conversation, _ = Conversation.objects.get_or_create_direct(self.user, self.other)
+        self.room = ChatRoom.objects.create(name='General')
+        long_ago = timezone.now() - timedelta(days=365)
+        
+        self.ids = []
+        for i in range(10):
+            message = PrivateMessage.objects.create(
+                conversation=self.conversation, sender=self.other if i % 2 else self.user, content=f'm{i}'
+            )
+            if i < 6:
+                PrivateMessage.objects.filter(id=message.id).update(created_at=long_ago + timedelta(minutes=i))
+            self.ids.append(message.id)
+        Conversation.objects.filter(id=self.conversation.id).update(last_message=message)
+        
+        self.room_ids = []
+        for i in range(8):
+            message = ChatMessage.objects.create(room=self.room, sender=self.other, content=f'r{i}')
+            if i < 5:
+                ChatMessage.objects.filter(id=message.id).update(created_at=long_ago + timedelta(minutes=i))
+            self.room_ids.append(message.id)
+    
+    def archive(self, *args):
+        out = StringIO()
+        call_command('archive_messages', '--segment-size', '4', *args, stdout=out)
+        return out.getvalue()
+    
+    def test_archive_moves_old_messages_into_segments(self):
+        """Test old messages are moved into compressed segments."""
+        self.assertIn('Would archive 6 private messages from 1 conversations', self.archive('--dry-run'))
+        self.assertEqual(PrivateMessage.objects.count(), 10)
+        
+        output = self.archive()
+        self.assertIn('Archived 6 private messages from 1 conversations', output)
+        self.assertIn('Archived 5 chat messages from 1 chat rooms', output)
+        self.assertEqual(PrivateMessage.objects.count(), 4)
+        self.assertEqual(ChatMessage.objects.count(), 3)
+        self.assertEqual(
+            sorted(MessageArchiveSegment.objects.filter(conversation=self.conversation).values_list('message_count', flat=True)),
+            [2, 4]
+        )
+        # Archival is not a deletion as far as room counters are concerned
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.message_count, 8)
+    
+    def test_last_message_stays_hot(self):
+        """Test a conversation's last message is never archived."""
+        PrivateMessage.objects.update(created_at=timezone.now() - timedelta(days=365))
+        self.archive()
+        self.assertEqual(list(PrivateMessage.objects.values_list('id', flat=True)), [self.ids[-1]])
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message_id, self.ids[-1])
+    
+    def test_history_reads_through_archive(self):
+        """Test conversation history pages through archived messages."""
+        self.archive()
+        url = f'/api/messaging/conversations/{self.conversation.id}/messages/?page_size=3'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            seen = [m['id'] for m in response.data['results']] + seen
+            url = response.data['previous']
+        self.assertEqual(seen, self.ids)
+        self.assertEqual(response.data['results'][0]['sender']['id'], self.user.id)
+        
+        # Forward from the oldest page crosses back into the hot rows
+        response = self.client.get(response.data['next'])
+        self.assertEqual([m['id'] for m in response.data['results']], self.ids[1:4])
+        response = self.client.get(response.data['next'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([m['id'] for m in response.data['results']], self.ids[7:10])
+    
+    def test_rebuild_counts_archived_room_messages(self):
+        """Test rebuilding room counters after archival changes nothing."""
+        self.room.refresh_from_db()
+        before = (self.room.message_count, self.room.last_message_at)
+        self.archive()
+        self.assertEqual(ChatMessage.objects.filter(room=self.room).count(), 3)
+        out = StringIO()
+        
+        call_command('rebuild_chat_room_counts', stdout=out)
+        
+        self.assertIn('Fixed counters on 0 chat rooms', out.getvalue())
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.message_count, self.room.last_message_at), before)
+        self.assertEqual(before[0], 8)
+    
+    def test_deleting_hot_messages_keeps_archived_last_message(self):
+        """Test last_message_at falls back to the archive when the hot table empties."""
+        self.archive()
+        archived_last = MessageArchiveSegment.objects.filter(room=self.room).order_by('-last_created_at')[0]
+        
+        for message in ChatMessage.objects.filter(room=self.room):
+            message.delete()
+        
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.message_count, 5)
+        self.assertEqual(self.room.last_message_at, archived_last.last_created_at)
+    
+    def test_room_messages_read_through_archive(self):
+        """Test room history pages through archived messages."""
+        self.archive()
+        url = f'/api/messaging/chat-rooms/{self.room.id}/messages/'
+        response = self.client.get(url)
+        self.assertEqual([m['id'] for m in response.data], self.room_ids)
+        
+        response = self.client.get(url, {'before': self.room_ids[3]})
+        self.assertEqual([m['id'] for m in response.data], self.room_ids[:3])
+        response = self.client.get(url, {'before': 999999})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -3,7 +3,7 @@ URL configuration for messaging app.
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ConversationViewSet, SendMessageView, ChatRoomViewSet
+from .views import ConversationViewSet, SendMessageView, SyncView, ChatRoomViewSet
 
 router = DefaultRouter()
 router.register(r'conversations', ConversationViewSet, basename='conversation')
@@ -12,4 +12,5 @@ router.register(r'chat-rooms', ChatRoomViewSet, basename='chatroom')
 urlpatterns = [
     path('', include(router.urls)),
     path('send/', SendMessageView.as_view(), name='send-message'),
+    path('sync/', SyncView.as_view(), name='messaging-sync'),
 ]
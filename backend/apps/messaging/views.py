@@ -6,16 +6,26 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
-from django.db.models import Q, Max
-from .models import Conversation, PrivateMessage, ChatRoom, ChatMessage
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from .models import (
+    Conversation, ConversationParticipant, PrivateMessage, ChatRoom, ChatMessage
+)
 from .serializers import (
     ConversationSerializer, ConversationDetailSerializer,
     PrivateMessageSerializer, CreateMessageSerializer,
     ChatRoomSerializer, ChatMessageSerializer, CreateChatMessageSerializer
 )
+from .counters import unread_count_subquery
+from .pagination import MessageHistoryPagination
+from .realtime import broadcast_chat_message
+from . import archive, sync
 
 User = get_user_model()
 
+ROOM_MESSAGES_PAGE_SIZE = 100
+
 
 class ConversationViewSet(viewsets.ModelViewSet):
     """ViewSet for managing conversations."""
@@ -23,11 +33,20 @@ class ConversationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
+        user = self.request.user
+        if self.action in ('messages', 'read'):
+            return Conversation.objects.filter(memberships__user=user)
+        # Sending a message bumps updated_at, so this is last-activity order
         return Conversation.objects.filter(
-            participants=self.request.user
+            memberships__user=user
+        ).select_related('last_message').prefetch_related(
+            Prefetch(
+                'memberships',
+                queryset=ConversationParticipant.objects.select_related('user').order_by('id')
+            )
         ).annotate(
-            last_message_time=Max('messages__created_at')
-        ).order_by('-last_message_time')
+            unread_count=unread_count_subquery(user)
+        ).order_by('-updated_at', '-id')
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -36,13 +55,49 @@ class ConversationViewSet(viewsets.ModelViewSet):
     
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        # Mark messages as read
-        instance.messages.filter(is_read=False).exclude(
-            sender=request.user
-        ).update(is_read=True)
+        # Opening the conversation reads it: one watermark row update
+        if instance.unread_count and instance.mark_read(request.user):
+            instance = self.get_object()
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def messages(self, request, pk=None):
+        """Page through a conversation's messages (`before` / `after` cursors)."""
+        conversation = self.get_object()
+        paginator = MessageHistoryPagination(conversation_id=conversation.id)
+        page = paginator.paginate_queryset(
+            conversation.messages.select_related('sender'), request, view=self
+        )
+        context = {
+            **self.get_serializer_context(),
+            'read_watermarks': conversation.read_watermarks(),
+        }
+        serializer = PrivateMessageSerializer(page, many=True, context=context)
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        """Mark the conversation read up to `message_id` (default: the last message)."""
+        conversation = self.get_object()
+        message_id = request.data.get('message_id')
+        if message_id is not None:
+            try:
+                message_id = int(message_id)
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': 'message_id must be an integer'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        conversation.mark_read(request.user, message_id)
+        last_read_id = conversation.memberships.values_list(
+            'last_read_id', flat=True
+        ).get(user=request.user)
+        return Response({
+            'last_read_id': last_read_id,
+            'unread_count': conversation.unread_count_for(request.user, last_read_id),
+        })
+    
     @action(detail=False, methods=['post'])
     def start(self, request):
         """Start a new conversation or get existing one."""
@@ -62,27 +117,16 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Check for existing conversation
-        existing = Conversation.objects.filter(
-            participants=request.user
-        ).filter(
-            participants=recipient
-        ).first()
-        
-        if existing:
-            serializer = ConversationDetailSerializer(
-                existing, context={'request': request}
-            )
-            return Response(serializer.data)
-        
-        # Create new conversation
-        conversation = Conversation.objects.create()
-        conversation.participants.add(request.user, recipient)
+        conversation, created = Conversation.objects.get_or_create_direct(
+            request.user, recipient
+        )
         
         serializer = ConversationDetailSerializer(
             conversation, context={'request': request}
         )
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        if created:
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.data)
 
 
 class SendMessageView(generics.CreateAPIView):
@@ -119,25 +163,19 @@ class SendMessageView(generics.CreateAPIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            conversation = Conversation.objects.filter(
-                participants=request.user
-            ).filter(
-                participants=recipient
-            ).first()
-            
-            if not conversation:
-                conversation = Conversation.objects.create()
-                conversation.participants.add(request.user, recipient)
-        
-        # Create message
-        message = PrivateMessage.objects.create(
-            conversation=conversation,
-            sender=request.user,
-            content=content
-        )
+            conversation, _ = Conversation.objects.get_or_create_direct(
+                request.user, recipient
+            )
         
-        # Update conversation timestamp
-        conversation.save()  # This updates updated_at
+        with transaction.atomic():
+            message = PrivateMessage.objects.create(
+                conversation=conversation,
+                sender=request.user,
+                content=content
+            )
+            Conversation.objects.filter(id=conversation.id).update(
+                last_message=message, updated_at=timezone.now()
+            )
         
         return Response(
             PrivateMessageSerializer(message).data,
@@ -145,6 +183,60 @@ class SendMessageView(generics.CreateAPIView):
         )
 
 
+class SyncView(generics.GenericAPIView):
+    """
+    Delta sync: what changed since a sync token.
+    
+    `GET ?token=<token>&rooms=<id,id>&limit=<n>` returns new private
+    messages, new messages in the listed chat rooms, and the current state
+    (unread count, read receipts) of conversations that changed, along with
+    the token to pass next time. Without a token it only returns a token
+    for the current position. `has_more` means another request will
+    return more right away.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        params = request.query_params
+        try:
+            room_ids = [int(value) for value in params.get('rooms', '').split(',') if value]
+            limit = min(max(int(params.get('limit', sync.DEFAULT_LIMIT)), 1), sync.MAX_LIMIT)
+        except ValueError:
+            return Response(
+                {'error': 'rooms must be comma-separated ids and limit an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        token = params.get('token')
+        if not token:
+            # Fresh clients load conversations as usual, then sync from here
+            return Response({
+                **sync.build_payload(request.user, [], self.get_serializer_context()),
+                'token': sync.make_token(request.user, sync.current_sequence()),
+                'has_more': False,
+            })
+        
+        try:
+            sequence = sync.read_token(request.user, token)
+        except sync.ExpiredSyncToken:
+            return Response(
+                {'error': 'Sync token expired; reload conversations and start again'},
+                status=status.HTTP_410_GONE
+            )
+        except sync.InvalidSyncToken:
+            return Response(
+                {'error': 'Invalid sync token'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        changes, next_sequence, has_more = sync.read_changes(request.user, sequence, room_ids, limit)
+        return Response({
+            **sync.build_payload(request.user, changes, self.get_serializer_context()),
+            'token': sync.make_token(request.user, next_sequence),
+            'has_more': has_more,
+        })
+
+
 class ChatRoomViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for chat rooms."""
     queryset = ChatRoom.objects.filter(is_active=True)
@@ -153,10 +245,32 @@ class ChatRoomViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=True, methods=['get'])
     def messages(self, request, pk=None):
-        """Get messages for a chat room."""
+        """Get the last 100 messages of a chat room, or those before `?before=<message id>`."""
         room = self.get_object()
-        messages = room.messages.order_by('-created_at')[:100]
-        serializer = ChatMessageSerializer(reversed(list(messages)), many=True)
+        messages = room.messages.select_related('sender').order_by('-created_at', '-id')
+        
+        position = None
+        before = request.query_params.get('before')
+        if before:
+            try:
+                position = archive.message_position(ChatMessage, room.id, int(before))
+            except ValueError:
+                position = None
+            if position is None:
+                return Response(
+                    {'error': 'Message not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            messages = messages.filter(archive.before_position(position))
+        
+        messages = list(messages[:ROOM_MESSAGES_PAGE_SIZE])
+        if len(messages) < ROOM_MESSAGES_PAGE_SIZE:
+            # Older history lives in archive segments
+            edge = (messages[-1].created_at, messages[-1].id) if messages else position
+            messages += archive.archived_before(
+                ChatMessage, room.id, edge, ROOM_MESSAGES_PAGE_SIZE - len(messages)
+            )
+        serializer = ChatMessageSerializer(reversed(messages), many=True)
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
@@ -166,11 +280,14 @@ class ChatRoomViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = CreateChatMessageSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        message = ChatMessage.objects.create(
-            room=room,
-            sender=request.user,
-            content=serializer.validated_data['content']
-        )
+        with transaction.atomic():
+            message = ChatMessage.objects.create(
+                room=room,
+                sender=request.user,
+                content=serializer.validated_data['content']
+            )
+            # Deliver to WebSocket subscribers once the message is stored
+            transaction.on_commit(lambda: broadcast_chat_message(message))
         
         return Response(
             ChatMessageSerializer(message).data,
@@ -7,7 +7,7 @@ from .models import Notification
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ['recipient', 'sender', 'notification_type', 'is_read', 'created_at']
+    list_display = ['recipient', 'sender', 'notification_type', 'actor_count', 'is_read', 'updated_at']
     list_filter = ['notification_type', 'is_read', 'created_at']
     search_fields = ['recipient__email', 'sender__email', 'message']
-    readonly_fields = ['created_at']
+    readonly_fields = ['created_at', 'updated_at']
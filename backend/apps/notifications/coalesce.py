@@ -0,0 +1,134 @@
+"""
+Coalescing of notification events into aggregated rows.
+
+Events of the same type on the same target for one recipient ("commented
+on your post", "replied to your comment") are merged into that
+recipient's open row while it is unread and was last updated within
+`NOTIFICATIONS_COALESCE_WINDOW_MINUTES`. The row keeps an actor count and
+the most recent actors, so the list and the table grow with distinct
+events instead of raw activity. Reading a row closes it; later activity
+starts a new one.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import Notification
+
+RECENT_ACTORS_LIMIT = 3
+
+VERBS = {
+    'comment': 'commented on your post: {title}',
+    'reply': 'replied to your comment',
+}
+
+
+# One notification-worthy action, before coalescing
+Event = namedtuple('Event', [
+    'recipient_id', 'notification_type', 'target_key', 'actor_id', 'actor_name',
+    'post_id', 'comment_id', 'title',
+])
+
+
+def event_key(event):
+    return (event.recipient_id, event.notification_type, event.target_key)
+
+
+def render_message(notification_type, recent_actors, actor_count, title=''):
+    """Message text such as "Ali and 2 others commented on your post: ..."."""
+    names = [actor['name'] for actor in recent_actors]
+    if actor_count == 2 and len(names) == 2:
+        actors = f'{names[0]} and {names[1]}'
+    elif actor_count > 1:
+        others = actor_count - 1
+        actors = f"{names[0]} and {others} other{'s' if others > 1 else ''}"
+    else:
+        actors = names[0]
+    return f"{actors} {VERBS[notification_type].format(title=title)}"
+
+
+def open_notifications(events, since):
+    """
+    Unread rows updated since `since` that events can merge into, by key.
+    
+    One query for the whole batch; the rows are locked so a concurrent
+    dispatcher or mark-read waits for this batch to commit.
+    """
+    candidates = (
+        Notification.objects.select_for_update()
+        .filter(
+            recipient_id__in={event.recipient_id for event in events},
+            target_key__in={event.target_key for event in events},
+            is_read=False,
+            updated_at__gte=since,
+        )
+        .order_by('updated_at')
+    )
+    keys = {event_key(event) for event in events}
+    rows = {}
+    for notification in candidates:
+        key = (notification.recipient_id, notification.notification_type, notification.target_key)
+        if key in keys:
+            rows[key] = notification
+    return rows
+
+
+def coalesce_events(events):
+    """
+    Apply a batch of events, oldest first, inside the caller's transaction.
+    
+    Returns the notifications that were created or changed; an event from
+    the actor already at the head of a row changes nothing. `actor_count`
+    is the number of distinct actors, kept in `actor_ids`.
+    """
+    if not events:
+        return []
+    
+    now = timezone.now()
+    window = timedelta(minutes=settings.NOTIFICATIONS_COALESCE_WINDOW_MINUTES)
+    rows = open_notifications(events, now - window)
+    created = []
+    changed = {}
+    
+    for event in events:
+        actor = {'id': event.actor_id, 'name': event.actor_name}
+        notification = rows.get(event_key(event))
+        if notification is None:
+            notification = Notification(
+                recipient_id=event.recipient_id,
+                notification_type=event.notification_type,
+                target_key=event.target_key,
+                post_id=event.post_id,
+                recent_actors=[actor],
+                actor_ids=[event.actor_id],
+                actor_count=1,
+            )
+            rows[event_key(event)] = notification
+            created.append(notification)
+        else:
+            recent = notification.recent_actors
+            if recent and recent[0]['id'] == event.actor_id:
+                continue
+            if event.actor_id not in notification.actor_ids:
+                notification.actor_ids = [*notification.actor_ids, event.actor_id]
+                notification.actor_count += 1
+            notification.recent_actors = [actor] + [
+                previous for previous in recent if previous['id'] != event.actor_id
+            ][:RECENT_ACTORS_LIMIT - 1]
+            if notification.pk:
+                changed[notification.pk] = notification
+        
+        notification.sender_id = event.actor_id
+        notification.comment_id = event.comment_id
+        notification.updated_at = now
+        notification.message = render_message(
+            event.notification_type, notification.recent_actors, notification.actor_count, event.title
+        )
+    
+    Notification.objects.bulk_create(created)
+    # bulk_update skips auto_now, hence updated_at is set explicitly above
+    Notification.objects.bulk_update(
+        changed.values(),
+        ['sender', 'comment_id', 'message', 'actor_count', 'recent_actors', 'actor_ids', 'updated_at'],
+    )
+    return created + list(changed.values())
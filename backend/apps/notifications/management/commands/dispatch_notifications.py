@@ -0,0 +1,35 @@
+"""
+Create queued comment notifications and push them over WebSocket.
+
+Run as a long-lived worker next to the web processes:
+
+    python manage.py dispatch_notifications
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.notifications.outbox import dispatch_outbox
+
+
+class Command(BaseCommand):
+    help = 'Dispatch notification outbox entries in batches.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=float, default=settings.NOTIFICATIONS_DISPATCH_INTERVAL)
+        parser.add_argument('--once', action='store_true', help='Drain the outbox and exit.')
+    
+    def handle(self, *args, **options):
+        while True:
+            dispatched = 0
+            while True:
+                batch = dispatch_outbox(options['batch_size'])
+                dispatched += batch
+                if batch < options['batch_size']:
+                    break
+            
+            if dispatched:
+                self.stdout.write(f'Dispatched {dispatched} outbox entries')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:53
+
+from django.conf import settings
+from django.db import migrations
+
+
+def backfill_coalescing(apps, schema_editor):
+    """Give existing notifications their target, actor and activity time."""
+    Notification = apps.get_model('notifications', 'Notification')
+    Comment = apps.get_model('discussions', 'Comment')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    last_pk = 0
+    while True:
+        notifications = list(
+            Notification.objects.filter(pk__gt=last_pk).order_by('pk')
+            .only('id', 'sender_id', 'notification_type', 'post_id', 'comment_id', 'created_at')[:500]
+        )
+        if not notifications:
+            break
+        parents = dict(
+            Comment.objects.filter(id__in={n.comment_id for n in notifications if n.comment_id})
+            .values_list('id', 'parent_id')
+        )
+        names = {
+            pk: f'{first_name} {last_name}'.strip() for pk, first_name, last_name in
+            User.objects.filter(id__in={n.sender_id for n in notifications if n.sender_id})
+            .values_list('id', 'first_name', 'last_name')
+        }
+        for notification in notifications:
+            notification.updated_at = notification.created_at
+            if notification.sender_id in names:
+                notification.recent_actors = [
+                    {'id': notification.sender_id, 'name': names[notification.sender_id]}
+                ]
+            if notification.notification_type == 'comment' and notification.post_id:
+                notification.target_key = f'post:{notification.post_id}'
+            elif notification.notification_type == 'reply' and parents.get(notification.comment_id):
+                notification.target_key = f'comment:{parents[notification.comment_id]}'
+        Notification.objects.bulk_update(notifications, ['updated_at', 'recent_actors', 'target_key'])
+        last_pk = notifications[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('discussions', '0010_comment_comments_post_id_40286b_idx'),
+        ('notifications', '0004_notification_coalescing'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_coalescing, migrations.RunPython.noop),
+    ]
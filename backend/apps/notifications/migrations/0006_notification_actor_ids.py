@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+def backfill_actor_ids(apps, schema_editor):
+    """Seed the distinct actor set with the actors each row still lists."""
+    Notification = apps.get_model('notifications', 'Notification')
+    last_pk = 0
+    while True:
+        notifications = list(
+            Notification.objects.filter(pk__gt=last_pk).order_by('pk').only('id', 'recent_actors')[:500]
+        )
+        if not notifications:
+            break
+        for notification in notifications:
+            notification.actor_ids = [actor['id'] for actor in notification.recent_actors]
+        Notification.objects.bulk_update(notifications, ['actor_ids'])
+        last_pk = notifications[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_backfill_notification_coalescing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='actor_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(backfill_actor_ids, migrations.RunPython.noop),
+    ]
@@ -34,16 +34,48 @@ class Notification(models.Model):
     post_id = models.IntegerField(null=True, blank=True)
     comment_id = models.IntegerField(null=True, blank=True)
     
+    # Coalescing: events of one type on the same target (`post:<id>`,
+    # `comment:<id>`) are merged into the recipient's open row, see coalesce.py
+    target_key = models.CharField(max_length=64, blank=True, default='')
+    actor_count = models.PositiveIntegerField(default=1)
+    recent_actors = models.JSONField(default=list, blank=True)
+    # Every distinct actor id merged in, so returning actors count once
+    actor_ids = models.JSONField(default=list, blank=True)
+    
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'notifications'
-        ordering = ['-created_at']
+        ordering = ['-updated_at']
         indexes = [
-            models.Index(fields=['recipient', '-created_at']),
+            models.Index(fields=['recipient', '-updated_at']),
             models.Index(fields=['recipient', 'is_read']),
+            models.Index(fields=['recipient', 'notification_type', 'target_key']),
         ]
     
     def __str__(self):
         return f"Notification for {self.recipient.email}: {self.notification_type}"
+
+
+class NotificationOutbox(models.Model):
+    """
+    Notification work recorded in the transaction that caused it.
+    
+    Rows are written next to the comment insert and drained by
+    `dispatch_notifications`, which creates the notifications and pushes
+    the WebSocket events once the batch has committed.
+    """
+    
+    comment_id = models.BigIntegerField()
+    post_id = models.BigIntegerField()
+    parent_id = models.BigIntegerField(null=True, blank=True)
+    actor_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'notification_outbox'
+    
+    def __str__(self):
+        return f"Outbox entry for comment {self.comment_id}"
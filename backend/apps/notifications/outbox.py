@@ -0,0 +1,109 @@
+"""
+Transactional outbox for comment notifications.
+
+The comment request only inserts a `NotificationOutbox` row, in the same
+transaction as the comment, so a rolled back comment never notifies
+anyone and the request does not wait on the channel layer. The
+dispatcher turns batches of entries into `Notification` rows and pushes
+the WebSocket events after that batch has committed.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from apps.discussions.models import Post, Comment
+from .coalesce import Event, coalesce_events
+from .models import NotificationOutbox
+
+User = get_user_model()
+
+
+def record_comment(comment):
+    """Queue the notifications for a newly created comment."""
+    NotificationOutbox.objects.create(
+        comment_id=comment.id,
+        post_id=comment.post_id,
+        parent_id=comment.parent_id,
+        actor_id=comment.author_id,
+    )
+
+
+def build_events(entries):
+    """
+    Coalescing events for a batch of outbox entries, in entry order.
+    
+    Posts, comments and actors are loaded with one query each. Entries
+    whose post or comment was deleted in the meantime produce nothing.
+    """
+    posts = {
+        row['id']: row for row in
+        Post.objects.filter(id__in={entry.post_id for entry in entries}).values('id', 'author_id', 'title')
+    }
+    comment_ids = {entry.comment_id for entry in entries}
+    comment_ids.update(entry.parent_id for entry in entries if entry.parent_id)
+    comment_authors = dict(Comment.objects.filter(id__in=comment_ids).values_list('id', 'author_id'))
+    actor_names = {
+        pk: f'{first_name} {last_name}'.strip() for pk, first_name, last_name in
+        User.objects.filter(id__in={entry.actor_id for entry in entries}).values_list('id', 'first_name', 'last_name')
+    }
+    
+    events = []
+    for entry in entries:
+        post = posts.get(entry.post_id)
+        if post is None or entry.comment_id not in comment_authors or entry.actor_id not in actor_names:
+            continue
+        actor_name = actor_names[entry.actor_id]
+        
+        # Notify post author
+        if post['author_id'] != entry.actor_id:
+            events.append(Event(
+                post['author_id'], 'comment', f'post:{entry.post_id}', entry.actor_id, actor_name,
+                entry.post_id, entry.comment_id, post['title'],
+            ))
+        
+        # Notify parent comment author (if reply)
+        parent_author_id = comment_authors.get(entry.parent_id)
+        if parent_author_id is not None and parent_author_id != entry.actor_id:
+            events.append(Event(
+                parent_author_id, 'reply', f'comment:{entry.parent_id}', entry.actor_id, actor_name,
+                entry.post_id, entry.comment_id, post['title'],
+            ))
+    return events
+
+
+def dispatch_outbox(batch_size=500):
+    """
+    Turn one batch of outbox entries into notifications.
+    
+    Events are coalesced into the recipients' notifications and the entries
+    deleted in one transaction, so a crash either dispatches a batch
+    completely or leaves it queued. Entries locked by another dispatcher
+    are skipped. Recipients whose notifications changed are pushed once
+    per batch, after the commit, so clients never fetch before the rows
+    are visible. Returns the number of entries processed.
+    """
+    with transaction.atomic():
+        entries = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size]
+        )
+        if not entries:
+            return 0
+        
+        notifications = coalesce_events(build_events(entries))
+        NotificationOutbox.objects.filter(id__in=[entry.id for entry in entries]).delete()
+    
+    for recipient_id in dict.fromkeys(notification.recipient_id for notification in notifications):
+        send_realtime_notification(recipient_id)
+    return len(entries)
+
+
+def send_realtime_notification(user_id):
+    """Send real-time notification via WebSocket."""
+    channel_layer = get_channel_layer()
+    async_to_sync(channel_layer.group_send)(
+        f'notifications_{user_id}',
+        {
+            'type': 'notification_message',
+            'message': 'You have a new notification'
+        }
+    )
@@ -14,6 +14,7 @@ class NotificationSerializer(serializers.ModelSerializer):
         model = Notification
         fields = [
             'id', 'notification_type', 'message', 'sender_name',
-            'post_id', 'comment_id', 'is_read', 'created_at'
+            'post_id', 'comment_id', 'actor_count', 'recent_actors',
+            'is_read', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'actor_count', 'recent_actors', 'created_at', 'updated_at']
@@ -0,0 +1,258 @@
+"""
+Tests for notifications app.
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.discussions.models import Post, Comment
+from apps.notifications.models import Notification, NotificationOutbox
+from apps.notifications.outbox import dispatch_outbox
+
+User = get_user_model()
+
+
+@mock.patch('apps.notifications.outbox.send_realtime_notification')
+class NotificationOutboxTests(TestCase):
+    """Test comment notifications go through the outbox and the dispatcher."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(
+            email='author@pucit.edu.pk', password='TestPass123!', first_name='Post', last_name='Author'
+        )
+        self.commenter = User.objects.create_user(
+            email='commenter@pucit.edu.pk', password='TestPass123!', first_name='Sara', last_name='Khan'
+        )
+        self.post = Post.objects.create(author=self.author, title='Outbox', content='Body')
+    
+    def comment(self, user, **data):
+        self.client.force_authenticate(user=user)
+        return self.client.post(
+            f'/api/discussions/posts/{self.post.id}/comments/', {'content': 'Hi', **data}, format='json'
+        )
+    
+    def test_comment_only_queues_an_outbox_entry(self, send):
+        """Test creating a comment only queues an outbox entry."""
+        response = self.comment(self.commenter)
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual(
+            (entry.comment_id, entry.post_id, entry.parent_id, entry.actor_id),
+            (response.data['id'], self.post.id, None, self.commenter.id),
+        )
+        self.assertFalse(Notification.objects.exists())
+        send.assert_not_called()
+    
+    def test_dispatch_creates_notifications_and_pushes(self, send):
+        """Test dispatching creates the notification and pushes after commit."""
+        # Commenting on your own post notifies nobody
+        self.comment(self.author)
+        self.comment(self.commenter)
+        
+        self.assertEqual(dispatch_outbox(), 2)
+        
+        notification = Notification.objects.get()
+        self.assertEqual(notification.recipient, self.author)
+        self.assertEqual(notification.sender, self.commenter)
+        self.assertEqual(notification.message, 'Sara Khan commented on your post: Outbox')
+        self.assertFalse(NotificationOutbox.objects.exists())
+        send.assert_called_once_with(self.author.id)
+    
+    def test_reply_notifies_post_and_parent_authors(self, send):
+        """Test a reply notifies the post and parent comment authors."""
+        replier = User.objects.create_user(email='replier@pucit.edu.pk', password='TestPass123!')
+        parent = self.comment(self.commenter).data
+        self.comment(replier, parent=parent['id'])
+        
+        dispatch_outbox()
+        
+        reply_notifications = Notification.objects.filter(sender=replier)
+        self.assertEqual(
+            sorted(reply_notifications.values_list('recipient_id', 'notification_type')),
+            sorted([(self.author.id, 'comment'), (self.commenter.id, 'reply')]),
+        )
+        # One push per recipient for the whole batch
+        self.assertEqual(sorted(call.args[0] for call in send.call_args_list), sorted([self.author.id, self.commenter.id]))
+    
+    def test_deleted_comment_is_dropped(self, send):
+        """Test entries for deleted comments produce nothing."""
+        comment_id = self.comment(self.commenter).data['id']
+        Comment.objects.filter(id=comment_id).delete()
+        
+        self.assertEqual(dispatch_outbox(), 1)
+        
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(NotificationOutbox.objects.exists())
+        send.assert_not_called()
+    
+    def test_dispatch_queries_do_not_grow_with_batch(self, send):
+        """Test a batch is dispatched in a fixed number of queries."""
+        for _ in range(10):
+            self.comment(self.commenter)
+        
+        with CaptureQueriesContext(connection) as queries:
+            dispatch_outbox()
+        
+        self.assertEqual(Notification.objects.get().actor_count, 1)
+        # lock entries, posts, comments, actors, open notifications, insert,
+        # delete (+ savepoint)
+        self.assertLessEqual(len(queries), 9)
+    
+    def test_command_drains_outbox_in_batches(self, send):
+        """Test the command drains the outbox in batches."""
+        for _ in range(3):
+            self.comment(self.commenter)
+        out = StringIO()
+        
+        call_command('dispatch_notifications', '--once', '--batch-size', '2', stdout=out)
+        
+        self.assertIn('Dispatched 3 outbox entries', out.getvalue())
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+
+@mock.patch('apps.notifications.outbox.send_realtime_notification')
+@override_settings(NOTIFICATIONS_COALESCE_WINDOW_MINUTES=60)
+class NotificationCoalescingTests(TestCase):
+    """Test activity on one target merges into a single notification row."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(email='author@pucit.edu.pk', password='TestPass123!')
+        self.post = Post.objects.create(author=self.author, title='Busy', content='Body')
+        self.actors = [
+            User.objects.create_user(
+                email=f'actor{i}@pucit.edu.pk', password='TestPass123!', first_name=name, last_name=''
+            )
+            for i, name in enumerate(['Ali', 'Sara', 'Usman', 'Hina'])
+        ]
+    
+    def comment(self, user, **data):
+        self.client.force_authenticate(user=user)
+        response = self.client.post(
+            f'/api/discussions/posts/{self.post.id}/comments/', {'content': 'Hi', **data}, format='json'
+        )
+        dispatch_outbox()
+        return response.data
+    
+    def test_comments_on_a_post_merge_into_one_row(self, send):
+        """Test comments on a post merge into one row."""
+        for actor in self.actors:
+            last = self.comment(actor)
+        
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.actor_count, 4)
+        self.assertEqual([actor['name'] for actor in notification.recent_actors], ['Hina', 'Usman', 'Sara'])
+        self.assertEqual(notification.message, 'Hina and 3 others commented on your post: Busy')
+        self.assertEqual(notification.sender, self.actors[3])
+        self.assertEqual(notification.comment_id, last['id'])
+        self.assertEqual(send.call_count, 4)
+    
+    def test_two_actors_are_named(self, send):
+        """Test two actors are both named in the message."""
+        self.comment(self.actors[0])
+        self.comment(self.actors[1])
+        
+        notification = Notification.objects.get()
+        self.assertEqual(notification.message, 'Sara and Ali commented on your post: Busy')
+    
+    def test_repeat_actor_is_counted_once_and_not_pushed(self, send):
+        """Test a repeat actor is counted once and not pushed again."""
+        self.comment(self.actors[0])
+        self.comment(self.actors[0])
+        self.comment(self.actors[1])
+        self.comment(self.actors[0])
+        
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual(notification.recent_actors[0]['name'], 'Ali')
+        # The second comment left the row unchanged
+        self.assertEqual(send.call_count, 3)
+    
+    def test_returning_actor_is_not_counted_again(self, send):
+        """Test an actor who dropped out of recent_actors counts once."""
+        for actor in self.actors:
+            self.comment(actor)
+        self.comment(self.actors[0])
+        
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 4)
+        self.assertEqual([actor['name'] for actor in notification.recent_actors], ['Ali', 'Hina', 'Usman'])
+        self.assertEqual(notification.message, 'Ali and 3 others commented on your post: Busy')
+    
+    def test_replies_merge_per_parent_comment(self, send):
+        """Test replies merge per parent comment."""
+        parent = self.comment(self.author)
+        other = self.comment(self.author)
+        self.comment(self.actors[0], parent=parent['id'])
+        self.comment(self.actors[1], parent=parent['id'])
+        self.comment(self.actors[2], parent=other['id'])
+        
+        replies = Notification.objects.filter(notification_type='reply').order_by('id')
+        self.assertEqual(
+            [(n.target_key, n.actor_count) for n in replies],
+            [(f'comment:{parent["id"]}', 2), (f'comment:{other["id"]}', 1)],
+        )
+        self.assertEqual(replies[0].message, 'Sara and Ali replied to your comment')
+    
+    def test_read_notification_is_not_reopened(self, send):
+        """Test a read notification is not reopened."""
+        self.comment(self.actors[0])
+        first = Notification.objects.get()
+        self.client.force_authenticate(user=self.author)
+        self.client.post(f'/api/notifications/{first.id}/read/')
+        
+        self.comment(self.actors[1])
+        
+        self.assertEqual(Notification.objects.count(), 2)
+        first.refresh_from_db()
+        self.assertTrue(first.is_read)
+        self.assertEqual(first.actor_count, 1)
+    
+    def test_stale_notification_starts_a_new_row(self, send):
+        """Test activity after the window starts a new row."""
+        self.comment(self.actors[0])
+        Notification.objects.update(updated_at=timezone.now() - timedelta(hours=2))
+        
+        self.comment(self.actors[1])
+        
+        self.assertEqual(
+            sorted(Notification.objects.values_list('actor_count', flat=True)), [1, 1]
+        )
+    
+    def test_batch_merges_before_writing(self, send):
+        """Test one batch merges its events before writing."""
+        for actor in self.actors[:3]:
+            self.client.force_authenticate(user=actor)
+            self.client.post(f'/api/discussions/posts/{self.post.id}/comments/', {'content': 'Hi'}, format='json')
+        
+        dispatch_outbox()
+        
+        self.assertEqual(Notification.objects.get().actor_count, 3)
+        send.assert_called_once_with(self.author.id)
+    
+    def test_list_is_ordered_by_latest_activity(self, send):
+        """Test the list is ordered by latest activity."""
+        other_post = Post.objects.create(author=self.author, title='Quiet', content='Body')
+        self.comment(self.actors[0])
+        self.client.force_authenticate(user=self.actors[1])
+        self.client.post(f'/api/discussions/posts/{other_post.id}/comments/', {'content': 'Hi'}, format='json')
+        dispatch_outbox()
+        self.comment(self.actors[2])
+        
+        self.client.force_authenticate(user=self.author)
+        response = self.client.get('/api/notifications/')
+        
+        results = response.data['results']
+        self.assertEqual([item['post_id'] for item in results], [self.post.id, other_post.id])
+        self.assertEqual(results[0]['actor_count'], 2)
+        self.assertEqual(results[0]['recent_actors'][0]['name'], 'Usman')
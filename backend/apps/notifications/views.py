@@ -15,20 +15,17 @@ class NotificationListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user)
+        return Notification.objects.filter(recipient=self.request.user).select_related('sender')
 
 
 @api_view(['POST'])
 @perm_classes([permissions.IsAuthenticated])
 def mark_notification_read(request, pk):
     """Mark a notification as read."""
-    try:
-        notification = Notification.objects.get(pk=pk, recipient=request.user)
-        notification.is_read = True
-        notification.save()
-        return Response({'message': 'Notification marked as read'}, status=status.HTTP_200_OK)
-    except Notification.DoesNotExist:
+    # update() leaves updated_at alone, so reading does not reorder the list
+    if not Notification.objects.filter(pk=pk, recipient=request.user).update(is_read=True):
         return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'message': 'Notification marked as read'}, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
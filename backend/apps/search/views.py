@@ -8,7 +8,8 @@ from rest_framework import permissions
 from django.db.models import Q
 # from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
 from apps.discussions.models import Post
-from apps.discussions.serializers import PostListSerializer
+from apps.discussions.fast_serializers import post_list_values, serialize_post_rows
+from apps.discussions.votes import vote_context
 
 
 @api_view(['GET'])
@@ -43,10 +44,14 @@ def search_posts(request):
     start = (page - 1) * page_size
     end = start + page_size
     
-    serializer = PostListSerializer(posts[start:end], many=True)
+    page_posts = list(post_list_values(posts)[start:end])
+    results = serialize_post_rows(page_posts, {
+        'request': request,
+        **vote_context(request.user, page_posts),
+    })
     
     return Response({
-        'results': serializer.data,
+        'results': results,
         'count': posts.count(),
         'page': page
     })
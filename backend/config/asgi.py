@@ -13,7 +13,10 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django_asgi_app = get_asgi_application()
 
 # Import after Django setup
-from apps.notifications.routing import websocket_urlpatterns
+from apps.notifications.routing import websocket_urlpatterns as notification_urlpatterns
+from apps.messaging.routing import websocket_urlpatterns as messaging_urlpatterns
+
+websocket_urlpatterns = notification_urlpatterns + messaging_urlpatterns
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
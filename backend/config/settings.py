@@ -117,6 +117,49 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Cache: shared Redis when CACHE_URL is set, otherwise per-process memory
+CACHE_URL = config('CACHE_URL', default='')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'fcit-talk',
+        }
+    }
+
+# Anonymous discussion reads are cached for this long (seconds); writes
+# invalidate by bumping version numbers rather than deleting keys
+DISCUSSIONS_CACHE_TIMEOUT = config('DISCUSSIONS_CACHE_TIMEOUT', default=300, cast=int)
+
+# Vote counters: buffer upvotes_count deltas and merge them in batches
+# (run `manage.py flush_vote_counters`) instead of updating hot rows per vote
+VOTE_COUNTERS_WRITE_BEHIND = config('VOTE_COUNTERS_WRITE_BEHIND', default=False, cast=bool)
+VOTE_COUNTERS_FLUSH_INTERVAL = config('VOTE_COUNTERS_FLUSH_INTERVAL', default=2, cast=float)
+
+# Messaging delta sync: change log entries are served only once older than
+# the settle lag (so slower concurrent transactions are not skipped) and
+# pruned after the retention period, when older sync tokens get 410 Gone
+MESSAGING_SYNC_SETTLE_SECONDS = config('MESSAGING_SYNC_SETTLE_SECONDS', default=2, cast=float)
+MESSAGING_SYNC_RETENTION_DAYS = config('MESSAGING_SYNC_RETENTION_DAYS', default=30, cast=int)
+
+# Messages older than this are moved into compressed archive segments by
+# `manage.py archive_messages`; history endpoints read them transparently
+MESSAGING_ARCHIVE_AFTER_DAYS = config('MESSAGING_ARCHIVE_AFTER_DAYS', default=180, cast=int)
+
+# Comment notifications are queued in an outbox with the comment and created
+# (and pushed over WebSocket) by `manage.py dispatch_notifications`
+NOTIFICATIONS_DISPATCH_INTERVAL = config('NOTIFICATIONS_DISPATCH_INTERVAL', default=1, cast=float)
+# Unread notifications of one type on the same post/comment merge into one
+# row ("A and 2 others commented...") while updated within this window
+NOTIFICATIONS_COALESCE_WINDOW_MINUTES = config('NOTIFICATIONS_COALESCE_WINDOW_MINUTES', default=60, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
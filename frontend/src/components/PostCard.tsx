@@ -105,9 +105,9 @@ export default function PostCard({ post, onClick, currentUser, onNavigate, class
 
                 <h3 className="post-title">{post.title}</h3>
                 <p className="post-text">
-                    {(post.content || '').length > 200
+                    {post.excerpt ?? ((post.content || '').length > 200
                         ? (post.content || '').substring(0, 200) + '...'
-                        : (post.content || '')}
+                        : (post.content || ''))}
                 </p>
 
                 <div className="post-footer">
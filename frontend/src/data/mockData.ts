@@ -73,6 +73,7 @@ export interface Post {
     category: Category;
     title: string;
     content: string;
+    excerpt?: string;
     upvotes_count: number;
     comments_count: number;
     is_pinned: boolean;
@@ -101,8 +102,11 @@ export interface Notification {
     message: string;
     post_id?: number;
     comment_id?: number;
+    actor_count?: number;
+    recent_actors?: { id: number; name: string }[];
     is_read: boolean;
     created_at: string;
+    updated_at?: string;
 }
 
 // Messaging Types
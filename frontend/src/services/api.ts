@@ -123,6 +123,8 @@ export const notifications = {
 export const messaging = {
     listConversations: () => api.get<any[]>('/messaging/conversations/'),
     getConversation: (id: number) => api.get<any>(`/messaging/conversations/${id}/`),
+    getConversationMessages: (id: number, params?: { before?: string; after?: string; page_size?: number }) =>
+        api.get<any>(`/messaging/conversations/${id}/messages/`, { params }),
     startConversation: (recipientId: number) => api.post('/messaging/conversations/start/', { recipient_id: recipientId }),
     sendMessage: (data: any) => api.post('/messaging/send/', data),
 